@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks for the analysis pipeline.
+
+Run from `modules/analyse`, e.g. `python -m benchmarks.cv_benchmark`.
+"""
@@ -0,0 +1,76 @@
+"""
+Displaced-stone assignment benchmark.
+
+Compares the original exhaustive permutation search with the Hungarian
+`opt_permutation` on random displacements of up to 50 stones. The
+exhaustive search is only run up to `--max-legacy` stones.
+
+Usage (from modules/analyse):
+    python -m benchmarks.assignment_benchmark [--max-stones 50]
+"""
+
+import argparse
+import itertools
+
+import numpy as np
+
+from logique.corrector_noAI import distance, opt_permutation
+from benchmarks.common import print_report, time_call
+
+
+def legacy_opt_permutation(list_added, list_removed):
+    """The exhaustive search used before, kept here as the baseline."""
+    d_opt = np.inf
+    list_added_permut_opt = list_added
+    for list_added_permut in list(itertools.permutations(list_added)):
+        d_curr = distance(list(list_added_permut), list_removed)
+        if d_curr < d_opt:
+            list_added_permut_opt = list(list_added_permut)
+            d_opt = d_curr
+    return list_added_permut_opt
+
+
+def make_displacement(num_stones: int, rng: np.random.Generator):
+    """Distinct removed points, each moved by a small random offset."""
+    points = rng.choice(361, size=num_stones, replace=False)
+    removed = [(int(p) // 19, int(p) % 19, 1) for p in points]
+    offsets = rng.integers(-2, 3, size=(num_stones, 2))
+    added = [(int(np.clip(r + dr, 0, 18)), int(np.clip(c + dc, 0, 18)), 1)
+             for (r, c, _), (dr, dc) in zip(removed, offsets)]
+    rng.shuffle(added)
+    return added, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-stones", type=int, default=50)
+    parser.add_argument("--max-legacy", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = []
+    for num_stones in (2, 4, 6, 8, 12, 20, 30, 50):
+        if num_stones > args.max_stones:
+            break
+        added, removed = make_displacement(num_stones, rng)
+        legacy = None
+        if num_stones <= args.max_legacy:
+            legacy = time_call(
+                lambda: legacy_opt_permutation(added, removed), 1
+            )
+            same = (opt_permutation(added, removed) ==
+                    legacy_opt_permutation(added, removed))
+        rows.append({
+            "stones": num_stones,
+            "legacy us": legacy if legacy is not None else "-",
+            "hungarian us": time_call(
+                lambda: opt_permutation(added, removed), args.repeat
+            ),
+            "same result": same if legacy is not None else "-",
+        })
+    print_report("opt_permutation", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def time_call(func: Callable[[], object], repeat: int = 100) -> float:
+    """
+    Times a zero-argument callable.
+
+    Args:
+        func (Callable): The function to time.
+        repeat (int): Number of calls to average over.
+
+    Returns:
+        float: Mean wall-clock time per call, in microseconds.
+    """
+    func()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def make_timeline(num_moves: int, seed: int = 0,
+                  keep_prob: float = 0.7,
+                  removal_prob: float = 0.05,
+                  displacement_prob: float = 0.05) -> List[np.ndarray]:
+    """
+    Builds a noisy detector-like timeline of 19x19 uint8 states.
+
+    Stones are played alternately on random empty points; some states
+    are skipped (merged moves) and stones are occasionally removed or
+    displaced. The board is cleared whenever it fills up, so any length
+    can be generated.
+
+    Args:
+        num_moves (int): Number of stones played.
+        seed (int): Random seed.
+        keep_prob (float): Probability that a move's state is recorded.
+        removal_prob (float): Probability of removing 1-3 stones.
+        displacement_prob (float): Probability of moving one stone.
+
+    Returns:
+        list: The recorded states, starting with the empty board.
+    """
+    rng = np.random.default_rng(seed)
+    board = np.zeros((19, 19), dtype=np.uint8)
+    states = [board.copy()]
+    player = 1
+
+    for _ in range(num_moves):
+        empty = np.flatnonzero(board == 0)
+        if len(empty) < 20:
+            board[:] = 0
+            empty = np.flatnonzero(board == 0)
+        board.flat[rng.choice(empty)] = player
+        player = 3 - player
+
+        event = rng.random()
+        stones = np.flatnonzero(board)
+        if event < removal_prob:
+            board.flat[rng.choice(stones, size=rng.integers(1, 4))] = 0
+        elif event > 1 - displacement_prob:
+            source = rng.choice(stones)
+            target = rng.choice(np.flatnonzero(board == 0))
+            board.flat[target], board.flat[source] = board.flat[source], 0
+
+        if rng.random() < keep_prob:
+            states.append(board.copy())
+    return states
+
+
+def print_report(title: str, rows: List[Dict[str, object]]):
+    """
+    Prints benchmark rows as an aligned table.
+
+    Args:
+        title (str): Heading printed above the table.
+        rows (list): One dict per row; keys of the first row are columns.
+    """
+    print(f"\n== {title} ==")
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    cells = [[_format(row[col]) for col in columns] for row in rows]
+    widths = [max(len(col), *(len(c[i]) for c in cells))
+              for i, col in enumerate(columns)]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+def _format(value: object) -> str:
+    """Formats floats with two decimals, everything else with str()."""
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
@@ -0,0 +1,297 @@
+"""
+Corrector accuracy and throughput harness.
+
+Converts ground-truth SGF games to timelines, records them the way the
+video pipeline would (dropped states and merged moves, missing stones,
+flicker and displaced stones, see `training_data.corrupt_timeline`), and
+runs every corrector on the recorded timelines. For each corrector it
+reports:
+
+- move_accuracy: moves matched in order (longest common blocks) over the
+  length of the longer of the true and reconstructed move lists;
+- position_accuracy: moves equal to the true move at the same index;
+- exact_games: games reconstructed without a single error;
+- states_per_s: recorded states corrected per second;
+- peak_memory_mb: peak Python/NumPy allocations during a run.
+
+Results are written as JSON, with the git revision and the corruption
+settings, so runs of different versions can be compared with
+`--baseline`. The exit status is 1 when a corrector's accuracy dropped by
+more than `--tolerance` against the baseline.
+
+Correctors that need the Keras model are skipped when it cannot be
+loaded. Other correctors can be added as `name=package.module:function`,
+where the function takes a list of 19x19 states and returns a list of
+(row, col, player) moves.
+
+Usage (from modules/analyse):
+    python -m benchmarks.corrector_accuracy --sgf-dir games/ \
+        --output report.json [--baseline previous.json]
+Without --sgf-dir, random legal games are used.
+"""
+
+import argparse
+import datetime
+import difflib
+import importlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from logique.corrector_noAI import corrector_no_ai
+from logique.utils.sgf_timeline import sgf_text_to_timeline, sgf_to_timeline
+from logique.utils.sgf_writer import moves_to_sgf
+from logique.utils.training_data import (
+    NoiseConfig, corrupt_timeline, timeline_moves
+)
+from benchmarks.common import print_report
+from benchmarks.sgf_benchmark import make_game
+
+MoveTuple = Tuple[int, int, int]
+Corrector = Callable[[List[np.ndarray]], List[MoveTuple]]
+
+
+def load_games(sgf_dir: str, max_games: int, num_moves: int,
+               seed: int) -> List[Tuple[str, np.ndarray]]:
+    """Ground-truth timelines, from SGF files or random legal games."""
+    if sgf_dir is None:
+        rng = np.random.default_rng(seed)
+        return [(f"random{i}",
+                 sgf_text_to_timeline(moves_to_sgf(make_game(num_moves, rng))))
+                for i in range(max_games)]
+
+    games = []
+    for root, _, files in sorted(os.walk(sgf_dir)):
+        for name in sorted(files):
+            if not name.lower().endswith(".sgf"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                games.append((os.path.relpath(path, sgf_dir),
+                              sgf_to_timeline(path)))
+            except (OSError, ValueError) as e:
+                print(f"Skipping {e}")
+            if len(games) == max_games:
+                return games
+    return games
+
+
+def load_correctors(model_path: str, beam_widths: List[int],
+                    custom: List[str]) -> Dict[str, Corrector]:
+    """The built-in correctors, plus the `name=module:function` ones."""
+    correctors: Dict[str, Corrector] = {"corrector_no_ai": corrector_no_ai}
+    try:
+        from logique.corrector_streaming import StreamingCorrector
+        from logique.corrector_withAI import corrector_with_ai
+        from logique.utils.model_utils import load_corrector_model
+        model = load_corrector_model(model_path)
+    except Exception as e:
+        print(f"AI correctors skipped: {e}")
+    else:
+        def streaming(states):
+            corrector = StreamingCorrector(model)
+            for state in states:
+                corrector.push(state)
+            corrector.flush()
+            return corrector.moves
+
+        for width in beam_widths:
+            correctors[f"corrector_with_ai beam={width}"] = (
+                lambda states, width=width:
+                corrector_with_ai(states, model, beam_width=width)
+            )
+        correctors["streaming"] = streaming
+
+    for spec in custom:
+        name, _, target = spec.rpartition("=")
+        module_name, _, function_name = target.partition(":")
+        function = getattr(importlib.import_module(module_name),
+                           function_name)
+        correctors[name or target] = function
+    return correctors
+
+
+def score_moves(truth: List[MoveTuple],
+                predicted: List[MoveTuple]) -> Tuple[int, int]:
+    """
+    Compares a reconstructed move list with the true one.
+
+    Returns:
+        tuple: Moves matched in order (longest common blocks) and moves
+            equal at the same index.
+    """
+    predicted = [tuple(int(value) for value in move) for move in predicted]
+    matcher = difflib.SequenceMatcher(None, truth, predicted, autojunk=False)
+    in_order = sum(block.size for block in matcher.get_matching_blocks())
+    same_index = sum(a == b for a, b in zip(truth, predicted))
+    return in_order, same_index
+
+
+def run_corrector(corrector: Corrector,
+                  recorded: List[Tuple[List[MoveTuple], List[np.ndarray]]]
+                  ) -> Dict[str, object]:
+    """Times a corrector over every game, then measures its peak memory."""
+    matched = same_index = total = exact = errors = 0
+    num_states = sum(len(states) for _, states in recorded)
+    elapsed = 0.0
+    for truth, states in recorded:
+        start = time.perf_counter()
+        try:
+            predicted = corrector(states)
+        except Exception as e:
+            print(f"Corrector failed: {e}")
+            errors += 1
+            predicted = []
+        elapsed += time.perf_counter() - start
+
+        in_order, at_index = score_moves(truth, predicted)
+        matched += in_order
+        same_index += at_index
+        total += max(len(truth), len(predicted))
+        exact += (in_order == at_index == len(truth) == len(predicted))
+
+    # Tracing slows allocations down, so memory is measured separately
+    tracemalloc.start()
+    for _, states in recorded:
+        try:
+            corrector(states)
+        except Exception:
+            pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "move_accuracy": matched / total if total else 1.0,
+        "position_accuracy": same_index / total if total else 1.0,
+        "exact_games": exact / len(recorded) if recorded else 1.0,
+        "states_per_s": num_states / elapsed if elapsed else 0.0,
+        "peak_memory_mb": peak / 2 ** 20,
+        "errors": errors,
+    }
+
+
+def git_revision() -> str:
+    """Short hash of the checked-out commit, or 'unknown'."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> bool:
+    """Prints the changes against a baseline report; False on regression."""
+    rows = []
+    passed = True
+    for name, result in report["correctors"].items():
+        previous = baseline.get("correctors", {}).get(name)
+        if previous is None:
+            continue
+        delta = result["move_accuracy"] - previous["move_accuracy"]
+        regressed = delta < -tolerance
+        passed &= not regressed
+        rows.append({
+            "corrector": name,
+            "accuracy delta": delta,
+            "speedup": (result["states_per_s"] / previous["states_per_s"]
+                        if previous["states_per_s"] else float("nan")),
+            "memory ratio": (result["peak_memory_mb"] /
+                             previous["peak_memory_mb"]
+                             if previous["peak_memory_mb"] else float("nan")),
+            "status": "REGRESSION" if regressed else "ok",
+        })
+    print_report(f"Against {baseline.get('revision', '?')}", rows)
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sgf-dir", default=None)
+    parser.add_argument("--max-games", type=int, default=50)
+    parser.add_argument("--moves", type=int, default=250,
+                        help="Moves of the random games (no --sgf-dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-prob", type=float, default=0.6)
+    parser.add_argument("--missing-prob", type=float, default=0.01)
+    parser.add_argument("--flicker-prob", type=float, default=0.02)
+    parser.add_argument("--displacement-prob", type=float, default=0.01)
+    parser.add_argument("--model", default=None,
+                        help="Keras model (defaults to settings.KERAS_PATH)")
+    parser.add_argument("--beam-widths", type=int, nargs="+", default=[1])
+    parser.add_argument("--corrector", action="append", default=[],
+                        help="Extra corrector, as name=module:function")
+    parser.add_argument("--output", default="corrector_report.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.005)
+    parser.add_argument("--verbose", action="store_true",
+                        help="Keep the correctors' per-frame logs")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.getLogger("logique").setLevel(logging.WARNING)
+
+    noise = NoiseConfig(keep_prob=args.keep_prob,
+                        missing_prob=args.missing_prob,
+                        flicker_prob=args.flicker_prob,
+                        displacement_prob=args.displacement_prob)
+    games = load_games(args.sgf_dir, args.max_games, args.moves, args.seed)
+    recorded = []
+    for index, (_, timeline) in enumerate(games):
+        _, states = corrupt_timeline(
+            timeline, noise, np.random.default_rng([args.seed, index])
+        )
+        truth = [move for move in timeline_moves(timeline)
+                 if move is not None]
+        recorded.append((truth, list(states)))
+
+    model_path = args.model
+    if model_path is None:
+        try:
+            from config.settings import KERAS_PATH
+            model_path = KERAS_PATH
+        except Exception:
+            model_path = ""
+    correctors = load_correctors(model_path, args.beam_widths,
+                                 args.corrector)
+
+    results = {name: run_corrector(corrector, recorded)
+               for name, corrector in correctors.items()}
+    report = {
+        "revision": git_revision(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "platform": {"python": platform.python_version(),
+                     "numpy": np.__version__,
+                     "machine": platform.machine()},
+        "config": {"source": args.sgf_dir or f"random ({args.moves} moves)",
+                   "games": len(games),
+                   "states": sum(len(states) for _, states in recorded),
+                   "seed": args.seed,
+                   "noise": noise._asdict()},
+        "correctors": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(f"Correctors ({len(games)} games)",
+                 [{"corrector": name, **result}
+                  for name, result in results.items()])
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
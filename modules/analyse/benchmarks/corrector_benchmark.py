@@ -0,0 +1,91 @@
+"""
+Corrector benchmark.
+
+Times state diffing (the original per-cell loop, the vectorized array
+path, the batched timeline path and bitboards) and the heuristic
+corrector on synthetic noisy timelines (see
+`benchmarks.common.make_timeline`).
+
+Usage (from modules/analyse):
+    python -m benchmarks.corrector_benchmark [--moves 7000]
+"""
+
+import argparse
+
+import numpy as np
+
+from logique.corrector_noAI import (
+    corrector_no_ai, differences, timeline_differences
+)
+from logique.utils.bitboard import timeline_to_bitboards
+from benchmarks.common import make_timeline, print_report, time_call
+
+
+def legacy_differences(prev_board: np.ndarray, curr_board: np.ndarray):
+    """The per-cell loop `differences` used before, kept as the baseline."""
+    black_added, black_removed, white_added, white_removed = [], [], [], []
+    num_added = 0
+    for r in range(prev_board.shape[0]):
+        for c in range(prev_board.shape[0]):
+            prev_stone = prev_board[r, c]
+            curr_stone = curr_board[r, c]
+            if curr_stone == 1 and prev_stone == 0:
+                black_added.append((r, c, 1))
+                num_added += 1
+            elif curr_stone == 0 and prev_stone == 1:
+                black_removed.append((r, c, 1))
+            elif curr_stone == 2 and prev_stone == 0:
+                white_added.append((r, c, 2))
+                num_added += 1
+            elif curr_stone == 0 and prev_stone == 2:
+                white_removed.append((r, c, 2))
+            elif curr_stone == 2 and prev_stone == 1:
+                black_removed.append((r, c, 1))
+                white_added.append((r, c, 2))
+                num_added += 1
+            elif curr_stone == 1 and prev_stone == 2:
+                white_removed.append((r, c, 2))
+                black_added.append((r, c, 1))
+                num_added += 1
+    return ({1: {"add": black_added, "remove": black_removed},
+             2: {"add": white_added, "remove": white_removed}}, num_added)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--moves", type=int, default=7000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    states = make_timeline(args.moves)
+    bitboards = timeline_to_bitboards(states)
+    pairs = len(states) - 1
+
+    def diff_all(timeline, diff=differences):
+        for i in range(1, len(timeline)):
+            diff(timeline[i - 1], timeline[i])
+
+    rows = [
+        {"stage": "differences (legacy loop)",
+         "us/pair": time_call(lambda: diff_all(states, legacy_differences),
+                              1) / pairs},
+        {"stage": "differences (arrays)",
+         "us/pair": time_call(lambda: diff_all(states), args.repeat) / pairs},
+        {"stage": "timeline_differences",
+         "us/pair": time_call(lambda: timeline_differences(states),
+                              args.repeat) / pairs},
+        {"stage": "timeline_to_bitboards",
+         "us/pair": time_call(lambda: timeline_to_bitboards(states),
+                              args.repeat) / pairs},
+        {"stage": "differences (bitboards)",
+         "us/pair": time_call(lambda: diff_all(bitboards),
+                              args.repeat) / pairs},
+        {"stage": "corrector_no_ai",
+         "us/pair": time_call(lambda: corrector_no_ai(states),
+                              args.repeat) / pairs},
+    ]
+    print_report(f"Corrector ({len(states)} states)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+CV stage benchmark.
+
+Times the grid-line stages of `GoBoard.process_frame` on synthetic line
+fixtures (jittered 19-line grids with missing and spurious lines), so
+changes to `cv_utils` can be compared commit to commit.
+
+Usage (from modules/analyse):
+    python -m benchmarks.cv_benchmark [--fixtures 200] [--repeat 20]
+"""
+
+import argparse
+from typing import List
+
+import numpy as np
+
+from logique.utils.cv_utils import (
+    add_lines_in_the_edges, removeDuplicates, restore_and_remove_lines
+)
+from benchmarks.common import print_report, time_call
+
+
+def make_line_fixtures(count: int, vertical: bool,
+                       seed: int = 0) -> List[np.ndarray]:
+    """
+    Builds deduplicated line sets resembling detector output on a warped
+    600x600 board.
+    """
+    rng = np.random.default_rng(seed)
+    fixtures = []
+    for _ in range(count):
+        spacing = rng.uniform(29, 33)
+        positions = 10 + spacing * np.arange(19) + rng.normal(0, 1.5, 19)
+        positions = positions[rng.random(19) > 0.15]  # Missing lines
+        spurious = rng.uniform(0, 600, rng.integers(0, 3))
+        positions = rng.permutation(np.concatenate((positions, spurious)))
+        tilt = rng.normal(0, 3, len(positions))
+        if vertical:
+            lines = np.stack((positions, np.zeros_like(positions),
+                              positions + tilt,
+                              np.full_like(positions, 600)), axis=1)
+        else:
+            lines = np.stack((np.zeros_like(positions), positions,
+                              np.full_like(positions, 600),
+                              positions + tilt), axis=1)
+        fixtures.append(removeDuplicates(lines.astype(int)))
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fixtures", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for line_type in ("vertical", "horizontal"):
+        fixtures = make_line_fixtures(args.fixtures,
+                                      vertical=line_type == "vertical")
+        restored = [restore_and_remove_lines(lines) for lines in fixtures]
+        edge_inputs = [lines for lines in restored if len(lines) in (17, 18)]
+
+        restore_us = time_call(
+            lambda: [restore_and_remove_lines(lines) for lines in fixtures],
+            args.repeat) / len(fixtures)
+        edges_us = time_call(
+            lambda: [add_lines_in_the_edges(lines, line_type)
+                     for lines in edge_inputs],
+            args.repeat) / max(1, len(edge_inputs))
+
+        rows.append({"stage": "restore_and_remove_lines",
+                     "lines": line_type, "us/call": restore_us})
+        rows.append({"stage": "add_lines_in_the_edges",
+                     "lines": line_type, "us/call": edges_us})
+
+    print_report("CV line stages", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Detection cache benchmark.
+
+Records synthetic YOLO detections (a board, its corners and one box per
+intersection, stone or empty) for a video's worth of analysed frames,
+then reports the cache size on disk, the save and load times and how
+fast frames are read back for replay, and checks the replayed
+detections are identical to the recorded ones.
+
+Usage (from modules/analyse):
+    python -m benchmarks.detection_cache_benchmark [--frames 18000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from logique.utils.cv_utils import (
+    BLACK_STONE, BOARD, CORNER, EMPTY_INTERSECTION, WHITE_STONE,
+    make_detections
+)
+from logique.utils.detection_cache import DetectionCache, DetectionRecorder
+from benchmarks.common import print_report
+
+
+def make_frame_detections(rng: np.random.Generator) -> np.ndarray:
+    """Detections resembling YOLO output on a 1080p frame of a board."""
+    grid = 200 + 36 * np.arange(19) + rng.normal(0, 1, 19)[:, None]
+    xs, ys = np.meshgrid(grid[0], grid[1])
+    centers = np.stack((xs.ravel(), ys.ravel()), axis=1)
+    cls = rng.choice([EMPTY_INTERSECTION, BLACK_STONE, WHITE_STONE],
+                     size=361, p=[0.6, 0.2, 0.2])
+    corners = np.array([[200, 200], [848, 200], [848, 848], [200, 848]])
+    centers = np.concatenate((centers, corners, [[524, 524]]))
+    half = np.concatenate((np.full(365, 15.0), [340.0]))[:, None]
+    xyxy = np.concatenate((centers - half, centers + half), axis=1)
+    cls = np.concatenate((cls, [CORNER] * 4, [BOARD]))
+    return make_detections(xyxy, rng.uniform(0.15, 1.0, len(cls)), cls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=18000,
+                        help="Analysed frames (30 min at 10 frames/s)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [make_frame_detections(rng) for _ in range(args.frames)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "detections.npz")
+        recorder = DetectionRecorder()
+        start = time.perf_counter()
+        for index, detections in enumerate(frames):
+            recorder.begin_frame(index * 3, index * 0.1)
+            recorder.add(detections)
+        record_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recorder.save(path)
+        save_s = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        cache = DetectionCache(path)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replayed = [detections for _, _, detections in cache.frames()]
+        replay_s = time.perf_counter() - start
+        same = all(np.array_equal(a, b) for a, b in zip(frames, replayed))
+
+        start = time.perf_counter()
+        for _ in cache.frames(conf=0.5):
+            pass
+        filtered_s = time.perf_counter() - start
+
+    rows = [
+        {"stage": "record", "s": record_s,
+         "frames/s": args.frames / record_s},
+        {"stage": "save", "s": save_s, "frames/s": args.frames / save_s},
+        {"stage": "load", "s": load_s, "frames/s": args.frames / load_s},
+        {"stage": "replay", "s": replay_s,
+         "frames/s": args.frames / replay_s},
+        {"stage": "replay conf=0.5", "s": filtered_s,
+         "frames/s": args.frames / filtered_s},
+    ]
+    print_report(f"Detection cache ({args.frames} frames)", rows)
+    print(f"Cache size: {size / 2 ** 20:.1f} MB "
+          f"({size / args.frames:.0f} bytes/frame)")
+    print(f"Replayed detections identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Corrector gap-filling benchmark.
+
+Fills the gaps of a synthetic timeline with merged moves (see
+`benchmarks.common.make_timeline`) using the corrector model, once gap by
+gap and once batched across gaps, and checks that both pick the same
+moves. Beam-search fills are timed per width, with the number of gaps
+whose moves differ from the greedy fill, and full post-treatment is timed
+with parallel workers. Requires the Keras model (settings.KERAS_PATH by
+default).
+
+Before loading it, checks on a stand-in model that a beam search prefers
+a complete fill to a likelier one that had to skip a move.
+
+Usage (from modules/analyse):
+    python -m benchmarks.gap_filling_benchmark [--moves 8000]
+"""
+
+import argparse
+
+import numpy as np
+
+from config.settings import KERAS_PATH
+from logique.corrector_withAI import corrector_with_ai, plan_gaps
+from logique.utils.model_utils import (
+    GapRequest, fill_gap, fill_gaps_batched, load_corrector_model
+)
+from benchmarks.common import make_timeline, print_report, time_call
+
+
+class StandInModel:
+    """
+    Scores black at (3, 3) at 0.9, any other black move at 0.5 and every
+    white move at 0.01.
+    """
+
+    def predict(self, boards, verbose=0, batch_size=None):
+        black = np.where(boards[:, 3, 3, 0] == 1, 0.9, 0.5)
+        return np.stack((black, np.full(len(boards), 0.01)), axis=1)
+
+
+def complete_fill_wins() -> bool:
+    """
+    Black may play (3, 3) or (15, 15), then White's only candidate is
+    (3, 3). Black (3, 3) scores higher but leaves White no legal move;
+    the beam must still return the complete fill.
+    """
+    gap = GapRequest(np.zeros((19, 19), dtype=np.uint8), 2, 1,
+                     [(3, 3), (15, 15)], [(3, 3)])
+    moves = fill_gaps_batched(StandInModel(), [gap], beam_width=2)[0]
+    return moves == [(15, 15, 1), (3, 3, 2)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=KERAS_PATH)
+    parser.add_argument("--moves", type=int, default=8000)
+    parser.add_argument("--keep-prob", type=float, default=0.5)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--beam-widths", type=int, nargs="+",
+                        default=[2, 4, 8])
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    print(f"Beam prefers complete fills: {complete_fill_wins()}")
+    model = load_corrector_model(args.model)
+    states = make_timeline(args.moves, keep_prob=args.keep_prob)
+    _, gaps = plan_gaps(states)
+
+    def per_gap():
+        return [fill_gap(model, gap.initial_state, gap.num_moves,
+                         gap.first_player, gap.black_moves, gap.white_moves)
+                for gap in gaps]
+
+    greedy = fill_gaps_batched(model, gaps)
+    same = per_gap() == greedy
+    rows = [
+        {"stage": "fill_gap per gap",
+         "ms": time_call(per_gap, args.repeat) / 1e3},
+        {"stage": "fill_gaps_batched",
+         "ms": time_call(lambda: fill_gaps_batched(model, gaps),
+                         args.repeat) / 1e3},
+        {"stage": "corrector_with_ai (post-treatment)",
+         "ms": time_call(lambda: corrector_with_ai(states, model),
+                         args.repeat) / 1e3},
+    ]
+    for width in args.beam_widths:
+        filled = fill_gaps_batched(model, gaps, beam_width=width)
+        rows.append({
+            "stage": f"fill_gaps_batched beam={width} "
+                     f"({sum(a != b for a, b in zip(filled, greedy))} "
+                     "gaps changed)",
+            "ms": time_call(
+                lambda: fill_gaps_batched(model, gaps, beam_width=width),
+                args.repeat
+            ) / 1e3
+        })
+    sequential = corrector_with_ai(states, model)
+    for workers in args.workers:
+        parallel = corrector_with_ai(states, model, num_workers=workers,
+                                     model_path=args.model)
+        rows.append({
+            "stage": f"corrector_with_ai workers={workers} "
+                     f"(same moves: {parallel == sequential})",
+            "ms": time_call(
+                lambda: corrector_with_ai(states, model,
+                                          num_workers=workers,
+                                          model_path=args.model),
+                args.repeat
+            ) / 1e3
+        })
+    print_report(f"Gap filling ({len(states)} states, {len(gaps)} gaps, "
+                 f"same moves: {same})", rows)
+
+
+if __name__ == "__main__":
+    main()
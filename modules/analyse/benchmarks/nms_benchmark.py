@@ -0,0 +1,102 @@
+"""
+Corner NMS micro-benchmark.
+
+Compares the original while-loop NMS with the vectorised one used by
+`get_corners`, on synthetic clusters of overlapping corner boxes, and
+checks that both keep the same boxes when ranked the same way (by
+bottom edge), including a small box nested inside a larger one.
+
+Usage (from modules/analyse):
+    python -m benchmarks.nms_benchmark [--repeat 2000]
+"""
+
+import argparse
+
+import numpy as np
+
+from logique.utils.cv_utils import (
+    BOARD, CORNER, DETECTION_DTYPE, get_corners, non_max_suppression
+)
+from benchmarks.common import print_report, time_call
+
+
+def legacy_non_max_suppression(boxes: np.ndarray,
+                               overlap_thresh: float = 0.5) -> np.ndarray:
+    """The original implementation, kept here as the baseline."""
+    if len(boxes) == 0:
+        return np.array([])
+    boxes = boxes.astype("float")
+    pick = []
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = (x2 - x1 + 1) * (y2 - y1 + 1)
+    idxs = np.argsort(y2)
+    while len(idxs) > 0:
+        last = len(idxs) - 1
+        i = idxs[last]
+        pick.append(i)
+        xx1 = np.maximum(x1[i], x1[idxs[:last]])
+        yy1 = np.maximum(y1[i], y1[idxs[:last]])
+        xx2 = np.minimum(x2[i], x2[idxs[:last]])
+        yy2 = np.minimum(y2[i], y2[idxs[:last]])
+        w = np.maximum(0, xx2 - xx1 + 1)
+        h = np.maximum(0, yy2 - yy1 + 1)
+        overlap = (w * h) / area[idxs[:last]]
+        idxs = np.delete(idxs, np.concatenate(
+            ([last], np.where(overlap > overlap_thresh)[0])))
+    return boxes[pick].astype("int")
+
+
+def make_corner_detections(per_corner: int, seed: int = 0) -> np.ndarray:
+    """
+    Four clusters of jittered corner boxes plus one board box. Each
+    cluster also has a small box nested in a larger one, which overlap
+    by far less than 0.5 IoU.
+    """
+    rng = np.random.default_rng(seed)
+    centers = np.array([[100, 80], [900, 120], [950, 900], [60, 870]])
+    rows = []
+    for center in centers:
+        for _ in range(per_corner):
+            c = center + rng.normal(0, 3, 2)
+            rows.append((np.r_[c - 15, c + 15], CORNER, rng.uniform(.2, 1)))
+        rows.append((np.r_[center - 40, center + 40], CORNER, 0.9))
+        rows.append((np.r_[center - 5, center + 5], CORNER, 0.3))
+    rows.append((np.r_[40, 60, 970, 920], BOARD, 0.95))
+
+    detections = np.zeros(len(rows), dtype=DETECTION_DTYPE)
+    for i, (xyxy, cls, conf) in enumerate(rows):
+        detections[i]["xyxy"] = xyxy
+        detections[i]["cls"] = cls
+        detections[i]["conf"] = conf
+    return detections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = []
+    for per_corner in (1, 3, 10, 50):
+        detections = make_corner_detections(per_corner)
+        boxes = detections["xyxy"][detections["cls"] == CORNER]
+        scores = detections["conf"][detections["cls"] == CORNER]
+        legacy = legacy_non_max_suppression(boxes)
+        kept = boxes[non_max_suppression(boxes)].astype(int)
+        same = (len(legacy) == len(kept) and
+                set(map(tuple, legacy)) == set(map(tuple, kept)))
+        rows.append({
+            "boxes": len(boxes),
+            "same_picks": same,
+            "legacy_nms_us": time_call(
+                lambda: legacy_non_max_suppression(boxes), args.repeat),
+            "nms_us": time_call(
+                lambda: non_max_suppression(boxes, scores), args.repeat),
+            "get_corners_us": time_call(
+                lambda: get_corners(detections, 0), args.repeat),
+        })
+    print_report("Corner NMS", rows)
+
+
+if __name__ == "__main__":
+    main()
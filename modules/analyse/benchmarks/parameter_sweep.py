@@ -0,0 +1,368 @@
+"""
+Pipeline parameter sweep.
+
+Runs the video pipeline over reference videos for every combination of
+a parameter grid and reports, for each configuration, how close the
+generated SGF is to a reference SGF and what the analysis cost.
+
+YOLO runs once per video: frames are detected at the finest analysis
+interval of the grid and the lowest confidence threshold, and the
+detections are cached (see detection_cache). Every configuration then
+replays the cached frames it would have analysed, keeping the boxes
+above its own threshold, through the geometry, stone assignment and
+correction stages. Configurations run in a process pool.
+
+Accuracy is the fraction of reference moves found in order (see
+`benchmarks.corrector_accuracy.score_moves`), taking the best of the 8
+board orientations since the camera may see the board rotated or
+mirrored. Cost is the replay and correction time plus the YOLO time of
+the frames the configuration analyses, estimated from the shared
+detector pass, so configurations that analyse fewer frames are credited
+for the detector time they save. Frames are picked as `process_video`
+picks them (every step-th frame, counting from 1). Unlike the pipeline,
+the board is initialized on the first analysed frame where it is found
+rather than by scanning every frame.
+
+Usage (from modules/analyse):
+    python -m benchmarks.parameter_sweep \
+        --video game1.mp4 game1.sgf --video game2.mp4 game2.sgf \
+        --param analysis_interval=0.1,0.2 --param duplicate_threshold=5,10 \
+        --workers 4 --output sweep.json
+Parameters not given keep their value from config/settings.py.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+
+from config.settings import (
+    ANALYSIS_INTERVAL, CORRECTOR_BEAM_WIDTH, DUPLICATE_LINE_THRESHOLD,
+    KERAS_PATH, LINE_DISTANCE_THRESHOLD, STABILIZER_WINDOW, YOLO_CONF,
+    YOLO_PATH
+)
+from logique.utils.detection_cache import (
+    DetectionCache, DetectionRecorder, cache_path
+)
+from logique.utils.sgf_timeline import PASS, parse_sgf
+from benchmarks.common import print_report
+from benchmarks.corrector_accuracy import git_revision, score_moves
+
+MoveTuple = Tuple[int, int, int]
+
+# name: (default, type)
+PARAMETERS = {
+    "analysis_interval": (ANALYSIS_INTERVAL, float),
+    "yolo_conf": (YOLO_CONF, float),
+    "duplicate_threshold": (DUPLICATE_LINE_THRESHOLD, float),
+    "line_distance_threshold": (LINE_DISTANCE_THRESHOLD, float),
+    "stabilizer_window": (STABILIZER_WINDOW, int),
+    "beam_width": (CORRECTOR_BEAM_WIDTH, int),
+    "corrector": ("ai", str),  # "ai" or "no_ai"
+}
+
+POOL_START_METHOD = "spawn"
+
+
+class VideoDetections(NamedTuple):
+    """Cached detector output of one reference video."""
+    name: str
+    cache_file: str
+    reference: List[MoveTuple]
+    fps: float
+    detector_s: float
+    detected_frames: int
+
+
+def parse_grid(specs: List[str]) -> List[Dict[str, object]]:
+    """Every configuration of `name=v1,v2,...` specs, with defaults."""
+    values = {name: [default] for name, (default, _) in PARAMETERS.items()}
+    for spec in specs:
+        name, _, options = spec.partition("=")
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown parameter '{name}', expected one of "
+                             f"{', '.join(PARAMETERS)}")
+        cast = PARAMETERS[name][1]
+        values[name] = [cast(option) for option in options.split(",")]
+    return [dict(zip(values, combination))
+            for combination in itertools.product(*values.values())]
+
+
+def frame_step(fps: float, analysis_interval: float) -> int:
+    """Video frames between analysed frames, as in `process_video`."""
+    return max(1, int(fps * analysis_interval))
+
+
+def is_analysed(frame_index: int, step: int) -> bool:
+    """
+    Whether `process_video` analyses a video frame: it counts frames from
+    1 and keeps the multiples of `step`, so 0-based indices step - 1,
+    2 * step - 1, ...
+    """
+    return (frame_index + 1) % step == 0
+
+
+def reference_moves(sgf_path: str) -> List[MoveTuple]:
+    """Moves of a reference SGF, without passes."""
+    with open(sgf_path, "r", encoding="utf-8", errors="replace") as f:
+        record = parse_sgf(f.read())
+    return [move for move in record.moves if move[0] != PASS]
+
+
+def detect_video(video_path: str, reference: str, cache_dir: str,
+                 intervals: List[float], conf: float) -> VideoDetections:
+    """
+    Runs YOLO once over a video, or reuses a previous sweep's run.
+
+    Frames are detected every `gcd` of the frame steps of `intervals`, so
+    the frames of every interval of the grid are among the cached ones.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = reduce(math.gcd, (frame_step(fps, interval)
+                             for interval in intervals))
+
+    base = cache_path(cache_dir, video_path, YOLO_PATH)
+    cache_file = base.with_name(f"{base.stem}_every{step}.npz")
+    info_file = cache_file.with_suffix(".json")
+    if cache_file.exists() and info_file.exists():
+        info = json.loads(info_file.read_text())
+        if info["conf"] <= conf:
+            cap.release()
+            print(f"{video_path}: reusing detections from {cache_file}")
+            return VideoDetections(video_path, str(cache_file),
+                                   reference_moves(reference), fps,
+                                   info["detector_s"], info["frames"])
+
+    # Imported here so replay-only sweeps do not need ultralytics
+    from ultralytics import YOLO
+    from logique.utils.cv_utils import decode_detections
+
+    model = YOLO(YOLO_PATH)
+    recorder = DetectionRecorder(conf)
+    start = time.perf_counter()
+    index = -1
+    while cap.grab():
+        index += 1
+        if not is_analysed(index, step):
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+        recorder.begin_frame(index, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+        recorder.add(decode_detections(model(frame, verbose=False,
+                                             conf=conf)))
+    cap.release()
+    detector_s = time.perf_counter() - start
+
+    recorder.save(cache_file)
+    info_file.write_text(json.dumps({"conf": conf, "fps": fps,
+                                     "frame_step": step,
+                                     "frames": len(recorder),
+                                     "detector_s": detector_s}))
+    print(f"{video_path}: {len(recorder)} frames detected in "
+          f"{detector_s:.1f}s")
+    return VideoDetections(video_path, str(cache_file),
+                           reference_moves(reference), fps, detector_s,
+                           len(recorder))
+
+
+def board_orientations(moves: List[MoveTuple]) -> List[List[MoveTuple]]:
+    """The moves under each of the 8 symmetries of the board."""
+    transforms = [
+        lambda r, c: (r, c), lambda r, c: (c, 18 - r),
+        lambda r, c: (18 - r, 18 - c), lambda r, c: (18 - c, r),
+        lambda r, c: (c, r), lambda r, c: (18 - r, c),
+        lambda r, c: (18 - c, 18 - r), lambda r, c: (r, 18 - c),
+    ]
+    return [[(*transform(row, col), player) for row, col, player in moves]
+            for transform in transforms]
+
+
+def sgf_accuracy(sgf: Optional[str], reference: List[MoveTuple]) -> float:
+    """In-order move accuracy of an SGF, in its best orientation."""
+    if not sgf:
+        return 0.0
+    predicted = [move for move in parse_sgf(sgf).moves if move[0] != PASS]
+    longest = max(len(reference), len(predicted))
+    if longest == 0:
+        return 1.0
+    return max(score_moves(reference, oriented)[0]
+               for oriented in board_orientations(predicted)) / longest
+
+
+_worker_model = None
+
+
+def _init_worker(model_path: Optional[str]):
+    """Loads the corrector model once per worker process."""
+    global _worker_model
+    if model_path is not None:
+        from logique.utils.model_utils import load_corrector_model
+        _worker_model = load_corrector_model(model_path)
+
+
+def _run_config(task: Tuple[VideoDetections, Dict[str, object]]
+                ) -> Dict[str, object]:
+    """Worker task: replays one video with one configuration."""
+    import sente
+    from logique.GoBoard import GoBoard
+    from logique.GoGame import GoGame
+    from logique.corrector_noAI import corrector_no_ai
+    from logique.utils.sgf_utils import to_sgf
+
+    video, config = task
+    start = time.perf_counter()
+    go_board = GoBoard(model_path=None, conf=config["yolo_conf"],
+                       duplicate_threshold=config["duplicate_threshold"],
+                       line_distance_threshold=config[
+                           "line_distance_threshold"])
+    go_game = GoGame(sente.Game(), go_board, _worker_model,
+                     transparent_mode=True,
+                     stabilizer_window=config["stabilizer_window"],
+                     beam_width=config["beam_width"])
+
+    step = frame_step(video.fps, config["analysis_interval"])
+    cache = DetectionCache(video.cache_file)
+    frames = 0
+    initialized = False
+    for frame_index, _, detections in cache.frames(config["yolo_conf"]):
+        if not is_analysed(frame_index, step):
+            continue
+        frames += 1
+        try:
+            if initialized:
+                go_game.main_loop(None, detections=detections)
+            else:
+                go_game.initialize_game(None, detections=detections)
+                initialized = True
+        except Exception:
+            continue
+    replay_s = time.perf_counter() - start
+
+    sgf = None
+    if len(go_game.numpy_board) >= 2:
+        try:
+            if config["corrector"] == "ai":
+                sgf = go_game.post_treatment(end_game=True)
+            else:
+                sgf = to_sgf(corrector_no_ai(go_game.numpy_board))
+        except Exception as e:
+            print(f"{video.name} {config}: correction failed: {e}")
+    correct_s = time.perf_counter() - start - replay_s
+
+    return {
+        "video": video.name,
+        "config": config,
+        "accuracy": sgf_accuracy(sgf, video.reference),
+        "frames": frames,
+        "states": len(go_game.numpy_board),
+        # YOLO time of the analysed frames, from the shared detector pass
+        "detector_s": (video.detector_s * frames / video.detected_frames
+                       if video.detected_frames else 0.0),
+        "replay_s": replay_s,
+        "correct_s": correct_s,
+    }
+
+
+def summarize(results: List[Dict[str, object]],
+              configs: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """
+    Mean accuracy and total cost of each configuration over videos,
+    best accuracy first, then cheapest (detector time included).
+    """
+    summary = []
+    for config in configs:
+        runs = [result for result in results if result["config"] == config]
+        frames = sum(run["frames"] for run in runs)
+        stages = {stage: sum(run[stage] for run in runs)
+                  for stage in ("detector_s", "replay_s", "correct_s")}
+        total = sum(stages.values())
+        summary.append({
+            **config,
+            "accuracy": sum(run["accuracy"] for run in runs) / len(runs),
+            "frames": frames,
+            **stages,
+            "total_s": total,
+            "ms/frame": total / frames * 1e3 if frames else 0.0,
+        })
+    summary.sort(key=lambda row: (-row["accuracy"], row["total_s"]))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--video", nargs=2, action="append", required=True,
+                        metavar=("VIDEO", "REFERENCE_SGF"))
+    parser.add_argument("--param", action="append", default=[],
+                        help="name=v1,v2,... (" + ", ".join(PARAMETERS) +
+                             ")")
+    parser.add_argument("--cache-dir", default="sweep_cache")
+    parser.add_argument("--model", default=KERAS_PATH,
+                        help="Corrector model, for corrector=ai")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default="sweep_report.json")
+    args = parser.parse_args()
+
+    configs = parse_grid(args.param)
+    intervals = sorted({config["analysis_interval"] for config in configs})
+    min_conf = min(config["yolo_conf"] for config in configs)
+    videos = [detect_video(video, reference, args.cache_dir, intervals,
+                           min_conf)
+              for video, reference in args.video]
+
+    tasks = [(video, config) for video in videos for config in configs]
+    model_path = (args.model if any(config["corrector"] == "ai"
+                                    for config in configs) else None)
+    print(f"Running {len(configs)} configurations on {len(videos)} "
+          f"videos ({len(tasks)} runs)")
+    start = time.perf_counter()
+    if args.workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(
+            max_workers=min(args.workers, len(tasks)),
+            mp_context=multiprocessing.get_context(POOL_START_METHOD),
+            initializer=_init_worker, initargs=(model_path,)
+        ) as executor:
+            results = list(executor.map(_run_config, tasks))
+    else:
+        _init_worker(model_path)
+        results = [_run_config(task) for task in tasks]
+    sweep_s = time.perf_counter() - start
+
+    summary = summarize(results, configs)
+    report = {
+        "revision": git_revision(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "videos": [{"video": video.name, "cache": video.cache_file,
+                    "fps": video.fps, "reference_moves": len(video.reference),
+                    "detector_s": video.detector_s,
+                    "detected_frames": video.detected_frames}
+                   for video in videos],
+        "sweep_s": sweep_s,
+        "summary": summary,
+        "runs": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+
+    print_report("Shared detector pass (charged per analysed frame)",
+                 [{"video": video.name, "frames": video.detected_frames,
+                   "detector_s": video.detector_s} for video in videos])
+    print_report(f"Configurations ({len(videos)} videos, best first)",
+                 summary)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
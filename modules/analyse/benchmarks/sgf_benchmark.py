@@ -0,0 +1,101 @@
+"""
+SGF export benchmark.
+
+Compares the original export, which replays every move through a sente
+game before dumping it, with the direct `SGFWriter`, with and without
+rule validation, and with a live export that appends one move at a time.
+Games are random legal 300-move games with captures. The sente baseline
+is skipped when sente is not installed.
+
+Usage (from modules/analyse):
+    python -m benchmarks.sgf_benchmark [--moves 300] [--games 5]
+"""
+
+import argparse
+
+import numpy as np
+
+from logique.utils import go_rules
+from logique.utils.sgf_writer import SGFWriter, moves_to_sgf
+from benchmarks.common import print_report, time_call
+
+try:
+    import sente
+    from sente import sgf
+except ImportError:
+    sente = None
+
+
+def legacy_to_sgf(move_list):
+    """The sente replay used before, kept here as the baseline."""
+    game = sente.Game()
+    for row, col, _ in move_list:
+        game.play(row + 1, col + 1)
+    return sgf.dumps(game)
+
+
+def make_game(num_moves: int, rng: np.random.Generator):
+    """Random legal moves, alternating from Black."""
+    board = np.zeros((19, 19), dtype=np.uint8)
+    ko = None
+    moves = []
+    while len(moves) < num_moves:
+        player = len(moves) % 2 + 1
+        row, col = (int(v) for v in rng.integers(0, 19, size=2))
+        try:
+            board, _, ko = go_rules.play(board, row, col, player, ko)
+        except ValueError:
+            continue
+        moves.append((row, col, player))
+    return moves
+
+
+def live_export(move_list):
+    """Appends each move and reads the SGF back, as live mode does."""
+    writer = SGFWriter()
+    for row, col, _ in move_list:
+        writer.append(row, col)
+        writer.getvalue()
+    return writer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--moves", type=int, default=300)
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    games = [make_game(args.moves, rng) for _ in range(args.games)]
+
+    def export_all(export):
+        return lambda: [export(moves) for moves in games]
+
+    rows = []
+    if sente is not None:
+        rows.append({
+            "export": "sente replay",
+            "us/game": time_call(export_all(legacy_to_sgf),
+                                 args.repeat) / len(games),
+            "same as sente": True,
+        })
+    for name, export in (
+        ("writer", moves_to_sgf),
+        ("writer + validate",
+         lambda moves: moves_to_sgf(moves, validate=True)),
+        ("live append", live_export),
+    ):
+        same = (all(export(moves) == legacy_to_sgf(moves) for moves in games)
+                if sente is not None else "-")
+        rows.append({
+            "export": name,
+            "us/game": time_call(export_all(export),
+                                 args.repeat) / len(games),
+            "same as sente": same,
+        })
+    print_report(f"SGF export ({args.moves} moves)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+SGF to timeline benchmark.
+
+Compares the original `sgf_to_numpy`, which replays the game in sente
+and fills every state with a 361-cell Python loop, with the bitboard
+converter, and times the conversion of a whole directory with 1 and N
+worker processes. Games are random legal games with captures. The sente
+baseline is skipped when sente is not installed or fails.
+
+Usage (from modules/analyse):
+    python -m benchmarks.sgf_timeline_benchmark [--games 200] [--workers 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from logique.utils.sgf_timeline import (
+    convert_sgf_directory, sgf_text_to_timeline, sgf_to_timeline
+)
+from logique.utils.sgf_utils import sgf_to_numpy
+from logique.utils.sgf_writer import moves_to_sgf
+from benchmarks.common import print_report, time_call
+from benchmarks.sgf_benchmark import make_game
+
+try:
+    from sente import sgf
+except ImportError:
+    sgf = None
+
+
+def legacy_sgf_to_numpy(sgf_file_path):
+    """The sente replay used before, kept here as the baseline."""
+    game = sgf.load(sgf_file_path)
+    moves = game.get_default_sequence()
+    num_moves = len(moves)
+    result = np.zeros((num_moves + 1, 19, 19), dtype=int)
+    for i in range(1, num_moves + 1):
+        game.play(moves[i - 1])
+        black_stones_np = game.numpy(["black_stones"])
+        white_stones_np = game.numpy(["white_stones"])
+        for row in range(19):
+            for col in range(19):
+                if black_stones_np[col][row][0] == 1:
+                    result[i, row, col] = 1
+                elif white_stones_np[col][row][0] == 1:
+                    result[i, row, col] = 2
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--moves", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = [moves_to_sgf(make_game(args.moves, rng))
+             for _ in range(args.games)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sgf_dir = os.path.join(tmp, "sgf")
+        os.mkdir(sgf_dir)
+        for i, text in enumerate(texts):
+            with open(os.path.join(sgf_dir, f"game{i:05d}.sgf"), "w") as f:
+                f.write(text)
+        first = os.path.join(sgf_dir, "game00000.sgf")
+
+        rows = []
+        if sgf is not None:
+            try:
+                legacy = time_call(lambda: legacy_sgf_to_numpy(first), 1)
+                same = np.array_equal(legacy_sgf_to_numpy(first),
+                                      sgf_to_numpy(first))
+                rows.append({"stage": "sente sgf_to_numpy",
+                             "ms/game": legacy / 1e3,
+                             "states/s": (args.moves + 1) / legacy * 1e6})
+            except Exception as e:
+                print(f"sente baseline skipped: {e}")
+                same = "-"
+        else:
+            same = "-"
+        for stage, convert in (
+            ("bitboard sgf_to_timeline", lambda: sgf_to_timeline(first)),
+            ("sgf_to_numpy", lambda: sgf_to_numpy(first)),
+            ("from text (no file I/O)",
+             lambda: sgf_text_to_timeline(texts[0])),
+        ):
+            elapsed = time_call(convert, args.repeat)
+            rows.append({"stage": stage, "ms/game": elapsed / 1e3,
+                         "states/s": (args.moves + 1) / elapsed * 1e6})
+
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            dataset = convert_sgf_directory(
+                sgf_dir, os.path.join(tmp, f"dataset{workers}"), workers
+            )
+            elapsed = time.perf_counter() - start
+            rows.append({
+                "stage": f"directory workers={workers}",
+                "ms/game": elapsed / len(dataset) * 1e3,
+                "states/s": dataset.num_states / elapsed,
+            })
+    print_report(f"SGF to timeline ({args.moves} moves)", rows)
+    print(f"Same result as sente: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Board stabilizer benchmark.
+
+Simulates per-frame detector output for a game (each position held for
+several frames, with single-frame flicker and short hand occlusions) and
+reports, per stabilizer window, how many timeline states are recorded,
+how many transitions would be sent to the AI corrector, and the cost of
+the stabilizer per frame.
+
+Usage (from modules/analyse):
+    python -m benchmarks.stabilizer_benchmark [--moves 300]
+"""
+
+import argparse
+from typing import List
+
+import numpy as np
+
+from logique.corrector_noAI import differences
+from logique.utils.stabilizer import BoardStabilizer
+from logique.utils.zobrist import zobrist_hash
+from benchmarks.common import make_timeline, print_report, time_call
+
+
+def simulate_frames(num_moves: int, seed: int = 0,
+                    flicker_prob: float = 0.15,
+                    occlusion_prob: float = 0.03) -> List[np.ndarray]:
+    """Per-frame noisy detections of a clean game timeline."""
+    rng = np.random.default_rng(seed)
+    positions = make_timeline(num_moves, seed, keep_prob=1.0,
+                              removal_prob=0.0, displacement_prob=0.0)
+    frames = []
+    occluded = 0
+    for position in positions:
+        for _ in range(rng.integers(5, 15)):
+            frame = position.copy()
+            if rng.random() < flicker_prob:
+                frame.flat[rng.integers(361)] = rng.integers(3)
+            if occluded == 0 and rng.random() < occlusion_prob:
+                occluded = 2
+                row, col = rng.integers(0, 15, size=2)
+            if occluded:
+                frame[row:row + 4, col:col + 4] = 0
+                occluded -= 1
+            frames.append(frame)
+    return frames
+
+
+def record_states(frames: List[np.ndarray], window: int) -> List[np.ndarray]:
+    """Replicates GoGame.copy_board_to_numpy with a given window."""
+    stabilizer = BoardStabilizer(window) if window > 1 else None
+    states, last_hash = [], None
+    for frame in frames:
+        board = stabilizer.update(frame) if stabilizer else frame
+        board_hash = zobrist_hash(board)
+        if board_hash != last_hash:
+            states.append(board.copy())
+            last_hash = board_hash
+    if stabilizer and not np.array_equal(stabilizer.flush(), states[-1]):
+        states.append(stabilizer.state.copy())
+    return states
+
+
+def count_ambiguous(states: List[np.ndarray]) -> int:
+    """Transitions that corrector_with_ai would hand to the model."""
+    turn, ambiguous = 1, 0
+    for i in range(1, len(states)):
+        diff_data, num_added = differences(states[i - 1], states[i])
+        if num_added == 0:
+            continue
+        added, added_other = diff_data[turn]["add"], diff_data[3 - turn]["add"]
+        if len(added) == 1 and not added_other:
+            turn = 3 - turn
+        else:
+            ambiguous += 1
+    return ambiguous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--moves", type=int, default=300)
+    args = parser.parse_args()
+
+    frames = simulate_frames(args.moves)
+    rows = []
+    for window in (1, 3, 5, 7):
+        states = record_states(frames, window)
+        stabilizer = BoardStabilizer(window)
+        rows.append({
+            "window": window,
+            "frames": len(frames),
+            "states": len(states),
+            "ambiguous": count_ambiguous(states),
+            "us/frame": time_call(
+                lambda: [stabilizer.update(f) for f in frames[:500]], 3
+            ) / 500,
+        })
+    print_report(f"Stabilizer ({args.moves} moves)", rows)
+
+
+if __name__ == "__main__":
+    main()
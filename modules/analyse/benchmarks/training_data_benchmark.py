@@ -0,0 +1,82 @@
+"""
+Training data generation benchmark.
+
+Converts random legal games to a TimelineDataset, then times sample
+generation per game, shard writing with 1 and N worker processes, and
+streaming model batches back from the memory-mapped shards.
+
+Usage (from modules/analyse):
+    python -m benchmarks.training_data_benchmark [--games 200] [--workers 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from logique.utils.sgf_timeline import convert_sgf_directory
+from logique.utils.sgf_writer import moves_to_sgf
+from logique.utils.training_data import (
+    NoiseConfig, game_samples, iter_batches, load_shard,
+    write_training_shards
+)
+from benchmarks.common import print_report, time_call
+from benchmarks.sgf_benchmark import make_game
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--moves", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--games-per-shard", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        sgf_dir = os.path.join(tmp, "sgf")
+        os.mkdir(sgf_dir)
+        for i in range(args.games):
+            with open(os.path.join(sgf_dir, f"game{i:05d}.sgf"), "w") as f:
+                f.write(moves_to_sgf(make_game(args.moves, rng)))
+        dataset_dir = os.path.join(tmp, "dataset")
+        dataset = convert_sgf_directory(sgf_dir, dataset_dir, 1)
+
+        num_samples = len(game_samples(dataset[0], NoiseConfig(),
+                                       np.random.default_rng(0)))
+        elapsed = time_call(lambda: game_samples(
+            dataset[0], NoiseConfig(), np.random.default_rng(0)
+        ), 5)
+        rows = [{"stage": "game_samples (one game)",
+                 "ms": elapsed / 1e3,
+                 "samples/s": num_samples / elapsed * 1e6}]
+
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            shards = write_training_shards(
+                dataset_dir, os.path.join(tmp, f"shards{workers}"),
+                games_per_shard=args.games_per_shard, num_workers=workers
+            )
+            elapsed = time.perf_counter() - start
+            num_samples = sum(len(load_shard(shard)) for shard in shards)
+            rows.append({"stage": f"write shards workers={workers}",
+                         "ms": elapsed * 1e3,
+                         "samples/s": num_samples / elapsed})
+
+        for seed in (None, 0):
+            start = time.perf_counter()
+            for _ in iter_batches(shards, args.batch_size, seed):
+                pass
+            elapsed = time.perf_counter() - start
+            rows.append({"stage": "iter_batches" +
+                                  (" shuffled" if seed is not None else ""),
+                         "ms": elapsed * 1e3,
+                         "samples/s": num_samples / elapsed})
+    print_report(f"Training data ({args.games} games)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,33 @@ PORT = 5000
 # -------------------------------
 ANALYSIS_INTERVAL = 0.1  # seconds
 MAX_INIT_FRAMES = 300
+# Classify locked-grid frames with the lightweight stone classifier and
+# only run YOLO every YOLO_REFRESH_INTERVAL frames or when it is unsure
+FAST_CLASSIFIER_MODE = False
+YOLO_REFRESH_INTERVAL = 30
+# Follow the board corners with optical flow between YOLO passes
+CORNER_TRACKING = False
+# Frames an intersection is majority-voted over before a change is kept
+# (1 disables the stabilizer)
+STABILIZER_WINDOW = 1
+# Move sequences kept per corrector gap; 1 is the fastest (greedy), larger
+# widths are more accurate but make each model batch proportionally bigger
+CORRECTOR_BEAM_WIDTH = 1
+# Correct the timeline while the video is analysed, filling gaps in
+# batches of this many (0 runs the whole correction at the end)
+STREAMING_WINDOW = 0
+# Processes correcting segments of the timeline in parallel at the end
+POST_TREATMENT_WORKERS = 1
+# YOLO confidence threshold
+YOLO_CONF = 0.15
+# Grid lines closer than this (pixels, all 4 coordinates) are merged
+DUPLICATE_LINE_THRESHOLD = 10.0
+# Tolerance (pixels) on grid line spacings when restoring missing lines
+LINE_DISTANCE_THRESHOLD = 10.0
+# Save the raw YOLO detections of each analysed video, and replay them
+# instead of running YOLO when the same video is analysed again with the
+# same model (see logique/utils/detection_cache.py)
+CACHE_DETECTIONS = False
 
 # -------------------------------
 # PATH & DIRECTORIES
@@ -20,6 +47,7 @@ YOLO_PATH = os.path.join("models", "model.pt")
 KERAS_PATH = os.path.join("models", "modelCNN.keras")
 UPLOAD_DIR = "/app/uploads" # Correspond au montage Docker
 VIDEO_DIR = os.path.join(UPLOAD_DIR, "videos")
+DETECTION_CACHE_DIR = os.path.join(UPLOAD_DIR, "detections")
 
 # -------------------------------
 # LOGGING SETUP 
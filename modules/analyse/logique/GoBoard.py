@@ -2,16 +2,22 @@
 Board detection and state extraction from camera frames.
 """
 
+import logging
 import math
-import copy
+import time
 import cv2
 import numpy as np
 from ultralytics import YOLO
 from .utils.cv_utils import (
+    BLACK_STONE, WHITE_STONE, decode_detections, warp_key_points,
     get_corners, detect_lines, removeDuplicates,
     restore_and_remove_lines, add_lines_in_the_edges,
     get_key_points, detect_intersections, map_intersections
 )
+from .utils.corner_tracker import CornerTracker
+from .utils.stone_classifier import StoneClassifier
+
+logger = logging.getLogger(__name__)
 
 
 class GoBoard:
@@ -22,28 +28,91 @@ class GoBoard:
     detects grid lines and stones, and maps stones to intersections.
     """
 
-    def __init__(self, model_path):
+    def __init__(self, model_path, fast_mode=False, yolo_interval=30,
+                 track_corners=False, conf=0.15, duplicate_threshold=10.0,
+                 line_distance_threshold=10.0):
         """
         Initialize the GoBoard detector.
 
         Args:
-            model_path: File path to the YOLO model
+            model_path: File path to the YOLO model, or None to only
+                replay cached detections (see `replay_detections`)
+            fast_mode: Once the grid is found, classify intersections with
+                the lightweight StoneClassifier and only run YOLO
+                periodically or when the classifier is unsure
+            yolo_interval: Max consecutive classifier-only frames in
+                fast mode
+            track_corners: Follow the board corners with optical flow
+                between YOLO passes, so fast mode survives camera motion
+                and failed corner detections can use tracked corners
+            conf: YOLO confidence threshold
+            duplicate_threshold: Max coordinate difference of grid lines
+                merged as duplicates
+            line_distance_threshold: Tolerance on the spacing between
+                grid lines being a multiple of the grid spacing
         """
-        self.model = YOLO(model_path)
+        self.model = YOLO(model_path) if model_path is not None else None
+        self.conf = conf
+        self.duplicate_threshold = duplicate_threshold
+        self.line_distance_threshold = line_distance_threshold
+        # Optional DetectionRecorder fed with every YOLO pass on a frame
+        self.recorder = None
+        self.fast_mode = fast_mode
+        self.yolo_interval = yolo_interval
+        self.classifier = StoneClassifier()
+        self.frames_since_yolo = 0
+        self.track_corners = track_corners
+        self.tracker = CornerTracker()
         self.frame = None
-        self.transformed_image = None
-        self.annotated_frame = None
+        self.results = None
+        self.detections = None
         self.state = None
+        # Reused every frame; `state` points at _state_buffer once set
+        self._state_buffer = np.zeros((19, 19, 2), dtype=np.uint8)
+        self._board_buffer = np.zeros((19, 19), dtype=np.uint8)
         self.padding = 30
+        self.output_edge = 600
+        self.corners = None
         self.perspective_matrix = None
+        self.grid_points = None
         self.map = None
+        self.stage_timings = {}
+        # Last good corner set, reused while corner detection is poor
+        self.last_corners = None
+        self.corner_reuse_count = 0
+        self.max_corner_reuse = 10
+        # Debug/preview images, rendered on first access
+        self._warp_source = None
+        self._transformed_image = None
+        self._annotated_frame = None
+
+    @property
+    def transformed_image(self):
+        """Top-down view of the board for the last frame (lazy)."""
+        if self._transformed_image is None and self._warp_source is not None:
+            self._transformed_image = cv2.warpPerspective(
+                self._warp_source, self.perspective_matrix,
+                (self.output_edge, self.output_edge)
+            )
+        return self._transformed_image
+
+    @property
+    def annotated_frame(self):
+        """Last frame with the YOLO detections drawn on it (lazy)."""
+        if self._annotated_frame is None and self.results is not None:
+            self._annotated_frame = self.results[0].plot(labels=False,
+                                                         conf=False)
+        return self._annotated_frame
 
     def state_to_array(self):
         """
         Convert internal 19x19x2 state to simple 19x19 array.
 
+        The returned array is a buffer reused on every call; copy it to
+        keep it beyond the next frame.
+
         Returns:
-            np.array: 19x19 array where 0=empty, 1=black, 2=white
+            np.array: 19x19 uint8 array where 0=empty, 1=black, 2=white
 
         Raises:
             ValueError: If state hasn't been set
@@ -53,19 +122,67 @@ class GoBoard:
                 "The board state is not set. Process a frame first."
             )
 
-        board_array = np.zeros((19, 19), dtype=int)
-        board_array[self.state[:, :, 0] == 1] = 1
-        board_array[self.state[:, :, 1] == 1] = 2
+        board_array = self._board_buffer
+        # White (2) wins over black (1) if both were assigned
+        np.multiply(self.state[:, :, 1], 2, out=board_array)
+        np.maximum(board_array, self.state[:, :, 0], out=board_array)
         return board_array
 
     def get_state(self):
-        """Get deep copy of current 19x19x2 board state."""
-        return copy.deepcopy(self.state)
+        """Get a copy of current 19x19x2 uint8 board state."""
+        return None if self.state is None else self.state.copy()
+
+    def find_corners(self, cacheable=True):
+        """
+        Get the board corners of the current detections.
+
+        When detection fails, the last good corner set is reused for up to
+        `max_corner_reuse` consecutive frames before giving up.
+
+        Args:
+            cacheable: Whether the corners are in original-frame
+                coordinates and may be cached/reused
+        """
+        try:
+            corners = get_corners(self.detections, 0)
+        except Exception as e:
+            if cacheable and self.tracker.active:
+                tracked = self.tracker.track(self.frame)
+                if tracked is not None:
+                    logger.debug(f"Corner detection failed ({e}), "
+                                 "using tracked corners")
+                    return tracked
+            if (not cacheable or self.last_corners is None or
+                    self.corner_reuse_count >= self.max_corner_reuse):
+                raise
+            self.corner_reuse_count += 1
+            logger.debug(f"Corner detection failed ({e}), reusing last "
+                         f"corners ({self.corner_reuse_count}/"
+                         f"{self.max_corner_reuse})")
+            return self.last_corners
+
+        if cacheable:
+            self.last_corners = corners
+            self.corner_reuse_count = 0
+        return corners
+
+    def set_corners(self, corners):
+        """Update the corners and the matching perspective matrix."""
+        output_edge = self.output_edge
+        out_pts = np.array([
+            [0, 0], [output_edge, 0],
+            [output_edge, output_edge], [0, output_edge]
+        ], dtype=np.float32)
+
+        self.corners = corners
+        self.perspective_matrix = cv2.getPerspectiveTransform(
+            corners, out_pts
+        )
 
     def apply_perspective_transformation(self, double_transform=False):
         """Warp input frame to get flat, top-down view of board."""
         if double_transform:
-            input_points = get_corners(self.results, self.padding)
+            input_points = get_corners(self.detections, self.padding)
             output_edge = 600 + self.padding * 2
             out_pts = np.array([
                 [0, 0], [output_edge, 0],
@@ -79,31 +196,23 @@ class GoBoard:
                 self.frame, perspective_matrix, (output_edge, output_edge)
             )
             self.results = self.model(first_transformed_image, verbose=False)
+            self.detections = decode_detections(self.results)
         else:
             first_transformed_image = self.frame
 
-        self.annotated_frame = self.results[0].plot(labels=False, conf=False)
-
-        input_points = get_corners(self.results, 0)
-        output_edge = 600
-        out_pts = np.array([
-            [0, 0], [output_edge, 0],
-            [output_edge, output_edge], [0, output_edge]
-        ], dtype=np.float32)
-
-        self.perspective_matrix = cv2.getPerspectiveTransform(
-            input_points, out_pts
-        )
-        self.transformed_image = cv2.warpPerspective(
-            first_transformed_image, self.perspective_matrix,
-            (output_edge, output_edge)
-        )
+        input_points = self.find_corners(cacheable=not double_transform)
+        self.set_corners(input_points)
+        # Only keep a reference; the warp itself happens on demand
+        self._warp_source = first_transformed_image
+        self._transformed_image = None
+        self._annotated_frame = None
 
     def assign_stones(self, white_stones_transf, black_stones_transf,
                       transformed_intersections):
         """Assign detected stones to nearest grid intersection."""
         self.map = map_intersections(transformed_intersections)
-        self.state = np.zeros((19, 19, 2))
+        self._state_buffer.fill(0)
+        self.state = self._state_buffer
 
         for stone in white_stones_transf:
             nearest_corner = self.find_nearest_corner(
@@ -134,29 +243,153 @@ class GoBoard:
 
         return nearest_corner
 
+    def _record_stage(self, stage, start):
+        """Store the seconds elapsed since `start` under `stage`."""
+        now = time.perf_counter()
+        self.stage_timings[stage] = now - start
+        return now
+
     def process_frame(self, frame):
+        """
+        Extract the board state from a single frame.
+
+        In fast mode, frames are classified from the locked grid when
+        possible; otherwise the full YOLO pipeline runs (and re-locks).
+        """
+        if self.fast_mode and self.classify_frame(frame):
+            return
+        self.detect_frame(frame)
+        if self.fast_mode or self.track_corners:
+            self.lock_grid()
+
+    def classify_frame(self, frame):
+        """
+        Try to read the board with the StoneClassifier.
+
+        Returns:
+            bool: False if YOLO is due, no grid is locked or any
+                intersection was classified with low confidence
+        """
+        if (not self.classifier.locked or
+                self.frames_since_yolo >= self.yolo_interval or
+                frame.shape != self.classifier.frame_shape):
+            return False
+
+        start = time.perf_counter()
+        if self.track_corners:
+            corners = self.tracker.track(frame)
+            if corners is None:
+                logger.debug("Corner tracking lost, running YOLO.")
+                return False
+            if np.abs(corners - self.corners).max() > 0.25:
+                self.set_corners(corners)
+                self.classifier.set_grid(frame.shape, self.grid_points,
+                                         self.perspective_matrix)
+
+        board_array, confidence = self.classifier.classify(frame)
+        if confidence.min() < self.classifier.min_confidence:
+            logger.debug("Low classifier confidence, running YOLO.")
+            return False
+
+        self.stage_timings = {}
+        self.frame = frame
+        self.results = None
+        self.detections = None
+        self._warp_source = frame
+        self._transformed_image = None
+        self._annotated_frame = None
+        np.equal(board_array, 1, out=self._state_buffer[:, :, 0])
+        np.equal(board_array, 2, out=self._state_buffer[:, :, 1])
+        self.state = self._state_buffer
+        self.frames_since_yolo += 1
+        self._record_stage("classifier", start)
+        return True
+
+    def lock_grid(self):
+        """
+        Cache the current grid, calibrate the StoneClassifier and restart
+        corner tracking from the current frame.
+        """
+        self.frames_since_yolo = 0
+        if self.map is None or len(self.map) != 361:
+            self.grid_points = None
+            self.classifier.unlock()
+            self.tracker.stop()
+            return
+
+        self.grid_points = np.empty((19, 19, 2))
+        for (x, y), (col, row) in self.map.items():
+            self.grid_points[row, col] = (x, y)
+
+        if self.fast_mode:
+            self.classifier.lock(self.frame, self.grid_points,
+                                 self.perspective_matrix,
+                                 self.state_to_array())
+        if self.track_corners:
+            # Every third line of the grid, mapped back into the frame
+            sparse = self.grid_points[::3, ::3].reshape(1, -1, 2)
+            frame_points = cv2.perspectiveTransform(
+                sparse.astype(np.float32),
+                np.linalg.inv(self.perspective_matrix)
+            ).reshape(-1, 2)
+            self.tracker.reset(self.frame, self.corners, frame_points)
+
+    def detect_frame(self, frame):
         """Run full detection pipeline on a single frame."""
+        self.stage_timings = {}
+        start = time.perf_counter()
         self.frame = frame
-        self.results = self.model(self.frame, verbose=False, conf=0.15)
+        self.results = self.model(self.frame, verbose=False, conf=self.conf)
+        self.detections = decode_detections(self.results)
+        if self.recorder is not None:
+            self.recorder.add(self.detections)
+        self._record_stage("detection", start)
+        self.locate_stones()
+
+    def replay_detections(self, detections, frame=None):
+        """
+        Run the pipeline after YOLO on cached detections.
+
+        Args:
+            detections: DETECTION_DTYPE array, as `decode_detections`
+                returns it (see detection_cache)
+            frame: The video frame, if available; only needed for the
+                preview images
+        """
+        self.stage_timings = {}
+        self.frame = frame
+        self.results = None
+        self.detections = detections
+        self.locate_stones()
+
+    def locate_stones(self):
+        """Find the grid in the current detections and assign stones."""
+        start = time.perf_counter()
         self.apply_perspective_transformation(double_transform=False)
+        warp_key_points(self.detections, self.perspective_matrix)
+        start = self._record_stage("perspective", start)
 
-        vertical_lines, horizontal_lines = detect_lines(
-            self.results, self.perspective_matrix
-        )
+        vertical_lines, horizontal_lines = detect_lines(self.detections)
 
-        vertical_lines = removeDuplicates(vertical_lines)
-        horizontal_lines = removeDuplicates(horizontal_lines)
-        vertical_lines = restore_and_remove_lines(vertical_lines)
-        horizontal_lines = restore_and_remove_lines(horizontal_lines)
+        duplicates = self.duplicate_threshold
+        vertical_lines = removeDuplicates(vertical_lines, duplicates)
+        horizontal_lines = removeDuplicates(horizontal_lines, duplicates)
+        vertical_lines = restore_and_remove_lines(
+            vertical_lines, self.line_distance_threshold
+        )
+        horizontal_lines = restore_and_remove_lines(
+            horizontal_lines, self.line_distance_threshold
+        )
         vertical_lines = add_lines_in_the_edges(vertical_lines,
                                                 "vertical")
         horizontal_lines = add_lines_in_the_edges(horizontal_lines,
                                                   "horizontal")
-        vertical_lines = removeDuplicates(vertical_lines)
-        horizontal_lines = removeDuplicates(horizontal_lines)
+        vertical_lines = removeDuplicates(vertical_lines, duplicates)
+        horizontal_lines = removeDuplicates(horizontal_lines, duplicates)
+        start = self._record_stage("lines", start)
 
-        black_stones = get_key_points(self.results, 0, self.perspective_matrix)
-        white_stones = get_key_points(self.results, 6, self.perspective_matrix)
+        black_stones = get_key_points(self.detections, BLACK_STONE)
+        white_stones = get_key_points(self.detections, WHITE_STONE)
 
         vertical_lines = np.array(vertical_lines)
         horizontal_lines = np.array(horizontal_lines)
@@ -176,7 +409,7 @@ class GoBoard:
             )
 
         intersections = detect_intersections(
-            cluster_1, cluster_2, self.transformed_image
+            cluster_1, cluster_2, (self.output_edge, self.output_edge)
         )
 
         if len(intersections) == 0:
@@ -187,3 +420,4 @@ class GoBoard:
                 )
 
         self.assign_stones(white_stones, black_stones, intersections)
+        self._record_stage("stones", start)
@@ -10,8 +10,14 @@ import numpy as np
 import sente
 
 from .GoBoard import GoBoard
+from .corrector_streaming import StreamingCorrector
 from .corrector_withAI import corrector_with_ai
+from .utils import go_rules
 from .utils.sgf_utils import to_sgf
+from .utils.bitboard import Bitboard, iter_points
+from .utils.sgf_writer import SGFWriter
+from .utils.stabilizer import BoardStabilizer
+from .utils.zobrist import update_hash, zobrist_hash
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +28,12 @@ class GoGame:
     def __init__(self, game: sente.Game,
                  board_detect: GoBoard,
                  corrector_model: keras.Model,
-                 transparent_mode: bool = False):
+                 transparent_mode: bool = False,
+                 stabilizer_window: int = 1,
+                 beam_width: int = 1,
+                 streaming_window: int = 0,
+                 post_treatment_workers: int = 1,
+                 corrector_model_path: Optional[str] = None):
         """
         Initialize the GoGame manager.
 
@@ -31,21 +42,64 @@ class GoGame:
             board_detect: GoBoard detection instance
             corrector_model: AI model for move correction
             transparent_mode: Whether to use transparent mode
+            stabilizer_window: Number of frames an intersection is voted
+                over before a change is recorded (1 disables it)
+            beam_width: Gap-filling beam width used in post-treatment
+                (1 is greedy)
+            streaming_window: If > 0, correct the timeline while it is
+                recorded, filling gaps in batches of this size, so
+                partial SGFs are available before the end (0 corrects
+                everything in post-treatment)
+            post_treatment_workers: Processes used to correct long
+                timelines in post-treatment
+            corrector_model_path: Path of the corrector model, loaded by
+                each post-treatment worker
         """
         self.moves: List[Tuple[str, Tuple[int, int]]] = []
         self.board_detect = board_detect
         self.game = game
         self.corrector_model = corrector_model
+        self.beam_width = beam_width
+        self.post_treatment_workers = post_treatment_workers
+        self.corrector_model_path = corrector_model_path
         self.current_player: Optional[str] = None
         self.transparent_mode = transparent_mode
         self.recent_moves_buffer: List[Dict] = []
         self.buffer_size = 5
         self.numpy_board: List[np.ndarray] = []
+        # Zobrist hash of each numpy_board state, and where each
+        # position appears in the timeline
+        self.state_hashes: List[int] = []
+        self.position_index: Dict[int, List[int]] = {}
+        self.stabilizer: Optional[BoardStabilizer] = (
+            BoardStabilizer(stabilizer_window)
+            if stabilizer_window > 1 else None
+        )
+        self.streaming_corrector: Optional[StreamingCorrector] = (
+            StreamingCorrector(corrector_model, streaming_window, beam_width)
+            if streaming_window > 0 else None
+        )
+        self._partial_sgf = SGFWriter()
         self.frame: Optional[np.ndarray] = None
-    
-    def initialize_game(self, frame: np.ndarray,
+        # Live mode: mirror of sente's board as (col, row, (B, W)), kept up
+        # to date from the played moves with go_rules. sente is only read
+        # once at the start, or if the rules engine ever disagrees
+        self.mirror = np.zeros((19, 19, 2), dtype=np.int8)
+        self._mirror_dirty = True
+        self._live_board = Bitboard()
+        self._live_ko: Optional[Tuple[int, int]] = None
+        # (board, ko) before each move or pass, restored on undo
+        self._live_history: List[Tuple[Bitboard,
+                                       Optional[Tuple[int, int]]]] = []
+        self._last_detected_key: Optional[bytes] = None
+        self._game_version = 0
+        self._sgf_cache: Optional[Tuple[int, str]] = None
+        self._pending_undos = 0
+
+    def initialize_game(self, frame: Optional[np.ndarray],
                         current_player: str = "BLACK",
-                        end_game: bool = False) -> str:
+                        end_game: bool = False,
+                        detections: Optional[np.ndarray] = None) -> str:
         """
         Initialize the game state from a single frame.
 
@@ -53,6 +107,8 @@ class GoGame:
             frame: The video frame to initialize from
             current_player: "BLACK" or "WHITE"
             end_game: Flag for post-processing logic
+            detections: Cached YOLO detections of the frame; when given,
+                YOLO is skipped and the frame may be None
 
         Returns:
             sgf_text
@@ -61,7 +117,7 @@ class GoGame:
         self.current_player = current_player
         self.frame = frame
 
-        self.board_detect.process_frame(frame)
+        self._read_board(frame, detections)
 
         if self.transparent_mode:
             self.copy_board_to_numpy()
@@ -70,7 +126,7 @@ class GoGame:
             try:
                 self.setup_initial_position()
                 if not self.game.get_active_player().name == current_player:
-                    self.game.pss()
+                    self.pass_turn()
                 return self.get_sgf()
             except Exception as e:
                 logger.warning(f"Could not setup position: {e}. "
@@ -114,7 +170,7 @@ class GoGame:
                         self.play_move(x, y, color)
                         current_color = 3 - current_color  # Switch player
                     else:
-                        self.game.pss()
+                        self.pass_turn()
                         self.play_move(x, y, color)
                         current_color = 3 - current_color  # Switch player
                 except Exception as e:
@@ -126,36 +182,104 @@ class GoGame:
                 "Use transparent mode."
             )
 
-    def main_loop(self, frame: np.ndarray,
-                  end_game: bool = False) -> str:
+    def main_loop(self, frame: Optional[np.ndarray],
+                  end_game: bool = False,
+                  detections: Optional[np.ndarray] = None) -> str:
         """
         Process a single frame and update the game state.
 
         Args:
             frame: Input video frame
             end_game: Whether this is the final frame
+            detections: Cached YOLO detections of the frame; when given,
+                YOLO is skipped and the frame may be None
 
         Returns:
-            sgf_text
+            sgf_text: In live mode, only on the end_game frame; use the
+                deltas of live_step() per frame and get_sgf() on request.
         """
-        self.frame = frame
-        self.board_detect.process_frame(frame)
-
         if self.transparent_mode:
+            self.frame = frame
+            self._read_board(frame, detections)
             self.copy_board_to_numpy()
             return self.post_treatment(end_game)
         else:
-            self.define_new_move()
-            return self.get_sgf()
+            self.live_step(frame, detections)
+            return self.get_sgf() if end_game else ""
+
+    def _read_board(self, frame: Optional[np.ndarray],
+                    detections: Optional[np.ndarray]):
+        """Update the detected board from a frame or cached detections."""
+        if detections is not None:
+            self.board_detect.replay_detections(detections, frame)
+        else:
+            self.board_detect.process_frame(frame)
+
+    def live_step(self, frame: Optional[np.ndarray],
+                  detections: Optional[np.ndarray] = None
+                  ) -> Tuple[int, List[Tuple[str, Tuple[int, int]]]]:
+        """
+        Process a live (non-transparent) frame and return only what
+        changed, so a broadcast can send deltas instead of the full SGF.
+        Use get_sgf() when the full game is needed.
+
+        Args:
+            frame: Input video frame
+            detections: Cached YOLO detections of the frame; when given,
+                YOLO is skipped and the frame may be None
+
+        Returns:
+            tuple: A tuple containing:
+                - int: Number of previous moves taken back.
+                - list: New moves, in the same format as `self.moves`.
+        """
+        self.frame = frame
+        self._read_board(frame, detections)
+
+        moves_before = len(self.moves)
+        self._pending_undos = 0
+        self.define_new_move()
+        undone = self._pending_undos
+        return undone, self.moves[moves_before - undone:]
         
     def copy_board_to_numpy(self):
         """Convert board state to numpy array and store if different."""
-        # state is (row, col, (B, W))
-        _ = self.board_detect.get_state()
-        # final_board is (row, col) with 0, 1, 2
+        # final_board is (row, col) with 0, 1, 2, in a buffer reused by
+        # GoBoard: it is only copied when a new state is appended
         final_board = self.board_detect.state_to_array()
-        if not self.numpy_board or np.any(final_board != self.numpy_board[-1]):
-            self.numpy_board.append(final_board)
+        if self.stabilizer is not None:
+            final_board = self.stabilizer.update(final_board)
+        self._record_state(final_board)
+
+    def flush_stabilizer(self):
+        """Record the changes the stabilizer is still voting on."""
+        if self.stabilizer is not None and self.numpy_board:
+            self._record_state(self.stabilizer.flush())
+
+    def _record_state(self, final_board: np.ndarray):
+        """Append a state to the timeline unless it is the last one."""
+        if self.numpy_board:
+            # Running hash: only the stones that changed since the last
+            # recorded state are toggled
+            state_hash = update_hash(self.state_hashes[-1],
+                                     self.numpy_board[-1], final_board)
+        else:
+            state_hash = zobrist_hash(final_board)
+        if not self.state_hashes or state_hash != self.state_hashes[-1]:
+            self.position_index.setdefault(state_hash, []).append(
+                len(self.numpy_board)
+            )
+            self.numpy_board.append(final_board.copy())
+            self.state_hashes.append(state_hash)
+            if self.streaming_corrector is not None:
+                self.streaming_corrector.push(self.numpy_board[-1])
+
+    def hash_sequence(self) -> np.ndarray:
+        """
+        Zobrist hashes of the recorded timeline, one per `numpy_board`
+        state, as a (T,) uint64 array.
+        """
+        return np.array(self.state_hashes, dtype=np.uint64)
 
     def play_move(self, x: int, y: int, stone_color: int):
         """
@@ -169,6 +293,8 @@ class GoGame:
         color = "white" if stone_color == 2 else "black"
         try:
             self.game.play(x, y, sente.stone(stone_color))
+            self._game_changed()
+            self._mirror_move(int(x) - 1, int(y) - 1, stone_color)
         except sente.exceptions.IllegalMoveException as e:
             err = f"[GoGame] Illegal move at ({x}, {y}): {e}"
             if "self-capture" in str(e):
@@ -181,12 +307,80 @@ class GoGame:
                 raise Exception(err + f" --> Not {color}'s turn")
             raise Exception(err)
 
+    def pass_turn(self):
+        """Pass in the sente game engine."""
+        self.game.pss()
+        self._game_changed()
+        self._live_history.append((self._live_board, self._live_ko))
+        self._live_ko = None
+
+    def undo_move(self):
+        """Take back the last move in sente and in the move list."""
+        self.game.step_up()
+        if self.moves:
+            self.moves.pop()
+        self._pending_undos += 1
+        self._game_changed()
+        if self._live_history:
+            self._live_board, self._live_ko = self._live_history.pop()
+            board = self._live_board.to_array()
+            self.mirror[:, :, 0] = board == 1
+            self.mirror[:, :, 1] = board == 2
+        else:
+            self._mirror_dirty = True
+
+    def _game_changed(self):
+        """Invalidate the cached SGF."""
+        self._game_version += 1
+
+    def _mirror_move(self, x: int, y: int, stone_color: int):
+        """
+        Update the mirror with a move sente accepted, removing the stones
+        it captured.
+
+        Args:
+            x: 0-18 column (sente's first coordinate)
+            y: 0-18 row
+            stone_color: 1 for black, 2 for white
+        """
+        self._live_history.append((self._live_board, self._live_ko))
+        try:
+            result = go_rules.play(self._live_board, x, y, stone_color,
+                                   self._live_ko)
+        except ValueError as e:
+            logger.warning(f"Board mirror out of sync ({e}), "
+                           "reading it again from sente")
+            self._mirror_dirty = True
+            return
+        self._live_board, self._live_ko = result.board, result.ko
+        self.mirror[x, y, stone_color - 1] = 1
+        for col, row in iter_points(result.captured):
+            self.mirror[col, row] = 0
+
+    def _sync_mirror(self):
+        """Read the mirror from sente (start of game, or after a desync)."""
+        self.mirror[:] = self.game.numpy(["black_stones", "white_stones"])
+        self._live_board = Bitboard.from_array(
+            self.mirror[:, :, 0] + 2 * self.mirror[:, :, 1]
+        )
+        self._live_ko = None
+        self._live_history.clear()
+        self._mirror_dirty = False
+
     def define_new_move(self):
         """Find differences between states and play new moves."""
-        # (col, row, (B, W))
-        detected_state = np.transpose(self.board_detect.get_state(), (1, 0, 2))
-        current_state = self.game.numpy(["black_stones", "white_stones"])
-        difference = detected_state - current_state
+        detected = self.board_detect.state
+        detected_key = detected.tobytes()
+        if detected_key == self._last_detected_key:
+            # Same detection as the last fully processed frame
+            return
+
+        if self._mirror_dirty:
+            self._sync_mirror()
+
+        # (col, row, (B, W)); signed since the detected state is uint8
+        detected_state = np.transpose(detected, (1, 0, 2))
+        difference = detected_state.astype(np.int8) - self.mirror
 
         black_added = np.argwhere(difference[:, :, 0] == 1)
         white_added = np.argwhere(difference[:, :, 1] == 1)
@@ -195,11 +389,12 @@ class GoGame:
 
         if len(black_added) + len(white_added) > 1:
             self.process_multiple_moves(black_added, white_added)
+            self._last_detected_key = detected_key
             return
 
         if len(black_added) != 0:
             if len(black_removed) != 0:
-                self.game.step_up()
+                self.undo_move()
             x, y = black_added[0][0] + 1, black_added[0][1] + 1
             self.play_move(x, y, 1)  # 1 = Black
             self.moves.append(('B', (x - 1, 18 - (y - 1))))
@@ -210,7 +405,7 @@ class GoGame:
 
         if len(white_added) != 0:
             if len(white_removed) == 1:
-                self.game.step_up()
+                self.undo_move()
             x, y = white_added[0][0] + 1, white_added[0][1] + 1
             self.play_move(x, y, 2)  # 2 = White
             self.moves.append(('W', (x - 1, 18 - (y - 1))))
@@ -219,6 +414,8 @@ class GoGame:
             })
             self.trim_buffer()
 
+        self._last_detected_key = detected_key
+
     def trim_buffer(self):
         """Ensure recent moves buffer doesn't exceed max size."""
         if len(self.recent_moves_buffer) > self.buffer_size:
@@ -226,20 +423,58 @@ class GoGame:
 
     def process_multiple_moves(self, black_stones: np.ndarray,
                                white_stones: np.ndarray):
-        """Handle multiple stones added in one frame."""
-        for stone in black_stones:
-            x, y = stone[0] + 1, stone[1] + 1
-            self.play_move(x, y, 1)  # 1 = Black
-            self.moves.append(('B', (x - 1, 18 - (y - 1))))
+        """
+        Handle multiple stones added in one frame.
 
-        for stone in white_stones:
-            x, y = stone[0] + 1, stone[1] + 1
-            self.play_move(x, y, 2)  # 2 = White
-            self.moves.append(('W', (x - 1, 18 - (y - 1))))
+        The stones are played alternately, starting with the player to
+        move, as sente requires. The whole batch is checked with the rules
+        engine first, from the mirror's position and ko point, so an
+        illegal batch leaves the game untouched. If sente still rejects a
+        stone, the stones already played are taken back.
+        """
+        first = 1 if self.game.get_active_player().name == "BLACK" else 2
+        stones = {1: [tuple(int(v) for v in stone) for stone in black_stones],
+                  2: [tuple(int(v) for v in stone) for stone in white_stones]}
+        if not 0 <= len(stones[first]) - len(stones[3 - first]) <= 1:
+            raise Exception(
+                f"[GoGame] Illegal multiple moves: {len(black_stones)} "
+                f"black and {len(white_stones)} white stones cannot "
+                "alternate"
+            )
+        sequence = []
+        for k in range(len(stones[first]) + len(stones[3 - first])):
+            color = first if k % 2 == 0 else 3 - first
+            sequence.append((stones[color][k // 2], color))
+
+        board, ko = self._live_board, self._live_ko
+        for (x, y), color in sequence:
+            try:
+                board, _, ko = go_rules.play(board, x, y, color, ko)
+            except ValueError as e:
+                raise Exception(f"[GoGame] Illegal multiple moves: {e}")
+
+        played = 0
+        try:
+            for (x, y), color in sequence:
+                self.play_move(x + 1, y + 1, color)
+                self.moves.append(('B' if color == 1 else 'W',
+                                   (x, 18 - y)))
+                played += 1
+        except Exception:
+            # Take the batch back without reporting it as undone moves
+            for _ in range(played):
+                self.undo_move()
+            self._pending_undos -= played
+            raise
 
     def get_sgf(self) -> str:
-        """Get SGF string for the current game."""
-        return sente.sgf.dumps(self.game)
+        """
+        Get SGF string for the current game. The game is only serialized
+        again after it changed.
+        """
+        if self._sgf_cache is None or self._sgf_cache[0] != self._game_version:
+            self._sgf_cache = (self._game_version, sente.sgf.dumps(self.game))
+        return self._sgf_cache[1]
 
     def post_treatment(self, end_game: bool) -> str:
         """
@@ -249,12 +484,33 @@ class GoGame:
             end_game: Whether to run final correction
 
         Returns:
-            str: SGF string or empty string
+            str: SGF string or empty string. With a streaming corrector,
+                the SGF of the moves settled so far.
         """
+        if end_game:
+            self.flush_stabilizer()
+        if self.streaming_corrector is not None:
+            if end_game:
+                self.streaming_corrector.flush()
+            return self.get_partial_sgf()
         if end_game and self.numpy_board:
             logger.info("Running AI post-treatment...")
             move_list = corrector_with_ai(
-                self.numpy_board, self.corrector_model
+                self.numpy_board, self.corrector_model,
+                beam_width=self.beam_width,
+                num_workers=self.post_treatment_workers,
+                model_path=self.corrector_model_path
             )
             return to_sgf(move_list)
         return ""
+
+    def get_partial_sgf(self) -> str:
+        """
+        SGF of the moves settled so far by the streaming corrector. New
+        moves are appended to the SGF instead of rebuilding it.
+        """
+        if self.streaming_corrector is None:
+            return ""
+        moves = self.streaming_corrector.moves
+        self._partial_sgf.extend(moves[self._partial_sgf.num_moves:])
+        return self._partial_sgf.getvalue()
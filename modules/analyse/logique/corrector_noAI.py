@@ -59,6 +59,8 @@ Correction: Interpreted as x Black stones and y White stones being moved.
             - If x=1, find the original move and update its position.
             - If x>1, this is complex. This module attempts to find the
               most likely permutation of moves.
+            Removed stones that the added stones legally capture (see
+            utils.go_rules) are not counted as moved.
 
 Case 4.1 (Capture):
 - Black added: 0
@@ -84,68 +86,127 @@ Correction: Interpreted as a capture plus two rapid moves. Add both moves.
 
 import itertools
 import logging
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Sequence, Tuple
 
 import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from .utils.bitboard import (
+    Bitboard, BoardLike, bit_index, mask_to_moves, timeline_to_bitboards
+)
+from .utils.go_rules import captured_stones
 
 logger = logging.getLogger(__name__)
 
 MoveTuple = Tuple[int, int, int]
 DiffDict = Dict[int, Dict[str, List[MoveTuple]]]
 
+# Up to this many displaced stones, every permutation is tried
+MAX_EXHAUSTIVE_STONES = 4
+
 
-def differences(prev_board: np.ndarray,
-                curr_board: np.ndarray) -> Tuple[DiffDict, int]:
+def differences(prev_board: BoardLike,
+                curr_board: BoardLike) -> Tuple[DiffDict, int]:
     """
     Calculates added and removed stones between two board states.
 
     Args:
-        prev_board (np.array): The 19x19 board state at time T-1.
-        curr_board (np.array): The 19x19 board state at time T.
+        prev_board (np.array | Bitboard): The board state at time T-1.
+        curr_board (np.array | Bitboard): The board state at time T.
 
     Returns:
         tuple: A tuple containing:
             - dict: A dictionary with added/removed stones for each player.
             - int: The total number of stones added.
     """
-    black_added: List[MoveTuple] = []
-    black_removed: List[MoveTuple] = []
-    white_added: List[MoveTuple] = []
-    white_removed: List[MoveTuple] = []
-    num_added = 0
-    board_size = prev_board.shape[0]
-
-    for r in range(board_size):
-        for c in range(board_size):
-            prev_stone = prev_board[r, c]
-            curr_stone = curr_board[r, c]
-
-            if curr_stone == 1 and prev_stone == 0:
-                black_added.append((r, c, 1))
-                num_added += 1
-            elif curr_stone == 0 and prev_stone == 1:
-                black_removed.append((r, c, 1))
-            elif curr_stone == 2 and prev_stone == 0:
-                white_added.append((r, c, 2))
-                num_added += 1
-            elif curr_stone == 0 and prev_stone == 2:
-                white_removed.append((r, c, 2))
-            elif curr_stone == 2 and prev_stone == 1:
-                black_removed.append((r, c, 1))
-                white_added.append((r, c, 2))
-                num_added += 1
-            elif curr_stone == 1 and prev_stone == 2:
-                white_removed.append((r, c, 2))
-                black_added.append((r, c, 1))
-                num_added += 1
+    if isinstance(prev_board, Bitboard) and isinstance(curr_board, Bitboard):
+        diff = prev_board.diff(curr_board)
+        diff_data: DiffDict = {
+            1: {"add": mask_to_moves(diff.black_added, 1),
+                "remove": mask_to_moves(diff.black_removed, 1)},
+            2: {"add": mask_to_moves(diff.white_added, 2),
+                "remove": mask_to_moves(diff.white_removed, 2)}
+        }
+        return diff_data, diff.num_added
+
+    prev_board = np.asarray(prev_board)
+    curr_board = np.asarray(curr_board)
+    board_size = prev_board.shape[-1]
+    # Only the few changed intersections reach Python, in row-major order
+    changed = np.flatnonzero(prev_board != curr_board)
+    return _classify_changes(
+        changed.tolist(),
+        prev_board.reshape(-1)[changed].tolist(),
+        curr_board.reshape(-1)[changed].tolist(),
+        board_size
+    )
+
+
+def _classify_changes(points: List[int], prev_stones: List[int],
+                      curr_stones: List[int],
+                      board_size: int) -> Tuple[DiffDict, int]:
+    """
+    Sorts changed intersections into added/removed lists per player.
+
+    Args:
+        points (list): Flat indices (row * board_size + col) of the
+                       intersections that changed, in row-major order.
+        prev_stones (list): Their values (0, 1, 2) before the change.
+        curr_stones (list): Their values after the change.
+        board_size (int): Width of the board.
 
+    Returns:
+        tuple: The same `(diff_data, num_added)` as `differences`.
+    """
     diff_data: DiffDict = {
-        1: {"add": black_added, "remove": black_removed},
-        2: {"add": white_added, "remove": white_removed}
+        1: {"add": [], "remove": []},
+        2: {"add": [], "remove": []}
     }
+    num_added = 0
+    for point, prev_stone, curr_stone in zip(points, prev_stones,
+                                             curr_stones):
+        r, c = divmod(point, board_size)
+        if prev_stone:
+            diff_data[prev_stone]["remove"].append((r, c, prev_stone))
+        if curr_stone:
+            diff_data[curr_stone]["add"].append((r, c, curr_stone))
+            num_added += 1
     return diff_data, num_added
 
 
+def timeline_differences(board_states: Sequence[np.ndarray]
+                         ) -> List[Tuple[DiffDict, int]]:
+    """
+    Computes `differences` for every consecutive pair of a timeline in one
+    batched pass over the (T-1, 19, 19) stack of changes.
+
+    Args:
+        board_states: A (T, 19, 19) array or a list of 19x19 arrays.
+
+    Returns:
+        list: T-1 `(diff_data, num_added)` tuples, entry i describing the
+            change from state i to state i+1.
+    """
+    if len(board_states) < 2:
+        return []
+    states = np.asarray(board_states)
+    board_size = states.shape[-1]
+    flat = states.reshape(len(states), -1)
+
+    # nonzero is sorted by pair first, then row-major within a pair
+    pairs, points = np.nonzero(flat[:-1] != flat[1:])
+    prev_stones = flat[pairs, points].tolist()
+    curr_stones = flat[pairs + 1, points].tolist()
+    points = points.tolist()
+    bounds = np.searchsorted(pairs, np.arange(len(states))).tolist()
+
+    return [
+        _classify_changes(points[start:stop], prev_stones[start:stop],
+                          curr_stones[start:stop], board_size)
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+
+
 def get_last_index(move_list: List[Any], element: Any) -> int:
     """Finds the last index of an element in a list."""
     for i in reversed(range(len(move_list))):
@@ -164,36 +225,70 @@ def distance(list_added: List[MoveTuple],
     return dist
 
 
+def _assignment_cost(cost: np.ndarray) -> int:
+    """Total cost of a minimum-cost assignment of a square cost matrix."""
+    rows, cols = linear_sum_assignment(cost)
+    return int(cost[rows, cols].sum())
+
+
 def opt_permutation(list_added: List[MoveTuple],
                     list_removed: List[MoveTuple]) -> List[MoveTuple]:
     """
     Finds the permutation of added stones that is "closest" to the
     list of removed stones, minimizing total Manhattan distance.
     This helps identify the most likely stone displacements.
-    """
-    d_opt = np.inf
-    list_added_permut_opt = list_added
-
-    for list_added_permut in list(itertools.permutations(list_added)):
-        d_curr = distance(list(list_added_permut), list_removed)
-        if d_curr < d_opt:
-            list_added_permut_opt = list(list_added_permut)
-            d_opt = d_curr
-    return list_added_permut_opt
 
-
-def corrector_no_ai(board_states: List[np.ndarray]) -> List[MoveTuple]:
+    The optimum is found with the Hungarian algorithm instead of trying
+    every permutation. Among equally close permutations, the first one in
+    `itertools.permutations` order is returned, as the exhaustive search
+    did.
+    """
+    num_stones = len(list_added)
+    if num_stones < 2:
+        return list(list_added)
+    if num_stones <= MAX_EXHAUSTIVE_STONES:
+        # A few permutations are cheaper to try than an assignment solve
+        return list(min(itertools.permutations(list_added),
+                        key=lambda permut: distance(permut, list_removed)))
+
+    added = np.array([move[:2] for move in list_added])
+    removed = np.array([move[:2] for move in list_removed[:num_stones]])
+    # cost[i, j]: distance when removed stone i moved to added stone j
+    cost = np.abs(removed[:, None, :] - added[None, :, :]).sum(axis=-1)
+    remaining_cost = _assignment_cost(cost)
+
+    # Fix positions in order, each to the lowest added index that still
+    # allows an optimal assignment of the remaining stones
+    free = list(range(num_stones))
+    permutation: List[MoveTuple] = []
+    for i in range(num_stones - 1):
+        rest = cost[i + 1:]
+        for j in free:
+            others = [k for k in free if k != j]
+            rest_cost = _assignment_cost(rest[:, others])
+            if cost[i, j] + rest_cost == remaining_cost:
+                break
+        permutation.append(list_added[j])
+        free.remove(j)
+        remaining_cost = rest_cost
+    permutation.append(list_added[free[0]])
+    return permutation
+
+
+def corrector_no_ai(board_states: Sequence[BoardLike]) -> List[MoveTuple]:
     """
     Reconstructs a move list from a sequence of board states using heuristics.
 
     Args:
-        board_states (list): A list of 19x19 numpy arrays representing
-                             the board at each frame.
+        board_states (list): A list of 19x19 numpy arrays (or Bitboards)
+                             representing the board at each frame.
 
     Returns:
         list: A list of moves, where each move is a tuple
               (row, col, player_num).
     """
+    # Diffing bitboards is much cheaper than scanning arrays
+    board_states = timeline_to_bitboards(board_states)
     move_list: List[MoveTuple] = []
     num_frames = len(board_states)
 
@@ -231,7 +326,17 @@ def corrector_no_ai(board_states: List[np.ndarray]) -> List[MoveTuple]:
                 move_list.append(added_not_turn_player[k])
 
         else:
-            # CASE 3: Displaced stones
+            # CASE 3: Displaced stones. Stones captured by the added ones
+            # were taken off the board, not moved.
+            captured = captured_stones(board_states[index - 1],
+                                       board_states[index])
+            if captured:
+                for player in (1, 2):
+                    diff_data[player]["remove"] = [
+                        move for move in diff_data[player]["remove"]
+                        if not captured >> bit_index(move[0], move[1]) & 1
+                    ]
+
             # Check for displacement by the player whose turn it is
             removed_turn_player = diff_data[turn]["remove"]
             if (len(added_turn_player) == len(removed_turn_player) and
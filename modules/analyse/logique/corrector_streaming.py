@@ -0,0 +1,129 @@
+"""
+Streaming SGF Corrector.
+
+Online version of `corrector_with_ai`: board states are pushed one at a
+time as the video is analysed, and moves are emitted as soon as they are
+settled instead of after the whole timeline has been recorded.
+
+A transition only depends on its two states and on the player to move,
+so every move is settled as soon as its transition is recorded. Simple
+moves are emitted at once. Ambiguous transitions are buffered as gaps and
+filled together in one batched call, and the moves recorded after a gap
+are held back until it is filled so that moves are emitted in game
+order. The batch is filled once `max_pending_gaps` gaps are waiting, once
+`max_pending_states` states were pushed since the oldest of them, or on
+`flush`. Memory and emission delay are therefore bounded by those two
+limits, and the emitted moves are the ones `corrector_with_ai` returns
+for the same timeline.
+"""
+
+import itertools
+import logging
+from typing import List, Optional, Tuple
+
+import keras
+import numpy as np
+
+from .corrector_noAI import differences
+from .corrector_withAI import Gap, fill_planned_gaps, plan_transition
+from .utils.bitboard import Bitboard, BoardLike
+
+logger = logging.getLogger(__name__)
+MoveTuple = Tuple[int, int, int]
+
+
+class StreamingCorrector:
+    """Incremental move reconstruction from a stream of board states."""
+
+    def __init__(self, corrector_model: keras.Model,
+                 max_pending_gaps: int = 8,
+                 beam_width: int = 1,
+                 max_pending_states: int = 32):
+        """
+        Args:
+            corrector_model (keras.Model): The model used to fill gaps.
+            max_pending_gaps (int): Gaps buffered before they are filled
+                in one batch. 1 fills every gap as soon as it appears.
+            beam_width (int): Partial fills kept per gap.
+            max_pending_states (int): States pushed after the oldest
+                pending gap before the gaps are filled anyway, so the
+                moves held behind them are not delayed indefinitely.
+        """
+        if max_pending_gaps < 1:
+            raise ValueError("max_pending_gaps must be at least 1, "
+                             f"got {max_pending_gaps}")
+        if max_pending_states < 1:
+            raise ValueError("max_pending_states must be at least 1, "
+                             f"got {max_pending_states}")
+        self.corrector_model = corrector_model
+        self.max_pending_gaps = max_pending_gaps
+        self.max_pending_states = max_pending_states
+        self.beam_width = beam_width
+        self.moves: List[MoveTuple] = []
+        self.num_states = 0
+        self.turn = 1  # 1 = Black's turn, 2 = White's turn
+        self._last_state: Optional[np.ndarray] = None
+        # Move slots from the first unfilled gap on, and their gaps
+        self._slots: List[List[MoveTuple]] = []
+        self._gaps: List[Gap] = []
+        self._first_gap_state = 0  # num_states when the oldest gap came
+
+    @property
+    def pending_gaps(self) -> int:
+        """Number of gaps waiting for the model."""
+        return len(self._gaps)
+
+    def push(self, state: BoardLike) -> List[MoveTuple]:
+        """
+        Add the next board state of the timeline.
+
+        Args:
+            state (np.array | Bitboard): The 19x19 board state.
+
+        Returns:
+            list: Moves settled by this state, in game order (often empty).
+        """
+        state = (state.to_array() if isinstance(state, Bitboard)
+                 else np.array(state, copy=True))
+        previous, self._last_state = self._last_state, state
+        self.num_states += 1
+        if previous is None:
+            return []
+
+        diff_data, num_added = differences(previous, state)
+        moves, gap, self.turn = plan_transition(
+            diff_data, num_added, self.turn, previous, len(self._slots),
+            self.num_states - 1
+        )
+
+        if gap is not None:
+            if not self._gaps:
+                self._first_gap_state = self.num_states
+            self._gaps.append(gap)
+            self._slots.append([])
+        elif not self._gaps:
+            self.moves.extend(moves)
+            return moves
+        elif moves:
+            # Settled, but must wait for the gaps played before it
+            self._slots.append(moves)
+
+        if (len(self._gaps) >= self.max_pending_gaps or
+                self.num_states - self._first_gap_state >=
+                self.max_pending_states):
+            return self.flush()
+        return []
+
+    def flush(self) -> List[MoveTuple]:
+        """
+        Fill every pending gap now and emit the moves waiting on them.
+
+        Returns:
+            list: The newly settled moves, in game order.
+        """
+        fill_planned_gaps(self._slots, self._gaps, self.corrector_model,
+                          self.beam_width)
+        settled = list(itertools.chain.from_iterable(self._slots))
+        self._slots, self._gaps = [], []
+        self.moves.extend(settled)
+        return settled
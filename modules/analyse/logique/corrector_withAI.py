@@ -9,125 +9,322 @@ unambiguous moves. When it encounters an ambiguous state (e.g.,
 multiple stones appearing at once), it invokes an AI model
 (from model_utils) to predict the most likely sequence of moves
 within that "gap".
+
+The timeline is planned in a single pass: simple moves are emitted
+directly and every ambiguous transition is recorded as a `Gap` next to
+the move list instead of being spliced into the sequence. Gaps are then
+filled from their own start state and the move list is assembled at the
+end, so time and memory stay linear in the timeline length. Since gaps
+are independent, the model scores the candidates of all gaps at the same
+depth in a single batch.
+
+Long timelines can also be corrected in parallel. A transition that is
+exactly one legal move fixes the player to move after it whatever came
+before, so the timeline is cut at such anchor states and the segments
+are corrected in a process pool, each worker loading the model once.
 """
 
+import itertools
 import logging
-from typing import List, Tuple
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
 
 import keras
 import numpy as np
 
-from .corrector_noAI import differences
-from .utils.model_utils import fill_gaps, get_possible_moves
+from .corrector_noAI import DiffDict, timeline_differences
+from .utils.bitboard import Bitboard, BoardLike, bitboards_to_timeline
+from .utils import go_rules
+from .utils.model_utils import fill_gaps_batched, load_corrector_model
 
 logger = logging.getLogger(__name__)
 MoveTuple = Tuple[int, int, int]
 
+# Parallel post-treatment: segments per worker (for load balancing), the
+# smallest segment worth a task, and the process start method (TensorFlow
+# is not fork-safe)
+SEGMENTS_PER_WORKER = 4
+MIN_SEGMENT_STATES = 200
+POOL_START_METHOD = "spawn"
+
+# Corrector model of a pool worker, loaded once by _init_worker
+_worker_model: Optional[keras.Model] = None
+
+
+class Gap(NamedTuple):
+    """An ambiguous transition whose moves are picked by the model."""
+    slot: int  # Position of the gap's moves in the planned move list
+    frame: int  # Index of the state after the gap
+    initial_state: np.ndarray
+    num_moves: int
+    first_player: int
+    black_moves: List[Tuple[int, int]]
+    white_moves: List[Tuple[int, int]]
+
+
+def _to_timeline(board_states: Sequence[BoardLike]) -> np.ndarray:
+    """Stacks board states (arrays or Bitboards) into a (T, 19, 19) array."""
+    if isinstance(board_states, np.ndarray):
+        return board_states
+    if len(board_states) and all(isinstance(state, Bitboard)
+                                 for state in board_states):
+        return bitboards_to_timeline(board_states)
+    return np.stack([
+        state.to_array() if isinstance(state, Bitboard) else state
+        for state in board_states
+    ])
 
-def corrector_with_ai(board_states: List[np.ndarray],
-                      corrector_model: keras.Model) -> List[MoveTuple]:
+
+def plan_gaps(board_states: Sequence[BoardLike], first_player: int = 1
+              ) -> Tuple[List[List[MoveTuple]], List[Gap]]:
     """
-    Reconstructs a move list from board states, using an AI model
-    to fill gaps when simple heuristics fail.
+    Walks the timeline once, resolving simple moves and recording the
+    ambiguous transitions as gaps.
 
     Args:
-        board_states (List[np.ndarray]): A list of 19x19 board states.
-        corrector_model (keras.Model): The loaded Keras model for gap filling.
+        board_states (Sequence): 19x19 board states (arrays or Bitboards).
+        first_player (int): Player to move in the first state.
 
     Returns:
-        List[MoveTuple]: The reconstructed list of moves (row, col, player).
+        tuple: A tuple containing:
+            - list: Move slots in game order. Each slot holds the moves of
+              one transition; the slots of gaps are left empty.
+            - list: The gaps, in timeline order.
     """
-    # Create a copy to avoid modifying the original list
-    board_states_list = board_states.copy()
-    move_list: List[MoveTuple] = []
-    num_frames = len(board_states_list)
+    if len(board_states) < 2:
+        return [], []
+    states = _to_timeline(board_states)
+    slots: List[List[MoveTuple]] = []
+    gaps: List[Gap] = []
+    turn = first_player  # 1 = Black's turn, 2 = White's turn
+
+    for index, (diff_data, num_added) in enumerate(
+            timeline_differences(states), start=1):
+        moves, gap, turn = plan_transition(diff_data, num_added, turn,
+                                           states[index - 1], len(slots),
+                                           index)
+        if gap is not None:
+            gaps.append(gap)
+            slots.append([])
+        elif moves:
+            slots.append(moves)
 
-    turn = 1  # 1 = Black's turn, 2 = White's turn
-    not_turn = 2
-    index = 1
+    return slots, gaps
 
-    # Add safety counter to prevent infinite loops
-    max_iterations = len(board_states_list) * 10  # Reasonable upper bound
-    iterations = 0
 
-    while index < num_frames and iterations < max_iterations:
-        iterations += 1
+def plan_transition(diff_data: DiffDict, num_added: int, turn: int,
+                    initial_state: np.ndarray, slot: int, frame: int
+                    ) -> Tuple[List[MoveTuple], Optional[Gap], int]:
+    """
+    Resolves one transition of the timeline.
 
-        diff_data, num_added = differences(board_states_list[index - 1],
-                                           board_states_list[index])
+    Args:
+        diff_data (dict): The transition, as returned by `differences`.
+        num_added (int): Number of stones added in the transition.
+        turn (int): Player to move before the transition (1 or 2).
+        initial_state (np.array): The state before the transition.
+        slot (int): Move slot the transition's moves will occupy.
+        frame (int): Index of the state after the transition.
+
+    Returns:
+        tuple: A tuple containing:
+            - list: The moves of a simple transition (empty otherwise).
+            - Gap: The gap to fill for an ambiguous transition, or None.
+            - int: Player to move after the transition.
+    """
+    not_turn = 3 - turn
+    if num_added == 0:
+        # No stones added, likely a capture or no change.
+        return [], None, turn
+
+    added_turn_player = diff_data[turn]["add"]
+    added_not_turn_player = diff_data[not_turn]["add"]
+
+    # CASE 1: A single, simple move was made by the correct player.
+    if len(added_turn_player) == 1 and len(added_not_turn_player) == 0:
+        move = added_turn_player[0]
+        logger.debug(f"Player {turn} played at {move}")
+        return [move], None, not_turn
+
+    # CASE 2: Ambiguous state - record a gap for the AI to fill.
+    # The player with more new stones moved first.
+    first_player = (turn if len(added_turn_player) >=
+                    len(added_not_turn_player) else not_turn)
+    # Candidates are the stones added by each colour, including
+    # points retaken after a capture inside the gap
+    gap = Gap(
+        slot=slot,
+        frame=frame,
+        initial_state=initial_state,
+        num_moves=num_added,
+        first_player=first_player,
+        black_moves=[(r, c) for r, c, _ in diff_data[1]["add"]],
+        white_moves=[(r, c) for r, c, _ in diff_data[2]["add"]]
+    )
+    next_turn = first_player if num_added % 2 == 0 else 3 - first_player
+    return [], gap, next_turn
+
+
+def fill_planned_gaps(slots: List[List[MoveTuple]], gaps: Sequence[Gap],
+                      corrector_model: keras.Model,
+                      beam_width: int = 1):
+    """
+    Fills gaps with one batched model call per gap depth and stores their
+    moves in their slots.
+
+    Args:
+        slots (list): Move slots, updated in place.
+        gaps (Sequence): Gaps whose `slot` indexes `slots`.
+        corrector_model (keras.Model): The corrector model.
+        beam_width (int): Partial fills kept per gap.
+    """
+    if not gaps:
+        return
+    logger.info(f"Filling {len(gaps)} gaps, up to "
+                f"{max(gap.num_moves for gap in gaps)} moves deep")
+    try:
+        filled = fill_gaps_batched(corrector_model, gaps,
+                                   beam_width=beam_width)
+    except Exception as e:
+        logger.error(f"Error in gap filling: {e}. Skipping gaps.")
+        return
 
-        if num_added == 0:
-            # No stones added, likely a capture or no change.
-            index += 1
+    for gap, gap_moves in zip(gaps, filled):
+        slots[gap.slot] = [move for move in gap_moves if move is not None]
+
+
+def find_anchors(states: np.ndarray) -> List[Tuple[int, int]]:
+    """
+    Finds the transitions that are exactly one legal move.
+
+    Args:
+        states (np.array): (T, 19, 19) timeline.
+
+    Returns:
+        list: (index of the state after the move, player) of each anchor.
+    """
+    flat = states.reshape(len(states), -1)
+    added = (flat[1:] != 0) & (flat[1:] != flat[:-1])
+    anchors = []
+    for index in np.flatnonzero(added.sum(axis=1) == 1) + 1:
+        point = int(np.flatnonzero(added[index - 1])[0])
+        row, col = divmod(point, states.shape[-1])
+        player = int(flat[index, point])
+        try:
+            result = go_rules.play(states[index - 1], row, col, player)
+        except ValueError:
             continue
+        if np.array_equal(result.board, states[index]):
+            anchors.append((int(index), player))
+    return anchors
+
 
-        added_turn_player = diff_data[turn]["add"]
-        added_not_turn_player = diff_data[not_turn]["add"]
+def split_at_anchors(states: np.ndarray, num_segments: int,
+                     min_segment_states: int = MIN_SEGMENT_STATES
+                     ) -> List[Tuple[int, int, int]]:
+    """
+    Cuts a timeline into about `num_segments` independent segments.
 
-        # CASE 1: A single, simple move was made by the correct player.
-        if len(added_turn_player) == 1 and len(added_not_turn_player) == 0:
-            move = added_turn_player[0]
-            move_list.append(move)
-            logger.debug(f"Player {turn} played at {move}")
+    Args:
+        states (np.array): (T, 19, 19) timeline.
+        num_segments (int): Wanted number of segments.
+        min_segment_states (int): Minimum number of states per segment.
 
-            # Swap turns for the next iteration
-            turn, not_turn = not_turn, turn
-            index += 1
+    Returns:
+        list: (start, stop, first_player) per segment: the segment is
+            `states[start:stop]` with `first_player` to move. Consecutive
+            segments share their boundary state.
+    """
+    num_states = len(states)
+    num_segments = min(num_segments, num_states // max(min_segment_states, 1))
+    if num_segments < 2:
+        return [(0, num_states, 1)]
 
-        # CASE 2: No moves detected (already handled by num_added == 0)
-        elif len(added_turn_player) == 0 and len(added_not_turn_player) == 0:
-            index += 1
+    segments = []
+    start, first_player = 0, 1
+    step = num_states / num_segments
+    target = step
+    for index, player in find_anchors(states):
+        if index < target or index - 1 - start < min_segment_states:
             continue
+        if num_states - index < min_segment_states:
+            break
+        # The anchor move opens the next segment, from the state before it
+        segments.append((start, index, first_player))
+        start, first_player = index - 1, player
+        target = index + step
+    segments.append((start, num_states, first_player))
+    return segments
 
-        # CASE 3: Ambiguous state - use AI to fill gaps
-        else:
-            # Check if we're at the end of the sequence
-            if index + 1 >= num_frames:
-                logger.warning("Reached end of sequence at "
-                               "ambiguous state, skipping.")
-                index += 1
-                continue
 
-            # Insert a copy of the current state to create gap frame
-            board_states_list.insert(index, board_states_list[index].copy())
-            num_frames = len(board_states_list)
+def _init_worker(model_path: str):
+    """Loads the corrector model once per pool worker."""
+    global _worker_model
+    _worker_model = load_corrector_model(model_path)
 
-            # Define the gap as being between [index-1] and [index+1]
-            b_moves, w_moves = get_possible_moves(board_states_list[index - 1],
-                                                  board_states_list[index + 1])
 
-            logger.info(f"Filling gap between frames {index-1} and {index+1}")
-            logger.info(f"Black possible moves: {len(b_moves)}, "
-                        f"White possible moves: {len(w_moves)}")
+def _correct_segment(states: np.ndarray, first_player: int,
+                     beam_width: int) -> List[MoveTuple]:
+    """Corrects one segment with the worker's model."""
+    slots, gaps = plan_gaps(states, first_player)
+    fill_planned_gaps(slots, gaps, _worker_model, beam_width)
+    return list(itertools.chain.from_iterable(slots))
 
-            # Call the AI to fill the gap
-            try:
-                board_states_list = fill_gaps(
-                    model=corrector_model,
-                    sequence_with_gap=board_states_list,
-                    gap_start=index,
-                    gap_end=index + 2,  # Fill 2 frames: index and index+1
-                    black_possible_moves=b_moves,
-                    white_possible_moves=w_moves
-                )
-
-                # After filling, we've processed the gap,
-                # so advance index past it
-                index += 2
-                # Update num_frames in case fill_gaps modified list length
-                # (though current implementation does not)
-                num_frames = len(board_states_list)
 
+def corrector_with_ai(board_states: Sequence[BoardLike],
+                      corrector_model: keras.Model,
+                      beam_width: int = 1,
+                      num_workers: int = 1,
+                      model_path: Optional[str] = None) -> List[MoveTuple]:
+    """
+    Reconstructs a move list from board states, using an AI model
+    to fill gaps when simple heuristics fail.
+
+    Args:
+        board_states (Sequence): 19x19 board states (arrays or Bitboards).
+        corrector_model (keras.Model): The loaded Keras model for gap filling.
+        beam_width (int): Partial fills kept per gap. 1 picks the most
+            likely move at each gap position; larger widths score whole
+            move sequences, at the cost of bigger model batches.
+        num_workers (int): Processes used to correct segments of long
+            timelines in parallel (1 corrects in this process).
+        model_path (str, optional): Path of the corrector model, loaded by
+            each worker. Required when `num_workers` > 1.
+
+    Returns:
+        List[MoveTuple]: The reconstructed list of moves (row, col, player).
+    """
+    if num_workers > 1 and model_path is not None:
+        states = _to_timeline(board_states)
+        segments = split_at_anchors(states,
+                                    num_workers * SEGMENTS_PER_WORKER)
+        if len(segments) > 1:
+            logger.info(f"Correcting {len(segments)} segments with "
+                        f"{num_workers} workers")
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=min(num_workers, len(segments),
+                                    os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context(
+                        POOL_START_METHOD
+                    ),
+                    initializer=_init_worker,
+                    initargs=(model_path,)
+                ) as pool:
+                    results = pool.map(
+                        _correct_segment,
+                        [states[start:stop] for start, stop, _ in segments],
+                        [player for _, _, player in segments],
+                        itertools.repeat(beam_width)
+                    )
+                    return list(itertools.chain.from_iterable(results))
             except Exception as e:
-                logger.error(f"Error in gap filling: {e}. Skipping gap.")
-                # Remove the inserted frame and continue
-                if len(board_states_list) > index:
-                    board_states_list.pop(index)
-                num_frames = len(board_states_list)
-                index += 1
-
-    if iterations >= max_iterations:
-        logger.warning("Reached maximum iterations (%d). "
-                       "Stopping gap filling.", max_iterations)
-
-    return move_list
+                logger.error(f"Parallel correction failed: {e}. "
+                             "Correcting in a single process.")
+        board_states = states
+
+    slots, gaps = plan_gaps(board_states)
+    fill_planned_gaps(slots, gaps, corrector_model, beam_width)
+    return list(itertools.chain.from_iterable(slots))
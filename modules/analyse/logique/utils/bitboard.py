@@ -0,0 +1,199 @@
+"""
+Bitboard Representation of Board States.
+
+A board state is stored as two Python integers, one bit plane per colour,
+where bit `row * 19 + col` is set when that intersection holds a stone.
+Diffing two states then costs a handful of bitwise operations instead of
+a 361-cell scan, and states are immutable and hashable.
+
+Conversions to and from the 19x19 arrays used elsewhere (0 = empty,
+1 = black, 2 = white) are vectorized with np.packbits, including a batch
+conversion for whole timelines.
+"""
+
+import logging
+from typing import Iterable, List, NamedTuple, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BOARD_SIZE = 19
+NUM_POINTS = BOARD_SIZE * BOARD_SIZE
+NUM_BYTES = (NUM_POINTS + 7) // 8
+FULL_MASK = (1 << NUM_POINTS) - 1
+
+MoveTuple = Tuple[int, int, int]
+
+
+if hasattr(int, "bit_count"):  # Python >= 3.10
+    def popcount(mask: int) -> int:
+        """Number of set bits of a non-negative integer."""
+        return mask.bit_count()
+else:
+    def popcount(mask: int) -> int:
+        """Number of set bits of a non-negative integer."""
+        return bin(mask).count("1")
+
+
+def bit_index(row: int, col: int) -> int:
+    """Bit position of an intersection."""
+    return row * BOARD_SIZE + col
+
+
+def iter_points(mask: int) -> Iterable[Tuple[int, int]]:
+    """
+    Yields the (row, col) of every set bit, in row-major order (the
+    order of a `for r: for c:` scan over the array).
+    """
+    while mask:
+        lowest = mask & -mask
+        row, col = divmod(lowest.bit_length() - 1, BOARD_SIZE)
+        yield row, col
+        mask ^= lowest
+
+
+def mask_to_moves(mask: int, player: int) -> List[MoveTuple]:
+    """Converts a bit mask to a row-major list of (row, col, player)."""
+    return [(row, col, player) for row, col in iter_points(mask)]
+
+
+def _plane_to_int(plane: np.ndarray) -> int:
+    """Packs a boolean 19x19 plane into an integer."""
+    packed = np.packbits(plane.reshape(-1), bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+def _int_to_plane(mask: int) -> np.ndarray:
+    """Unpacks an integer into a boolean 19x19 plane."""
+    packed = np.frombuffer(mask.to_bytes(NUM_BYTES, "little"),
+                           dtype=np.uint8)
+    bits = np.unpackbits(packed, count=NUM_POINTS, bitorder="little")
+    return bits.reshape(BOARD_SIZE, BOARD_SIZE).astype(bool)
+
+
+class BitboardDiff(NamedTuple):
+    """Stones added and removed per colour between two states."""
+    black_added: int
+    black_removed: int
+    white_added: int
+    white_removed: int
+
+    @property
+    def num_added(self) -> int:
+        """Total number of stones added, both colours."""
+        return popcount(self.black_added) + popcount(self.white_added)
+
+
+class Bitboard(NamedTuple):
+    """Immutable board state as one bit plane per colour."""
+    black: int = 0
+    white: int = 0
+
+    @classmethod
+    def from_array(cls, board: np.ndarray) -> "Bitboard":
+        """Builds a bitboard from a 19x19 array (0, 1, 2)."""
+        board = np.asarray(board)
+        return cls(_plane_to_int(board == 1), _plane_to_int(board == 2))
+
+    def to_array(self, dtype=np.uint8) -> np.ndarray:
+        """Returns the state as a 19x19 array (0, 1, 2)."""
+        board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=dtype)
+        board[_int_to_plane(self.black)] = 1
+        board[_int_to_plane(self.white)] = 2
+        return board
+
+    @property
+    def occupied(self) -> int:
+        """Mask of all stones."""
+        return self.black | self.white
+
+    @property
+    def empty(self) -> int:
+        """Mask of all empty intersections."""
+        return FULL_MASK & ~(self.black | self.white)
+
+    def get(self, row: int, col: int) -> int:
+        """Returns 0, 1 or 2 for an intersection."""
+        bit = 1 << bit_index(row, col)
+        if self.black & bit:
+            return 1
+        if self.white & bit:
+            return 2
+        return 0
+
+    def add(self, row: int, col: int, player: int) -> "Bitboard":
+        """Returns a copy with a stone of `player` placed at (row, col)."""
+        bit = 1 << bit_index(row, col)
+        if player == 1:
+            return Bitboard(self.black | bit, self.white & ~bit)
+        return Bitboard(self.black & ~bit, self.white | bit)
+
+    def remove(self, row: int, col: int) -> "Bitboard":
+        """Returns a copy with (row, col) emptied."""
+        keep = ~(1 << bit_index(row, col))
+        return Bitboard(self.black & keep, self.white & keep)
+
+    def remove_mask(self, mask: int) -> "Bitboard":
+        """Returns a copy with every intersection of `mask` emptied."""
+        return Bitboard(self.black & ~mask, self.white & ~mask)
+
+    def diff(self, other: "Bitboard") -> BitboardDiff:
+        """
+        Stones added and removed going from this state to `other`.
+        A stone changing colour counts as removed and added.
+        """
+        return BitboardDiff(
+            black_added=other.black & ~self.black,
+            black_removed=self.black & ~other.black,
+            white_added=other.white & ~self.white,
+            white_removed=self.white & ~other.white,
+        )
+
+    def count(self) -> Tuple[int, int]:
+        """Number of (black, white) stones."""
+        return popcount(self.black), popcount(self.white)
+
+
+BoardLike = Union[np.ndarray, Bitboard]
+
+
+def timeline_to_bitboards(states: Sequence[BoardLike]) -> List[Bitboard]:
+    """
+    Converts a sequence of 19x19 arrays (or a (T, 19, 19) array) into
+    bitboards in one vectorized pass. Bitboards are passed through.
+    """
+    if len(states) == 0:
+        return []
+    if not isinstance(states, np.ndarray):
+        if all(isinstance(state, Bitboard) for state in states):
+            return list(states)
+        states = np.stack([state.to_array() if isinstance(state, Bitboard)
+                           else np.asarray(state) for state in states])
+
+    flat = states.reshape(len(states), NUM_POINTS)
+    black = np.packbits(flat == 1, axis=1, bitorder="little")
+    white = np.packbits(flat == 2, axis=1, bitorder="little")
+    return [
+        Bitboard(int.from_bytes(b.tobytes(), "little"),
+                 int.from_bytes(w.tobytes(), "little"))
+        for b, w in zip(black, white)
+    ]
+
+
+def bitboards_to_timeline(boards: Sequence[Bitboard]) -> np.ndarray:
+    """Converts bitboards back into a (T, 19, 19) uint8 array."""
+    if len(boards) == 0:
+        return np.zeros((0, BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+
+    def unpack(masks: Iterable[int]) -> np.ndarray:
+        packed = np.frombuffer(
+            b"".join(mask.to_bytes(NUM_BYTES, "little") for mask in masks),
+            dtype=np.uint8
+        ).reshape(-1, NUM_BYTES)
+        return np.unpackbits(packed, axis=1, count=NUM_POINTS,
+                             bitorder="little")
+
+    timeline = unpack(board.black for board in boards)
+    timeline += 2 * unpack(board.white for board in boards)
+    return timeline.reshape(-1, BOARD_SIZE, BOARD_SIZE)
@@ -0,0 +1,147 @@
+"""
+Optical-Flow Corner Tracker.
+
+Follows the four board corners between frames with pyramidal
+Lucas-Kanade optical flow, so a moving camera does not require a YOLO
+corner detection on every frame.
+
+Optionally a sparse set of grid intersections is tracked as well; the
+board corners are then derived from a RANSAC homography fitted on all
+tracked points, which stays stable when a corner is hidden by a hand.
+Tracking quality is measured with a forward-backward consistency check;
+once it drops, the tracker stops and the caller re-detects with YOLO.
+"""
+
+import logging
+from typing import Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CornerTracker:
+    """Tracks board corners (and optional grid points) across frames."""
+
+    def __init__(self, scale: float = 0.5,
+                 max_fb_error: float = 1.0,
+                 min_quality: float = 0.6,
+                 win_size: int = 21,
+                 max_level: int = 3):
+        """
+        Args:
+            scale (float): Frames are downscaled by this factor before
+                tracking.
+            max_fb_error (float): Max forward-backward error, in scaled
+                pixels, for a point to count as well tracked.
+            min_quality (float): Min fraction of well-tracked points (or
+                RANSAC inliers) needed to keep tracking.
+            win_size (int): LK search window size.
+            max_level (int): Number of LK pyramid levels.
+        """
+        self.scale = scale
+        self.max_fb_error = max_fb_error
+        self.min_quality = min_quality
+        self.lk_params = dict(
+            winSize=(win_size, win_size),
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT,
+                      20, 0.03)
+        )
+        self.prev_gray: Optional[np.ndarray] = None
+        self.points: Optional[np.ndarray] = None
+        self.corners: Optional[np.ndarray] = None
+        self.quality = 0.0
+
+    @property
+    def active(self) -> bool:
+        """Whether the tracker holds a reference frame."""
+        return self.prev_gray is not None
+
+    def stop(self):
+        """Drop the reference frame; the next track() returns None."""
+        self.prev_gray = None
+        self.points = None
+        self.corners = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """Grayscale, downscaled copy of a BGR frame."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def reset(self, frame: np.ndarray, corners: np.ndarray,
+              grid_points: Optional[np.ndarray] = None):
+        """
+        Start tracking from a frame with known corners.
+
+        Args:
+            frame (np.array): BGR frame the corners were detected on.
+            corners (np.array): (4, 2) corners in frame coordinates.
+            grid_points (np.array, optional): (K, 2) grid intersections in
+                frame coordinates to track alongside the corners.
+        """
+        self.prev_gray = self._prepare(frame)
+        self.corners = np.asarray(corners, dtype=np.float32).reshape(
+            -1, 1, 2) * self.scale
+        if grid_points is not None and len(grid_points) >= 4:
+            self.points = np.asarray(grid_points, dtype=np.float32).reshape(
+                -1, 1, 2) * self.scale
+        else:
+            self.points = None
+        self.quality = 1.0
+
+    def track(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Follow the corners into a new frame.
+
+        Args:
+            frame (np.array): The next BGR frame.
+
+        Returns:
+            np.array: (4, 2) float32 corners in frame coordinates, or None
+                if tracking quality dropped (the tracker is then stopped).
+        """
+        if not self.active:
+            return None
+
+        gray = self._prepare(frame)
+        tracked = self.corners if self.points is None else self.points
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.prev_gray, gray, tracked, None, **self.lk_params
+        )
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(
+            gray, self.prev_gray, moved, None, **self.lk_params
+        )
+        fb_error = np.linalg.norm(back - tracked, axis=-1).ravel()
+        good = ((status.ravel() == 1) & (back_status.ravel() == 1) &
+                (fb_error < self.max_fb_error))
+        self.quality = good.mean()
+
+        if self.points is None:
+            # Every corner is needed to rebuild the perspective transform
+            if not good.all():
+                logger.debug("Lost a tracked corner.")
+                self.stop()
+                return None
+            self.corners = moved
+        else:
+            homography = None
+            if good.sum() >= 4 and self.quality >= self.min_quality:
+                homography, inliers = cv2.findHomography(
+                    tracked[good], moved[good], cv2.RANSAC, 3.0
+                )
+            if homography is None or (inliers.sum() / len(good) <
+                                      self.min_quality):
+                logger.debug(f"Tracking quality too low ({self.quality:.2f}).")
+                self.stop()
+                return None
+            # Re-project every point so occluded ones do not drift away
+            self.points = cv2.perspectiveTransform(self.points, homography)
+            self.corners = cv2.perspectiveTransform(self.corners, homography)
+
+        self.prev_gray = gray
+        return (self.corners.reshape(4, 2) / self.scale).astype(np.float32)
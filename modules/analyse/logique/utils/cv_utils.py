@@ -11,10 +11,30 @@ from typing import Any, Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
-from sklearn.cluster import DBSCAN, KMeans
+from sklearn.cluster import KMeans
 
 logger = logging.getLogger(__name__)
 
+# YOLO class ids
+BLACK_STONE = 0
+BOARD = 1
+CORNER = 2
+EMPTY_INTERSECTION = 3
+EMPTY_CORNER = 4
+EMPTY_EDGE = 5
+WHITE_STONE = 6
+
+# One row per detected box. `warped` and `inside` are filled in by
+# `warp_key_points` once the perspective matrix is known.
+DETECTION_DTYPE = np.dtype([
+    ("xyxy", np.float32, (4,)),
+    ("center", np.float32, (2,)),
+    ("warped", np.float32, (2,)),
+    ("inside", np.bool_),
+    ("conf", np.float32),
+    ("cls", np.int16),
+])
+
 
 def line_equation(x1: float, y1: float,
                   x2: float, y2: float) -> Tuple[float, float]:
@@ -54,9 +74,12 @@ def are_similar(line1: np.ndarray, line2: np.ndarray,
     return np.all(np.abs(line1 - line2) <= threshold)
 
 
-def removeDuplicates(lines: np.ndarray) -> np.ndarray:
+def removeDuplicates(lines: np.ndarray,
+                     threshold: float = 10.0) -> np.ndarray:
     """
     Groups similar lines and averages them to remove duplicates.
+
+    Lines are similar when all 4 coordinates are within `threshold`.
     """
     if len(lines) == 0:
         return np.array([])
@@ -69,7 +92,7 @@ def removeDuplicates(lines: np.ndarray) -> np.ndarray:
         x1, y1, x2, y2 = line
         found = False
         for key in list(grouped_lines.keys()):
-            if are_similar(np.array(key), np.array(line)):
+            if are_similar(np.array(key), np.array(line), threshold):
                 grouped_lines[key] = grouped_lines[key] + [line]
                 found = True
                 break
@@ -141,21 +164,13 @@ def map_intersections(
 
 def detect_intersections(cluster_1: np.ndarray,
                          cluster_2: np.ndarray,
-                         image: np.ndarray) -> np.ndarray:
+                         image_shape: Tuple[int, ...]) -> np.ndarray:
     """
-    Detects intersection points between two clusters of lines.
+    Detects intersection points between two clusters of lines, keeping
+    those inside an image of shape `image_shape` (height, width, ...).
     """
     intersections = []
-
-    # This logic is from the original utils_.py
-    if hasattr(image, 'shape'):
-        if callable(image.shape):
-            img_height, img_width = image.shape()[:2]
-        else:
-            img_height, img_width = image.shape[:2]
-    else:
-        raise ValueError(f"Image object has no 'shape' attribute. "
-                         f"Type: {type(image)}")
+    img_height, img_width = image_shape[:2]
 
     for v_line in cluster_1:
         for h_line in cluster_2:
@@ -169,50 +184,66 @@ def detect_intersections(cluster_1: np.ndarray,
     return np.array(intersections)
 
 
-def calculate_distances(lines: np.ndarray) -> List[float]:
+def _spacings(lines_a: np.ndarray, lines_b: np.ndarray) -> np.ndarray:
     """
-    Calculate average distances between consecutive lines in a sorted list.
+    Average endpoint distance between two broadcastable arrays of lines
+    (last axis holds x1, y1, x2, y2).
     """
-    distances = []
-    for i in range(len(lines) - 1):
-        dist_start = np.linalg.norm(lines[i + 1][:2] - lines[i][:2])
-        dist_end = np.linalg.norm(lines[i + 1][2:] - lines[i][2:])
-        distances.append((dist_start + dist_end) / 2)
-    return distances
+    diff = np.asarray(lines_b, dtype=float) - np.asarray(lines_a, dtype=float)
+    dist_start = np.sqrt((diff[..., :2] ** 2).sum(axis=-1))
+    dist_end = np.sqrt((diff[..., 2:] ** 2).sum(axis=-1))
+    return (dist_start + dist_end) / 2
 
 
-def find_common_distance(
-    distances: List[float], target_distance: float = 30.0
-) -> Tuple[float, np.ndarray]:
+def calculate_distances(lines: np.ndarray) -> np.ndarray:
     """
-    Finds the most common grid spacing distance using DBSCAN clustering.
+    Calculate average distances between consecutive lines in a sorted list.
     """
-    distances_reshaped = np.array(distances).reshape((-1, 1))
+    if len(lines) < 2:
+        return np.array([])
+    return _spacings(lines[:-1], lines[1:])
 
-    dbscan = DBSCAN(eps=1, min_samples=1)
-    labels = dbscan.fit_predict(distances_reshaped)
 
-    means = []
-    label_indices = []
+def find_common_distance(
+    distances: np.ndarray, target_distance: float = 30.0, eps: float = 1.0
+) -> Tuple[float, np.ndarray]:
+    """
+    Finds the most common grid spacing distance.
 
-    for label in np.unique(labels):
-        if label == -1:  # Skip noise points
-            continue
-        means.append(np.mean(distances_reshaped[labels == label]))
-        label_indices.append(label)
+    The distances are sorted and split wherever two neighbours are more
+    than `eps` apart, which yields the same clusters as DBSCAN with
+    `min_samples=1` without its overhead. Clusters keep DBSCAN's labelling
+    order (first appearance) so ties resolve identically.
+    """
+    distances_reshaped = np.asarray(distances, dtype=float).reshape((-1, 1))
+    values = distances_reshaped[:, 0]
+    if len(values) == 0:
+        return 0.0, distances_reshaped
 
-    if not means:
-        logger.warning("DBSCAN found no clusters, returning mean of all.")
-        # Handle case where all points might be noise
-        if len(distances) == 0:
-            return 0.0, np.array([])
-        return np.mean(distances), distances_reshaped
+    order = np.argsort(values, kind="stable")
+    sorted_labels = np.concatenate(
+        ([0], np.cumsum(np.diff(values[order]) > eps))
+    )
+    num_clusters = sorted_labels[-1] + 1
+
+    # Relabel clusters by the index of their first member
+    first_seen = np.full(num_clusters, len(values))
+    np.minimum.at(first_seen, sorted_labels, order)
+    relabel = np.empty(num_clusters, dtype=int)
+    relabel[np.argsort(first_seen)] = np.arange(num_clusters)
+    labels = np.empty(len(values), dtype=int)
+    labels[order] = relabel[sorted_labels]
+
+    # Per-cluster means, summing members in their original order
+    grouped = np.lexsort((np.arange(len(values)), labels))
+    counts = np.bincount(labels, minlength=num_clusters)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    means = np.add.reduceat(values[grouped], starts) / counts
 
     # Find the cluster mean closest to the target distance
-    index = np.argmin(np.abs(np.array(means) - target_distance))
-    chosen_label = label_indices[index]
+    chosen_label = np.argmin(np.abs(means - target_distance))
 
-    return means[index], distances_reshaped[labels == chosen_label]
+    return means[chosen_label], distances_reshaped[labels == chosen_label]
 
 
 def is_approx_multiple(value: float, base: float, threshold: float) -> bool:
@@ -228,10 +259,32 @@ def is_approx_multiple(value: float, base: float, threshold: float) -> bool:
     return check_under or check_over
 
 
+def _approx_multiple_mask(values: np.ndarray, base: float,
+                          threshold: float) -> np.ndarray:
+    """Element-wise version of `is_approx_multiple` for a non-zero base."""
+    remainder = np.mod(values, base)
+    near_multiple = ((np.abs(remainder - base) < threshold) |
+                     (np.abs(remainder) < threshold))
+    return np.where(values < base, (base - values) < threshold,
+                    near_multiple)
+
+
+def _vertical_mask(lines: np.ndarray) -> np.ndarray:
+    """Element-wise version of `is_vertical` over an (N, 4) array."""
+    dx = np.abs(lines[:, 0] - lines[:, 2])
+    dy = np.abs(lines[:, 1] - lines[:, 3])
+    return (dx < 50) & (dy > 50)
+
+
 def restore_and_remove_lines(lines: np.ndarray,
                              distance_threshold: float = 10.0) -> np.ndarray:
     """
     Restores missing grid lines and removes spurious lines.
+
+    Every pairwise spacing is computed up front, so walking the lines
+    only reads a boolean matrix: a line is kept when its distance to the
+    last kept line is a multiple of the grid spacing, and the missing
+    lines between kept neighbours are synthesised in a single batch.
     """
     if len(lines) == 0:
         return lines
@@ -252,36 +305,43 @@ def restore_and_remove_lines(lines: np.ndarray,
         logger.warning("Mean distance is 0, cannot restore lines.")
         return lines
 
-    restored_lines = []
-    i = 0
-    while i < len(lines) - 1:
-        dist_start = np.linalg.norm(lines[i + 1][:2] - lines[i][:2])
-        dist_end = np.linalg.norm(lines[i + 1][2:] - lines[i][2:])
-        spacing = (dist_start + dist_end) / 2
-
-        if is_approx_multiple(spacing, mean_distance, distance_threshold):
-            if spacing >= mean_distance:
-                num_missing_lines = round(spacing / mean_distance) - 1
-                for j in range(1, num_missing_lines + 1):
-                    if is_vertical(*lines[i]):
-                        x1 = lines[i][0] + j * mean_distance
-                        y1 = lines[i][1]
-                        x2 = lines[i][2] + j * mean_distance
-                        y2 = lines[i][3]
-                    else:
-                        x1 = lines[i][0]
-                        y1 = lines[i][1] + j * mean_distance
-                        x2 = lines[i][2]
-                        y2 = lines[i][3] + j * mean_distance
-                    restored_lines.append([x1, y1, x2, y2])
-        else:
-            # Spacing is not a multiple, remove the next line as spurious
-            lines = np.delete(lines, i + 1, axis=0)
-            i -= 1  # Re-check distances from the current line
-        i += 1
-
-    if restored_lines:
-        lines = np.append(lines, np.array(restored_lines, dtype=int), axis=0)
+    spacings = _spacings(lines[:, None, :], lines[None, :, :])
+    accepted = _approx_multiple_mask(spacings, mean_distance,
+                                     distance_threshold)
+
+    # A line is spurious when its spacing to the last kept line is not a
+    # multiple of the grid spacing
+    keep = np.zeros(len(lines), dtype=bool)
+    keep[0] = True
+    anchor = 0
+    for candidate in range(1, len(lines)):
+        if accepted[anchor, candidate]:
+            keep[candidate] = True
+            anchor = candidate
+
+    kept = np.flatnonzero(keep)
+    anchors = kept[:-1]
+    gaps = spacings[anchors, kept[1:]]
+    num_missing = np.where(gaps >= mean_distance,
+                           np.rint(gaps / mean_distance) - 1, 0).astype(int)
+    total_missing = num_missing.sum()
+
+    if total_missing > 0:
+        source = np.repeat(anchors, num_missing)
+        step = (np.arange(total_missing) -
+                np.repeat(np.cumsum(num_missing) - num_missing, num_missing) +
+                1)
+        shift = step * mean_distance
+        vertical = _vertical_mask(lines[source])
+
+        restored_lines = lines[source].astype(float)
+        restored_lines[vertical, 0] += shift[vertical]
+        restored_lines[vertical, 2] += shift[vertical]
+        restored_lines[~vertical, 1] += shift[~vertical]
+        restored_lines[~vertical, 3] += shift[~vertical]
+        lines = np.concatenate((lines[keep], restored_lines.astype(int)))
+    else:
+        lines = lines[keep]
 
     # Re-sort after additions
     lines = lines[lines[:, 0].argsort()]
@@ -292,45 +352,47 @@ def restore_and_remove_lines(lines: np.ndarray,
 
 
 def non_max_suppression(boxes: np.ndarray,
+                        scores: Optional[np.ndarray] = None,
                         overlap_thresh: float = 0.5) -> np.ndarray:
     """
     Applies non-maximum suppression (NMS) to remove redundant bounding boxes.
+
+    Overlap is measured as in the original implementation: the
+    intersection over the weaker box's own area, not IoU, so a small box
+    nested inside a stronger one is dropped.
+
+    Args:
+        boxes (np.array): (N, 4) boxes as x1, y1, x2, y2.
+        scores (np.array, optional): Confidence per box. Without scores,
+            boxes lower in the image win, as in the original implementation.
+        overlap_thresh (float): Fraction of a box covered by a stronger
+            kept box above which it is dropped.
+
+    Returns:
+        np.array: Indices of the kept boxes, strongest first.
     """
     if len(boxes) == 0:
-        return np.array([])
+        return np.array([], dtype=int)
 
-    if boxes.dtype.kind == "i":
-        boxes = boxes.astype("float")
-
-    pick = []
-    x1 = boxes[:, 0]
-    y1 = boxes[:, 1]
-    x2 = boxes[:, 2]
-    y2 = boxes[:, 3]
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if scores is None:
+        scores = boxes[:, 3]
+    x1, y1, x2, y2 = boxes.T
     area = (x2 - x1 + 1) * (y2 - y1 + 1)
-    idxs = np.argsort(y2)
 
-    while len(idxs) > 0:
-        last = len(idxs) - 1
-        i = idxs[last]
+    # Strongest first; ties go to the later box, as argsort + pop did
+    order = np.argsort(np.asarray(scores), kind="stable")[::-1]
+    pick = []
+    while len(order) > 0:
+        i = order[0]
         pick.append(i)
-
-        xx1 = np.maximum(x1[i], x1[idxs[:last]])
-        yy1 = np.maximum(y1[i], y1[idxs[:last]])
-        xx2 = np.minimum(x2[i], x2[idxs[:last]])
-        yy2 = np.minimum(y2[i], y2[idxs[:last]])
-
-        w = np.maximum(0, xx2 - xx1 + 1)
-        h = np.maximum(0, yy2 - yy1 + 1)
-
-        overlap = (w * h) / area[idxs[:last]]
-
-        delete_indices = np.concatenate(
-            ([last], np.where(overlap > overlap_thresh)[0])
-        )
-        idxs = np.delete(idxs, delete_indices)
-
-    return boxes[pick].astype("int")
+        rest = order[1:]
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) -
+                       np.maximum(x1[i], x1[rest]) + 1)
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) -
+                       np.maximum(y1[i], y1[rest]) + 1)
+        order = rest[(w * h) / area[rest] <= overlap_thresh]
+    return np.asarray(pick, dtype=int)
 
 
 def _cluster_lines(all_intersections: np.ndarray,
@@ -415,27 +477,75 @@ def _cluster_lines(all_intersections: np.ndarray,
     return cluster_lines_np.astype(int)
 
 
+def decode_detections(results: Any) -> np.ndarray:
+    """
+    Converts YOLO results into a DETECTION_DTYPE structured array.
+
+    The boxes are moved from torch to NumPy exactly once per frame;
+    every consumer then slices the returned array by class.
+    """
+    data = results[0].boxes.data
+    if hasattr(data, 'cpu'):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float32).reshape((-1, data.shape[-1]))
+    # Boxes.data columns: x1, y1, x2, y2, [track_id,] conf, cls
+    return make_detections(data[:, :4], data[:, -2], data[:, -1])
+
+
+def make_detections(xyxy: np.ndarray, conf: np.ndarray,
+                    cls: np.ndarray) -> np.ndarray:
+    """
+    Builds a DETECTION_DTYPE array from box columns, e.g. detections
+    read back from a cache (see detection_cache).
+
+    Args:
+        xyxy (np.array): (N, 4) box corners.
+        conf (np.array): (N,) confidences.
+        cls (np.array): (N,) class ids.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape((-1, 4))
+    detections = np.zeros(len(xyxy), dtype=DETECTION_DTYPE)
+    detections["xyxy"] = xyxy
+    detections["center"] = (xyxy[:, [0, 1]] + xyxy[:, [2, 3]]) / 2
+    detections["conf"] = conf
+    detections["cls"] = cls
+    return detections
+
+
+def warp_key_points(detections: np.ndarray,
+                    perspective_matrix: np.ndarray,
+                    output_edge: int = 600) -> np.ndarray:
+    """
+    Transforms every box centre with a single perspectiveTransform call
+    and flags those that land inside the warped (0, output_edge) image.
+    Updates `detections` in place and returns it.
+    """
+    if len(detections) == 0:
+        return detections
+
+    centers = np.ascontiguousarray(detections["center"], dtype=np.float32)
+    warped = cv2.perspectiveTransform(
+        centers.reshape((1, -1, 2)), perspective_matrix
+    ).reshape((-1, 2))
+
+    detections["warped"] = warped
+    detections["inside"] = ((warped >= 0).all(axis=1) &
+                            (warped <= output_edge).all(axis=1))
+    return detections
+
+
 def detect_lines(
-    model_results: Any, perspective_matrix: np.ndarray
+    detections: np.ndarray
 ) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Identifies and clusters all line intersections from model results.
-    'model_results' is expected to be a YOLO-like results object.
+    Identifies and clusters all line intersections from warped detections
+    (see `warp_key_points`).
 
     This function is based on the *working logic* from utils_.py.
     """
-    # Class 3: empty_intersection, 4: empty_corner, 5: empty_edge
-    empty_intersections = get_key_points(model_results, 3, perspective_matrix)
-    empty_corner = get_key_points(model_results, 4, perspective_matrix)
-    empty_edge = get_key_points(model_results, 5, perspective_matrix)
-
-    # Ensure all arrays are contiguous
-    if empty_intersections.size > 0:
-        empty_intersections = np.ascontiguousarray(empty_intersections)
-    if empty_corner.size > 0:
-        empty_corner = np.ascontiguousarray(empty_corner)
-    if empty_edge.size > 0:
-        empty_edge = np.ascontiguousarray(empty_edge)
+    empty_intersections = get_key_points(detections, EMPTY_INTERSECTION)
+    empty_corner = get_key_points(detections, EMPTY_CORNER)
+    empty_edge = get_key_points(detections, EMPTY_EDGE)
 
     arrays = [arr for arr in [empty_intersections, empty_corner, empty_edge]
               if arr.size > 0]
@@ -466,55 +576,56 @@ def detect_lines(
 def get_corners_inside_box(corners_boxes: np.ndarray,
                            board_box: np.ndarray) -> np.ndarray:
     """
-    Filters a list of boxes to find those with at least one corner
-    inside a main bounding box.
+    Returns a mask of the boxes with at least one corner inside a main
+    bounding box.
     """
-    board_box = np.array(board_box)
-    x1, y1, x2, y2 = board_box
+    x1, y1, x2, y2 = np.asarray(board_box)
 
-    sq_x1, sq_y1 = corners_boxes[:, 0], corners_boxes[:, 1]
-    sq_x2, sq_y2 = corners_boxes[:, 2], corners_boxes[:, 3]
+    xs_in = ((corners_boxes[:, [0, 2]] >= x1) &
+             (corners_boxes[:, [0, 2]] <= x2))
+    ys_in = ((corners_boxes[:, [1, 3]] >= y1) &
+             (corners_boxes[:, [1, 3]] <= y2))
 
-    # Check if any of the 4 corners of a box are inside the board_box
-    c1_in = (sq_x1 >= x1) & (sq_x1 <= x2) & (sq_y1 >= y1) & (sq_y1 <= y2)
-    c2_in = (sq_x2 >= x1) & (sq_x2 <= x2) & (sq_y1 >= y1) & (sq_y1 <= y2)
-    c3_in = (sq_x1 >= x1) & (sq_x1 <= x2) & (sq_y2 >= y1) & (sq_y2 <= y2)
-    c4_in = (sq_x2 >= x1) & (sq_x2 <= x2) & (sq_y2 >= y1) & (sq_y2 <= y2)
+    # A box corner is inside iff one of its x and one of its y are inside
+    return xs_in.any(axis=1) & ys_in.any(axis=1)
 
-    condition = c1_in | c2_in | c3_in | c4_in
-    return corners_boxes[condition]
 
-
-def get_corners(results: Any,
+def get_corners(detections: np.ndarray,
                 padding: Optional[float] = None) -> np.ndarray:
     """
-    Extracts the four corner-centers of the board from YOLO results.
+    Extracts the four corner-centers of the board from decoded detections
+    (see `decode_detections`). Corner boxes go through confidence-aware
+    NMS; if more than four survive inside the board, the four most
+    confident are used.
 
     This function uses the *working logic* from utils_.py.
     """
-    # Class 2 == "corner"
-    # This line is from the working utils_.py
-    # It must be np.array() not .cpu().numpy()
-    corner_boxes = np.array(results[0].boxes.xyxy[results[0].boxes.cls == 2])
+    classes = detections["cls"]
+    is_corner = classes == CORNER
+    corner_boxes = detections["xyxy"][is_corner]
+    corner_conf = detections["conf"][is_corner]
 
     if len(corner_boxes) < 4:
         raise Exception(f"Incorrect number of corners! "
                         f"Detected {len(corner_boxes)} corners")
 
-    corner_boxes_nms = non_max_suppression(corner_boxes)
+    corner_boxes = corner_boxes[non_max_suppression(corner_boxes,
+                                                    corner_conf)]
 
-    # Class 1 == "board"
-    board_box = results[0].boxes.xyxy[results[0].boxes.cls == 1].cpu().numpy()
-    if len(board_box) == 0:
+    board_boxes = detections[classes == BOARD]
+    if len(board_boxes) == 0:
         raise Exception("No 'board' (class 1) detected!")
-    model_board_edges = board_box[0]
+    model_board_edges = board_boxes["xyxy"][np.argmax(board_boxes["conf"])]
 
-    corner_boxes = get_corners_inside_box(corner_boxes_nms,
-                                          np.array(model_board_edges))
+    inside = np.flatnonzero(get_corners_inside_box(corner_boxes,
+                                                   model_board_edges))
 
-    if len(corner_boxes) != 4:
+    if len(inside) < 4:
         raise Exception(f"Incorrect number of corners! Detected "
-                        f"{len(corner_boxes)} after NMS/filtering.")
+                        f"{len(inside)} after NMS/filtering.")
+
+    # NMS keeps boxes strongest first, so extra candidates are the weakest
+    corner_boxes = corner_boxes[inside[:4]]
 
     # Get centers of the corner boxes
     corner_centers = ((corner_boxes[:, [0, 1]] +
@@ -538,63 +649,13 @@ def get_corners(results: Any,
     return corner_centers
 
 
-def get_key_points(results: Any,
-                   class_id: int,
-                   perspective_matrix: np.ndarray,
-                   output_edge: int = 600) -> np.ndarray:
+def get_key_points(detections: np.ndarray, class_id: int) -> np.ndarray:
     """
-    Extracts and transforms key points (like stones) from YOLO results.
-    'results' is expected to be a YOLO-like results object.
-
-    This function uses the *working logic* from utils_.py.
+    Returns the warped centres of one class that fall inside the warped
+    image. `detections` must have been through `warp_key_points`.
     """
-    # Get the boxes that match the class_id
-    mask = results[0].boxes.cls == class_id
-
-    # --- CRITICAL: Handle tensor vs. numpy ---
-    # Convert to CPU numpy immediately to avoid tensor issues
-    if hasattr(results[0].boxes.xywh, 'cpu'):
-        xywh_data = results[0].boxes.xywh.cpu().numpy()
-    else:
-        xywh_data = np.array(results[0].boxes.xywh)
-
-    if hasattr(mask, 'cpu'):
-        mask = mask.cpu().numpy()
-    else:
-        mask = np.array(mask)
-    # --- End Fix ---
-
-    # CRITICAL: Use np.copy() to ensure contiguous memory
-    key_points = np.copy(xywh_data[mask])
-
-    # If no points detected, return empty array immediately
-    if len(key_points) == 0:
-        return np.array([]).reshape((0, 2))
-
-    # Reshape to ensure correct dimensions
-    key_points = key_points.reshape((-1, 4))
-
-    # Get center points (x, y) from (x, y, w, h)
-    key_points = np.copy(key_points[:, [0, 1]])
-
-    # Apply perspective transform
-    key_points_for_transform = np.ascontiguousarray(key_points,
-                                                    dtype=np.float32)
-    key_points_transf = cv2.perspectiveTransform(
-        key_points_for_transform.reshape((1, -1, 2)),
-        perspective_matrix
-    ).reshape((-1, 2))
-
-    # CRITICAL: Make a contiguous copy before filtering
-    key_points_transf = np.ascontiguousarray(key_points_transf)
-
-    # Filter points that are outside the warped (0, 600) image bounds
-    mask_ge_0 = (key_points_transf >= 0).all(axis=1)
-    mask_le_edge = (key_points_transf <= output_edge).all(axis=1)
-    combined_mask = mask_ge_0 & mask_le_edge
-
-    # Return a copy to ensure it's contiguous
-    return np.copy(key_points_transf[combined_mask])
+    mask = (detections["cls"] == class_id) & detections["inside"]
+    return np.ascontiguousarray(detections["warped"][mask])
 
 
 def line_distance(line1: np.ndarray, line2: np.ndarray) -> float:
@@ -615,10 +676,7 @@ def average_distance(lines: np.ndarray) -> float:
     """
     if len(lines) < 2:
         return 0.0
-
-    distances = [line_distance(lines[i + 1], lines[i])
-                 for i in range(len(lines) - 1)]
-    return np.average(distances)
+    return np.average(calculate_distances(lines))
 
 
 def add_lines_in_the_edges(lines: np.ndarray,
@@ -635,51 +693,33 @@ def add_lines_in_the_edges(lines: np.ndarray,
     if mean_distance == 0:
         return lines
 
-    appended = False
     output_edge = 600  # Assumed warped image size
 
     if line_type == "vertical":
-        left_border = np.array([0, 0, 0, output_edge])
-        right_border = np.array([output_edge, 0, output_edge, output_edge])
-
-        if line_distance(lines[0], left_border) > mean_distance:
-            x1 = lines[0][0] - mean_distance
-            y1 = lines[0][1]
-            x2 = lines[0][2] - mean_distance
-            y2 = lines[0][3]
-            lines = np.append(lines, [[x1, y1, x2, y2]], axis=0)
-            appended = True
-        if line_distance(lines[-1], right_border) > mean_distance:
-            x1 = lines[-1][0] + mean_distance
-            y1 = lines[-1][1]
-            x2 = lines[-1][2] + mean_distance
-            y2 = lines[-1][3]
-            lines = np.append(lines, [[x1, y1, x2, y2]], axis=0)
-            appended = True
-
-        if appended:
-            lines = lines[lines[:, 0].argsort()]  # Re-sort by x
-
+        first_border = np.array([0, 0, 0, output_edge])
+        last_border = np.array([output_edge, 0, output_edge, output_edge])
+        step = np.array([mean_distance, 0, mean_distance, 0])
+        sort_axis = 0
     elif line_type == "horizontal":
-        top_border = np.array([0, 0, output_edge, 0])
-        bottom_border = np.array([0, output_edge, output_edge, output_edge])
-
-        if line_distance(lines[0], top_border) > mean_distance:
-            x1 = lines[0][0]
-            y1 = lines[0][1] - mean_distance
-            x2 = lines[0][2]
-            y2 = lines[0][3] - mean_distance
-            lines = np.append(lines, [[x1, y1, x2, y2]], axis=0)
-            appended = True
-        if line_distance(lines[-1], bottom_border) > mean_distance:
-            x1 = lines[-1][0]
-            y1 = lines[-1][1] + mean_distance
-            x2 = lines[-1][2]
-            y2 = lines[-1][3] + mean_distance
-            lines = np.append(lines, [[x1, y1, x2, y2]], axis=0)
-            appended = True
-
-        if appended:
-            lines = lines[lines[:, 1].argsort()]  # Re-sort by y
+        first_border = np.array([0, 0, output_edge, 0])
+        last_border = np.array([0, output_edge, output_edge, output_edge])
+        step = np.array([0, mean_distance, 0, mean_distance])
+        sort_axis = 1
+    else:
+        return lines.astype(int)
+
+    new_lines = []
+    if line_distance(lines[0], first_border) > mean_distance:
+        new_lines.append(lines[0] - step)
+    # The far edge is measured from the last *appended* line, as the
+    # original np.append-based version did; removeDuplicates later merges
+    # the copy this produces when the near edge was added.
+    last_line = new_lines[-1] if new_lines else lines[-1]
+    if line_distance(last_line, last_border) > mean_distance:
+        new_lines.append(last_line + step)
+
+    if new_lines:
+        lines = np.concatenate((lines, np.array(new_lines)))
+        lines = lines[lines[:, sort_axis].argsort()]
 
     return lines.astype(int)
@@ -0,0 +1,178 @@
+"""
+Detection Cache.
+
+YOLO is by far the most expensive stage of the pipeline, and its output
+does not depend on the geometry, stone assignment or corrector settings.
+The raw detections of every analysed frame (boxes, classes, confidences
+and the frame's index and timestamp) can therefore be recorded once and
+replayed through the downstream stages as often as needed.
+
+A cache is one compressed `.npz` file of flat columns: per frame, the
+index, timestamp and offset of its first box, and per box, its corners,
+confidence and class. Files are named after the video content hash and
+the YOLO model version, so a cache is never replayed against another
+video or model.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .cv_utils import make_detections
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, os.PathLike]
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(path: PathLike, digest_size: int = 16) -> str:
+    """Hex BLAKE2b digest of a file's content, read in chunks."""
+    digest = hashlib.blake2b(digest_size=digest_size)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(cache_dir: PathLike, video_path: PathLike,
+               model_path: PathLike) -> Path:
+    """
+    Cache file of a video analysed with a given YOLO model.
+
+    Args:
+        cache_dir (str): Directory holding the caches.
+        video_path (str): The analysed video.
+        model_path (str): The YOLO weights; their content is the model
+            version.
+
+    Returns:
+        Path: `<cache_dir>/<video hash>_<model hash>.npz`.
+    """
+    return Path(cache_dir) / (f"{file_digest(video_path)}_"
+                              f"{file_digest(model_path, 6)}.npz")
+
+
+class DetectionRecorder:
+    """Collects the detections of each analysed frame."""
+
+    def __init__(self, conf: float = 0.15):
+        """
+        Args:
+            conf (float): Confidence threshold YOLO was run with; replays
+                can only use stricter thresholds.
+        """
+        self.conf = conf
+        self.frame_index: List[int] = []
+        self.timestamp: List[float] = []
+        self.offsets: List[int] = [0]
+        self._boxes: List[np.ndarray] = []
+        self._current: Tuple[int, float] = (-1, 0.0)
+
+    def __len__(self) -> int:
+        return len(self.frame_index)
+
+    def begin_frame(self, frame_index: int, timestamp: float):
+        """Sets the video frame that the next detections belong to."""
+        self._current = (frame_index, timestamp)
+
+    def add(self, detections: np.ndarray):
+        """Records the detections of the current frame."""
+        frame_index, timestamp = self._current
+        self.frame_index.append(frame_index)
+        self.timestamp.append(timestamp)
+        self.offsets.append(self.offsets[-1] + len(detections))
+        self._boxes.append(detections[["xyxy", "conf", "cls"]].copy())
+
+    def save(self, path: PathLike):
+        """Writes the recorded frames as a compressed columnar file."""
+        boxes = (np.concatenate(self._boxes) if self._boxes else
+                 np.zeros(0, dtype=[("xyxy", np.float32, (4,)),
+                                    ("conf", np.float32),
+                                    ("cls", np.int16)]))
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a cache on disk is always complete
+        partial_path = path.with_name(path.name + ".partial")
+        with open(partial_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                frame_index=np.array(self.frame_index, dtype=np.int32),
+                timestamp=np.array(self.timestamp, dtype=np.float64),
+                offsets=np.array(self.offsets, dtype=np.int64),
+                xyxy=np.ascontiguousarray(boxes["xyxy"]),
+                conf=np.ascontiguousarray(boxes["conf"]),
+                cls=boxes["cls"].astype(np.uint8),
+                yolo_conf=np.float32(self.conf),
+            )
+        os.replace(partial_path, path)
+        logger.info(f"Saved detections of {len(self)} frames "
+                    f"({len(boxes)} boxes) to {path}")
+
+
+class DetectionCache:
+    """Detections recorded by a DetectionRecorder, read back for replay."""
+
+    def __init__(self, path: PathLike):
+        """
+        Args:
+            path (str): The cache file.
+        """
+        with np.load(path) as data:
+            self.frame_index: np.ndarray = data["frame_index"]
+            self.timestamp: np.ndarray = data["timestamp"]
+            self.offsets: np.ndarray = data["offsets"]
+            self.conf = float(data["yolo_conf"])
+            # Built once; each frame gets a copy of its slice
+            self._detections = make_detections(data["xyxy"], data["conf"],
+                                               data["cls"])
+
+    def __len__(self) -> int:
+        return len(self.frame_index)
+
+    def detections(self, frame: int,
+                   conf: Optional[float] = None) -> np.ndarray:
+        """
+        Detections of the `frame`-th recorded frame.
+
+        Args:
+            frame (int): Position in the cache (not the video frame index).
+            conf (float, optional): Drop boxes below this confidence.
+
+        Returns:
+            np.array: A fresh DETECTION_DTYPE array, as `decode_detections`
+                returned it when the frame was analysed.
+        """
+        detections = self._detections[self.offsets[frame]:
+                                      self.offsets[frame + 1]]
+        if conf is not None and conf > self.conf:
+            return detections[detections["conf"] >= conf]
+        return detections.copy()
+
+    def frames(self, conf: Optional[float] = None
+               ) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """
+        Replays every recorded frame, in recording order.
+
+        Args:
+            conf (float, optional): Confidence threshold of the replay.
+                Must not be below the one the cache was recorded with.
+
+        Yields:
+            tuple: Video frame index, timestamp in seconds and detections.
+
+        Raises:
+            ValueError: If `conf` is below the recorded threshold.
+        """
+        if conf is not None and conf < self.conf - 1e-6:
+            raise ValueError(f"Cache was recorded with conf={self.conf}; "
+                             f"cannot replay with conf={conf}")
+        for frame in range(len(self)):
+            yield (int(self.frame_index[frame]),
+                   float(self.timestamp[frame]),
+                   self.detections(frame, conf))
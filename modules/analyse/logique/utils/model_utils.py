@@ -6,13 +6,17 @@ using it to fill gaps in Go board state sequences.
 """
 
 import logging
-from typing import List, Tuple
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 import keras
 import numpy as np
 from keras.saving import load_model
 
+from . import go_rules
+from .bitboard import Bitboard, BoardLike, bitboards_to_timeline, iter_points
+
 logger = logging.getLogger(__name__)
+MoveTuple = Tuple[int, int, int]
 
 
 def load_corrector_model(model_path: str) -> keras.Model:
@@ -56,20 +60,28 @@ def delete_states(sequence: List[np.ndarray],
 
 
 def get_possible_moves(
-    initial_state: np.ndarray,
-    final_state: np.ndarray
+    initial_state: BoardLike,
+    final_state: BoardLike
 ) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
     """
     Get possible moves in a gap by diffing the start and end states.
 
     Args:
-        initial_state (np.array): The board state *before* the gap.
-        final_state (np.array): The board state *after* the gap.
+        initial_state (np.array | Bitboard): The board state *before* the gap.
+        final_state (np.array | Bitboard): The board state *after* the gap.
     Returns:
         tuple: A tuple containing:
             - list: List of (row, col) tuples for Black moves.
             - list: List of (row, col) tuples for White moves.
     """
+    if isinstance(initial_state, Bitboard) and isinstance(final_state,
+                                                          Bitboard):
+        # Same cells as `final - initial == 1` / `== 2` on arrays
+        black_mask = ((final_state.black & initial_state.empty) |
+                      (final_state.white & initial_state.black))
+        white_mask = final_state.white & initial_state.empty
+        return list(iter_points(black_mask)), list(iter_points(white_mask))
+
     difference = final_state - initial_state
 
     # Find all black moves (difference == 1)
@@ -83,6 +95,208 @@ def get_possible_moves(
     return black_moves, white_moves
 
 
+class GapRequest(NamedTuple):
+    """The inputs needed to fill one gap."""
+    initial_state: np.ndarray
+    num_moves: int
+    first_player: int
+    black_moves: List[Tuple[int, int]]
+    white_moves: List[Tuple[int, int]]
+
+
+def fill_gap(model: keras.Model,
+             initial_state: np.ndarray,
+             num_moves: int,
+             first_player: int,
+             black_possible_moves: List[Tuple[int, int]],
+             white_possible_moves: List[Tuple[int, int]]
+             ) -> List[Optional[MoveTuple]]:
+    """
+    Picks the moves of a single gap with the AI model, one position at a
+    time, starting from the state before the gap.
+
+    Args:
+        model (keras.Model): The corrector model.
+        initial_state (np.array): The 19x19 board state before the gap.
+        num_moves (int): Number of gap positions to fill.
+        first_player (int): Player of the first gap position (1 or 2).
+        black_possible_moves (list): Candidate (row, col) for Black.
+        white_possible_moves (list): Candidate (row, col) for White.
+
+    Returns:
+        list: One entry per gap position, the (row, col, player) played
+            there or None when the player had no valid move (the position
+            then repeats the previous state).
+    """
+    request = GapRequest(initial_state, num_moves, first_player,
+                         black_possible_moves, white_possible_moves)
+    return fill_gaps_batched(model, [request])[0]
+
+
+class _Beam(NamedTuple):
+    """A partial fill of one gap."""
+    board: Bitboard
+    moves_left: Dict[int, List[Tuple[int, int]]]
+    player: int
+    moves: List[Optional[MoveTuple]]
+    score: float  # Sum of the log-probabilities of the chosen moves
+    ko: Optional[Tuple[int, int]] = None
+    skipped: int = 0  # Depths filled with the copying-state fallback
+
+
+def _rank(skipped: int, score: float) -> Tuple[int, float]:
+    """Sort key of a fill: fewest skipped moves first, then best score."""
+    return skipped, -score
+
+
+def fill_gaps_batched(model: keras.Model,
+                      gaps: Sequence[GapRequest],
+                      batch_size: int = 256,
+                      beam_width: int = 1
+                      ) -> List[List[Optional[MoveTuple]]]:
+    """
+    Fills many independent gaps with one model call per gap depth.
+
+    Every gap keeps its `beam_width` most likely partial fills, scored by
+    the summed log-probability of their moves. Fills that had to skip a
+    move (no legal candidate left) rank below every fill that placed
+    more moves, whatever their scores. At each depth, the
+    candidate boards of every beam of every open gap are stacked into a
+    single batch, scored in one `model.predict` call and scattered back.
+    With `beam_width=1` this is the greedy argmax fill, and each gap gets
+    the same moves as if it were filled on its own.
+
+    Candidates are played with the rules engine: illegal moves (occupied,
+    suicide, ko) are pruned before inference, and the boards the model
+    scores have the captured stones removed.
+
+    Args:
+        model (keras.Model): The corrector model.
+        gaps (Sequence): Gaps to fill, as GapRequest or any object with
+            the same attributes.
+        batch_size (int): Batch size passed to `model.predict`.
+        beam_width (int): Partial fills kept per gap.
+
+    Returns:
+        list: The moves of each gap's best fill, in the format returned by
+            `fill_gap`.
+    """
+    if beam_width < 1:
+        raise ValueError(f"Beam width must be at least 1, got {beam_width}")
+
+    beams = [
+        [_Beam(Bitboard.from_array(gap.initial_state),
+               {1: list(gap.black_moves), 2: list(gap.white_moves)},
+               gap.first_player, [], 0.0)]
+        for gap in gaps
+    ]
+    max_depth = max((gap.num_moves for gap in gaps), default=0)
+
+    for depth in range(max_depth):
+        # (gap, beam, move, position after the move) of every legal move
+        pending = []
+        for i, gap in enumerate(gaps):
+            if depth >= gap.num_moves:
+                continue
+            for j, beam in enumerate(beams[i]):
+                num_pending = len(pending)
+                for move in beam.moves_left[beam.player]:
+                    try:
+                        result = go_rules.play(beam.board, int(move[0]),
+                                               int(move[1]), beam.player,
+                                               beam.ko)
+                    except ValueError:
+                        continue
+                    pending.append((i, j, move, result))
+                if len(pending) > num_pending:
+                    continue
+                logger.warning(
+                    f"No valid moves for player {beam.player} at "
+                    f"gap index {depth}. Using fallback (copying state)."
+                )
+                beams[i][j] = beam._replace(player=3 - beam.player,
+                                            moves=beam.moves + [None],
+                                            skipped=beam.skipped + 1)
+
+        if not pending:
+            continue
+
+        # One candidate board per legal move of every pending beam
+        players = np.array([beams[i][j].player for i, j, _, _ in pending])
+        batch_boards = bitboards_to_timeline(
+            [result.board for _, _, _, result in pending]
+        )
+
+        # Predict probabilities for all candidate boards at once
+        try:
+            probabilities = model.predict(
+                batch_boards[..., None].astype(np.float32), verbose=0,
+                batch_size=batch_size
+            )
+            scores = probabilities[np.arange(len(players)), players - 1]
+            if beam_width > 1:
+                scores = np.log(np.maximum(scores,
+                                           np.finfo(np.float32).tiny))
+            # With a single beam only the order of the candidates matters,
+            # so the raw outputs are ranked, like the greedy argmax
+        except Exception as e:
+            logger.error(f"Prediction error at gap index {depth}: {e}. "
+                         "Using first valid move as fallback.")
+            # Equal scores: the stable ranking keeps the first moves
+            scores = np.zeros(len(players))
+
+        # Candidates of each gap, in (beam, move) order
+        candidates: Dict[int, List[Tuple[int, float, int,
+                                         Optional[int]]]] = {}
+        expanded: Dict[int, set] = {}
+        for row, (i, j, _, _) in enumerate(pending):
+            beam = beams[i][j]
+            candidates.setdefault(i, []).append(
+                (beam.skipped, beam.score + scores[row], j, row)
+            )
+            expanded.setdefault(i, set()).add(j)
+        # Beams without a valid move this depth keep their score, but
+        # rank below the beams that placed one
+        for i, gap_candidates in candidates.items():
+            gap_candidates.extend((beam.skipped, beam.score, j, None)
+                                  for j, beam in enumerate(beams[i])
+                                  if j not in expanded[i])
+
+        for i, gap_candidates in candidates.items():
+            next_beams: List[_Beam] = []
+            seen = set()
+            for _, score, j, row in sorted(
+                gap_candidates, key=lambda cand: _rank(cand[0], cand[1])
+            ):
+                beam = beams[i][j]
+                if row is not None:
+                    _, _, move, result = pending[row]
+                    beam = _expand_beam(beam, move, result, score)
+                # Different move orders can reach the same board
+                if beam.board in seen:
+                    continue
+                seen.add(beam.board)
+                next_beams.append(beam)
+                if len(next_beams) == beam_width:
+                    break
+            beams[i] = next_beams
+
+    return [gap_beams[0].moves for gap_beams in beams]
+
+
+def _expand_beam(beam: _Beam, move: Tuple[int, int],
+                 result: go_rules.MoveResult, score: float) -> _Beam:
+    """Returns the beam after `beam.player` played `move`."""
+    moves_left = dict(beam.moves_left)
+    moves_left[beam.player] = [
+        candidate for candidate in moves_left[beam.player]
+        if candidate is not move
+    ]
+    return _Beam(result.board, moves_left, 3 - beam.player,
+                 beam.moves + [(int(move[0]), int(move[1]), beam.player)],
+                 score, result.ko, beam.skipped)
+
+
 def fill_gaps(model: keras.Model,
               sequence_with_gap: List[np.ndarray],
               gap_start: int,
@@ -91,6 +305,8 @@ def fill_gaps(model: keras.Model,
               white_possible_moves: List[Tuple[int, int]]) -> List[np.ndarray]:
     """
     Fill the gaps in a sequence using the AI model to pick the best move.
+    The sequence is copied; use `fill_gap` to get the moves of a gap
+    without rebuilding the sequence.
     """
     filled_sequence = sequence_with_gap.copy()
 
@@ -112,91 +328,19 @@ def fill_gaps(model: keras.Model,
         # Default to Black if we don't have enough history
         current_player = 1
 
-    black_moves = black_possible_moves.copy()
-    white_moves = white_possible_moves.copy()
-
     logger.info(f"Filling gap from {gap_start} to {gap_end}, "
                 f"starting with player {current_player}")
 
-    for gap_index in range(gap_start, gap_end):
-        current_board_state = filled_sequence[gap_index - 1]
-        possible_moves = black_moves if current_player == 1 else white_moves
-
-        # Find moves that are valid (i.e., on an empty intersection)
-        valid_moves = [
-            move for move in possible_moves
-            if current_board_state[move[0], move[1]] == 0
-        ]
-
-        if not valid_moves:
-            logger.warning(
-                f"No valid moves for player {current_player} at "
-                f"gap index {gap_index}. Using fallback (copying state)."
-            )
-            # Fallback: copy previous state and try to continue
-            filled_sequence[gap_index] = current_board_state.copy()
-            # Switch player and continue
-            current_player = 3 - current_player
-            continue
-
-        candidate_boards = []
-        candidate_moves = []
-
-        for move in valid_moves:
-            x, y = move
-            candidate_board = current_board_state.copy()
-            candidate_board[x, y] = current_player
-            candidate_boards.append(candidate_board)
-            candidate_moves.append(move)
-
-        # Prepare batch for the model
-        batch_boards = np.array(candidate_boards)
-        batch_boards = np.expand_dims(batch_boards, axis=-1)
-        batch_boards = batch_boards.astype(np.float32)
-
-        # Predict probabilities for all candidate boards at once
-        try:
-            probabilities = model.predict(batch_boards, verbose=0)
-
-            # Get the index of the best move
-            best_move_idx = np.argmax(probabilities[:, current_player - 1])
-            best_move = candidate_moves[best_move_idx]
-
-            # Update the board state in the sequence
-            x, y = best_move
-            filled_sequence[gap_index] = current_board_state.copy()
-            filled_sequence[gap_index][x, y] = current_player
-
-            # Remove the chosen move from the list of possibilities
-            if current_player == 1:
-                if best_move in black_moves:
-                    black_moves.remove(best_move)
-            else:
-                if best_move in white_moves:
-                    white_moves.remove(best_move)
-
-            logger.debug(
-                f"Filled gap {gap_index}: "
-                f"Player {current_player} at {best_move}"
-            )
-
-        except Exception as e:
-            logger.error(f"Prediction error at gap {gap_index}: {e}. "
-                         "Using first valid move as fallback.")
-            # Fallback: use the first valid move
-            best_move = valid_moves[0]
-            x, y = best_move
-            filled_sequence[gap_index] = current_board_state.copy()
-            filled_sequence[gap_index][x, y] = current_player
-            # Ensure move is removed from list even in fallback
-            if current_player == 1:
-                if best_move in black_moves:
-                    black_moves.remove(best_move)
-            else:
-                if best_move in white_moves:
-                    white_moves.remove(best_move)
-
-        # Switch player for the next move
-        current_player = 3 - current_player  # 1 -> 2, 2 -> 1
+    gap_moves = fill_gap(model, filled_sequence[gap_start - 1],
+                         gap_end - gap_start, current_player,
+                         black_possible_moves, white_possible_moves)
+
+    ko = None
+    for gap_index, move in enumerate(gap_moves, start=gap_start):
+        filled_sequence[gap_index] = filled_sequence[gap_index - 1].copy()
+        if move is not None:
+            # Same position as the gap filler, captures included
+            result = go_rules.play(filled_sequence[gap_index], *move, ko)
+            filled_sequence[gap_index], ko = result.board, result.ko
 
     return filled_sequence
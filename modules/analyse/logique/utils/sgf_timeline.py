@@ -0,0 +1,328 @@
+"""
+SGF to Timeline Conversion.
+
+Reads SGF game records straight into (T, 19, 19) uint8 timelines (0 =
+empty, 1 = black, 2 = white), where state 0 is the position after the
+root node's setup stones and state i the position after the i-th move of
+the main line. Captures and ko are resolved on bitboards by `go_rules`,
+and the whole timeline is unpacked to an array in one call at the end.
+
+Coordinates follow the rest of the package (see `sgf_writer`): the first
+SGF letter is the row index and the second one the column index, so
+`to_sgf` and `sgf_to_timeline` round-trip.
+
+A directory of SGF files can be converted in a process pool into one
+memory-mapped dataset (`TimelineDataset`): every state of every game in
+a single raw uint8 file, plus an index of where each game starts.
+"""
+
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from . import go_rules
+from .bitboard import BOARD_SIZE, Bitboard, bitboards_to_timeline
+
+logger = logging.getLogger(__name__)
+
+MoveTuple = Tuple[int, int, int]
+PathLike = Union[str, os.PathLike]
+
+# Row and column of a pass in a move tuple
+PASS = -1
+
+# File names inside a dataset directory
+DATASET_STATES = "states.u8"
+DATASET_INDEX = "index.npz"
+
+# Games sent to a worker at a time
+CONVERT_CHUNK_SIZE = 16
+
+# '(', ')', ';' or a property with all its values, whitespace skipped
+_TOKEN = re.compile(
+    r"\s*(?:([();])|([A-Za-z]+)\s*((?:\[(?:\\.|[^\\\]])*\]\s*)+))", re.S
+)
+_VALUE = re.compile(r"\[((?:\\.|[^\\\]])*)\]", re.S)
+
+
+class SGFRecord(NamedTuple):
+    """Main line of an SGF game."""
+    board_size: int
+    setup: List[MoveTuple]  # Root setup stones (handicap)
+    moves: List[MoveTuple]  # Passes have row = col = PASS
+    # Setup stones of later nodes, as (move index, stones, cleared points)
+    edits: List[Tuple[int, List[MoveTuple], List[Tuple[int, int]]]]
+
+
+def _parse_nodes(text: str) -> List[dict]:
+    """
+    Properties of every node of the main line.
+
+    The main line follows the first variation at every branch, so it
+    ends at the first closing parenthesis.
+    """
+    nodes: List[dict] = []
+    started = False
+    for match in _TOKEN.finditer(text):
+        symbol, name, values = match.groups()
+        if symbol == "(":
+            started = True
+        elif symbol == ")":
+            if started:
+                break
+        elif symbol == ";":
+            if started:
+                nodes.append({})
+        elif nodes:
+            # FF[3] allows lower case letters in property names (AddBlack)
+            name = "".join(char for char in name if char.isupper())
+            nodes[-1].setdefault(name, []).extend(_VALUE.findall(values))
+    if not nodes:
+        raise ValueError("No game tree found")
+    return nodes
+
+
+def _point(value: str, board_size: int) -> Optional[Tuple[int, int]]:
+    """(row, col) of an SGF point, None for a pass ('' or 'tt')."""
+    if value == "" or (value == "tt" and board_size <= 19):
+        return None
+    if len(value) != 2:
+        raise ValueError(f"Invalid point '{value}'")
+    row, col = ord(value[0]) - ord("a"), ord(value[1]) - ord("a")
+    if not (0 <= row < board_size and 0 <= col < board_size):
+        raise ValueError(f"Point '{value}' is off the board")
+    return row, col
+
+
+def _points(values: Iterable[str], board_size: int) -> List[Tuple[int, int]]:
+    """Expands a point list, including compressed 'aa:cc' rectangles."""
+    points = []
+    for value in values:
+        first, _, last = value.partition(":")
+        start = _point(first, board_size)
+        end = _point(last, board_size) if last else start
+        if start is None or end is None:
+            continue
+        points.extend(
+            (row, col)
+            for row in range(min(start[0], end[0]), max(start[0], end[0]) + 1)
+            for col in range(min(start[1], end[1]), max(start[1], end[1]) + 1)
+        )
+    return points
+
+
+def parse_sgf(text: str) -> SGFRecord:
+    """
+    Parses the main line of an SGF game.
+
+    Args:
+        text (str): SGF data. Only the first game of a collection is read.
+
+    Returns:
+        SGFRecord: Board size, setup stones, moves and later setup edits.
+
+    Raises:
+        ValueError: If the data holds no game or an invalid point.
+    """
+    nodes = _parse_nodes(text)
+    board_size = int(nodes[0].get("SZ", ["19"])[0].partition(":")[0])
+
+    setup: List[MoveTuple] = []
+    moves: List[MoveTuple] = []
+    edits = []
+    for node in nodes:
+        stones = [(row, col, player)
+                  for name, player in (("AB", 1), ("AW", 2))
+                  for row, col in _points(node.get(name, ()), board_size)]
+        cleared = _points(node.get("AE", ()), board_size)
+        if not moves and not cleared:
+            setup.extend(stones)
+        elif stones or cleared:
+            edits.append((len(moves), stones, cleared))
+
+        for name, player in (("B", 1), ("W", 2)):
+            if name in node:
+                point = _point(node[name][0], board_size)
+                row, col = point if point is not None else (PASS, PASS)
+                moves.append((row, col, player))
+    return SGFRecord(board_size, setup, moves, edits)
+
+
+def record_to_timeline(record: SGFRecord) -> np.ndarray:
+    """
+    Plays a parsed game, resolving captures and ko.
+
+    Args:
+        record (SGFRecord): The game, from `parse_sgf`.
+
+    Returns:
+        np.array: (num_moves + 1, 19, 19) uint8 timeline.
+
+    Raises:
+        ValueError: If the board is not 19x19 or a move is illegal.
+    """
+    if record.board_size != BOARD_SIZE:
+        raise ValueError(f"Only {BOARD_SIZE}x{BOARD_SIZE} games are "
+                         f"supported, got {record.board_size}")
+
+    board = Bitboard()
+    for row, col, player in record.setup:
+        board = board.remove(row, col).add(row, col, player)
+    boards = [board]
+    edits = iter(record.edits)
+    edit = next(edits, None)
+    ko = None
+
+    for index, (row, col, player) in enumerate(record.moves):
+        while edit is not None and edit[0] == index:
+            _, stones, cleared = edit
+            for point in cleared:
+                board = board.remove(*point)
+            for s_row, s_col, s_player in stones:
+                board = board.remove(s_row, s_col).add(s_row, s_col, s_player)
+            ko = None
+            edit = next(edits, None)
+        if row == PASS:
+            ko = None
+        else:
+            try:
+                board, _, ko = go_rules.play(board, row, col, player, ko)
+            except ValueError as e:
+                raise ValueError(f"Move {index + 1}: {e}") from e
+        boards.append(board)
+    return bitboards_to_timeline(boards)
+
+
+def sgf_text_to_timeline(text: str) -> np.ndarray:
+    """Converts SGF data to a (T, 19, 19) uint8 timeline."""
+    return record_to_timeline(parse_sgf(text))
+
+
+def sgf_to_timeline(sgf_file_path: PathLike) -> np.ndarray:
+    """
+    Converts an SGF file to a (T, 19, 19) uint8 timeline.
+
+    Args:
+        sgf_file_path (str): Path to the .sgf file.
+
+    Returns:
+        np.array: State 0 is the position after setup, state i the
+            position after move i, captures removed.
+
+    Raises:
+        ValueError: If the game cannot be parsed or played.
+    """
+    with open(sgf_file_path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    try:
+        return sgf_text_to_timeline(text)
+    except ValueError as e:
+        raise ValueError(f"{sgf_file_path}: {e}") from e
+
+
+class TimelineDataset:
+    """Memory-mapped timelines of many games, written by `convert_sgf_directory`."""
+
+    def __init__(self, path: PathLike):
+        """
+        Args:
+            path (str): The dataset directory.
+        """
+        self.path = Path(path)
+        with np.load(self.path / DATASET_INDEX) as index:
+            self.names: List[str] = [str(name) for name in index["names"]]
+            self.offsets: np.ndarray = index["offsets"]
+        num_states = int(self.offsets[-1])
+        self.states: np.ndarray = (
+            np.memmap(self.path / DATASET_STATES, dtype=np.uint8, mode="r",
+                      shape=(num_states, BOARD_SIZE, BOARD_SIZE))
+            if num_states else
+            np.zeros((0, BOARD_SIZE, BOARD_SIZE), dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, game: int) -> np.ndarray:
+        """The (T, 19, 19) timeline of a game, as a read-only view."""
+        return self.states[self.offsets[game]:self.offsets[game + 1]]
+
+    @property
+    def num_states(self) -> int:
+        """Number of states over all games."""
+        return len(self.states)
+
+
+def _convert_file(path: str) -> Tuple[str, Optional[bytes], str]:
+    """
+    Worker task: converts one file.
+
+    Returns:
+        tuple: The path, the raw timeline bytes (None on failure) and the
+            error message.
+    """
+    try:
+        return path, sgf_to_timeline(path).tobytes(), ""
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def convert_sgf_directory(sgf_dir: PathLike, output_dir: PathLike,
+                          num_workers: Optional[int] = None,
+                          pattern: str = "*.sgf") -> TimelineDataset:
+    """
+    Converts every SGF file of a directory into one memory-mapped dataset.
+
+    Files are converted in a process pool and written in sorted path
+    order as they complete, so memory use does not grow with the number
+    of games. Files that cannot be parsed or played are skipped with a
+    warning.
+
+    Args:
+        sgf_dir (str): Directory searched recursively for SGF files.
+        output_dir (str): Dataset directory, created if needed.
+        num_workers (int, optional): Worker processes. Defaults to the
+            number of CPUs; 1 converts in this process.
+        pattern (str): Glob pattern of the files to convert.
+
+    Returns:
+        TimelineDataset: The converted dataset.
+    """
+    sgf_dir, output_dir = Path(sgf_dir), Path(output_dir)
+    paths = sorted(str(path) for path in sgf_dir.rglob(pattern))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    num_workers = num_workers or os.cpu_count() or 1
+
+    names: List[str] = []
+    offsets = [0]
+    state_bytes = BOARD_SIZE * BOARD_SIZE
+    with open(output_dir / DATASET_STATES, "wb") as out:
+        if num_workers > 1 and len(paths) > 1:
+            executor = ProcessPoolExecutor(max_workers=num_workers)
+            results = executor.map(_convert_file, paths,
+                                   chunksize=CONVERT_CHUNK_SIZE)
+        else:
+            executor = None
+            results = map(_convert_file, paths)
+        try:
+            for path, data, error in results:
+                if data is None:
+                    logger.warning(f"Skipping SGF file: {error}")
+                    continue
+                out.write(data)
+                names.append(os.path.relpath(path, sgf_dir))
+                offsets.append(offsets[-1] + len(data) // state_bytes)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    np.savez(output_dir / DATASET_INDEX, names=np.array(names, dtype=str),
+             offsets=np.array(offsets, dtype=np.int64))
+    logger.info(f"Converted {len(names)}/{len(paths)} games "
+                f"({offsets[-1]} states) to {output_dir}")
+    return TimelineDataset(output_dir)
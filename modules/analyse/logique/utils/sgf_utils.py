@@ -9,8 +9,9 @@ import logging
 from typing import List, Tuple
 
 import numpy as np
-import sente
-from sente import sgf
+
+from .sgf_timeline import sgf_text_to_timeline, sgf_to_timeline
+from .sgf_writer import moves_to_sgf
 
 logger = logging.getLogger(__name__)
 
@@ -25,54 +26,41 @@ def sgf_to_numpy(sgf_file_path: str) -> np.ndarray:
         sgf_file_path (str): The file path to the .sgf file.
 
     Returns:
-        np.array: A NumPy array of shape (num_moves + 1, 19, 19),
-                  where:
+        np.array: A uint8 NumPy array of shape (num_moves + 1, 19, 19),
+                  captures removed (see sgf_timeline), where:
                   - 0 = empty
                   - 1 = black stone
                   - 2 = white stone
+                  The row is the second SGF letter and the column the
+                  first, as sente's arrays were read.
     """
-    game = sgf.load(sgf_file_path)
-    moves = game.get_default_sequence()
-    num_moves = len(moves)
-    # result[i] = board state at move i (index 0 is empty board)
-    result = np.zeros((num_moves + 1, 19, 19), dtype=int)
-
-    for i in range(1, num_moves + 1):
-        game.play(moves[i - 1])
-        # Get sente's 19x19x1 numpy arrays
-        black_stones_np = game.numpy(["black_stones"])
-        white_stones_np = game.numpy(["white_stones"])
-
-        # Transpose and fill our result array
-        # Sente's numpy is (col, row, channel), we want (row, col)
-        for row in range(19):
-            for col in range(19):
-                if black_stones_np[col][row][0] == 1:
-                    result[i, row, col] = 1
-                elif white_stones_np[col][row][0] == 1:
-                    result[i, row, col] = 2
-    return result
-
-
-def to_sgf(move_list: List[Tuple[int, int, int]]) -> str:
+    # sgf_to_timeline takes the row from the first letter
+    return np.ascontiguousarray(
+        sgf_to_timeline(sgf_file_path).transpose(0, 2, 1)
+    )
+
+
+def to_sgf(move_list: List[Tuple[int, int, int]],
+           validate: bool = False) -> str:
     """
     Converts a simple list of moves into an SGF file string.
 
+    The text is written directly (see sgf_writer) and is identical to
+    replaying the moves in a sente game and dumping it. Colours alternate
+    from Black, as sente assigns them.
+
     Args:
         move_list (list): A list of move tuples, where each tuple is
                           (row, col, player_num).
                           - player_num: 1 for Black, 2 for White.
                           - row, col: 0-18 indices.
+        validate (bool): Raise ValueError on the first illegal move
+                         instead of writing every move.
 
     Returns:
         str: A string containing the SGF data.
     """
-    game = sente.Game()
-    for move in move_list:
-        row, col, player = move
-        # Sente uses 1-19 indexing for play()
-        game.play(row + 1, col + 1)
-    return sgf.dumps(game)
+    return moves_to_sgf(move_list, validate=validate)
 
 
 # --- Functions from fill_gaps_model.py ---
@@ -95,12 +83,16 @@ def sgf_to_sequence(sgf_file: str, board_size: int = 19) -> List[np.ndarray]:
     """
     Convert an SGF file to a sequence of Go board states.
 
+    Only 19x19 games are supported; other sizes are logged as errors.
+
     Args:
         sgf_file (str): Path to the SGF file.
-        board_size (int): Size of the Go board.
+        board_size (int): Deprecated and unused; the size is read from
+            the file.
 
     Returns:
-        list: A sequence (list) of 19x19 np.array board states.
+        list: A sequence (list) of 19x19 np.array board states, with
+              captured stones removed.
     """
     try:
         with open(sgf_file, 'r') as f:
@@ -110,28 +102,15 @@ def sgf_to_sequence(sgf_file: str, board_size: int = 19) -> List[np.ndarray]:
         return []
 
     try:
-        collection = sgf.parse(sgf_content)
-    except Exception as e:
+        timeline = sgf_text_to_timeline(sgf_content)
+    except ValueError as e:
         logger.error(f"Failed to parse SGF content: {e}")
         return []
 
-    game = collection[0]  # Assume a single game
-    board = np.zeros((board_size, board_size), dtype=int)
-    sequence = [board.copy()]
-
-    for node in game.rest:
-        move = node.properties
-        if 'B' in move:  # Black move
-            x, y = sgf_coords_to_indices(move['B'][0], board_size)
-            if 0 <= x < board_size and 0 <= y < board_size:
-                board[x, y] = 1
-        elif 'W' in move:  # White move
-            x, y = sgf_coords_to_indices(move['W'][0], board_size)
-            if 0 <= x < board_size and 0 <= y < board_size:
-                board[x, y] = 2
-        sequence.append(board.copy())
-
-    return sequence
+    # This format puts the SGF column letter first and counts rows from
+    # the bottom: board[size - 1 - y, x]
+    timeline = timeline.transpose(0, 2, 1)[:, ::-1].astype(int)
+    return list(timeline)
 
 
 def sequence_to_sgf(sequence: List[np.ndarray], board_size: int = 19) -> str:
@@ -0,0 +1,126 @@
+"""
+Direct SGF Writer.
+
+Writes a `(row, col, player)` move list as SGF text without replaying it
+through a sente game. The output is byte-identical to `sente.sgf.dumps`
+for the same legal game: the same root properties and one `;B[..]` /
+`;W[..]` node per move, with colours alternating from Black as sente
+assigns them.
+
+Moves can be appended one at a time, which keeps live exports cheap, and
+are only checked against the rules (see `go_rules`) when validation is
+enabled, so a single bad move does not abort an export.
+"""
+
+import logging
+from typing import Iterable, List, Optional, TextIO, Tuple
+
+from . import go_rules
+from .bitboard import Bitboard
+
+logger = logging.getLogger(__name__)
+
+MoveTuple = Tuple[int, int, int]
+
+# Root node written by sente for a new game
+SGF_ROOT = "(;FF[4]SZ[{size}]RU[Chinese]\n"
+COLORS = {1: "B", 2: "W"}
+
+
+def point_to_sgf(row: int, col: int) -> str:
+    """SGF coordinates of a point, as sente writes them (e.g. 'dd')."""
+    return chr(ord("a") + row) + chr(ord("a") + col)
+
+
+class SGFWriter:
+    """Builds an SGF game record one move at a time."""
+
+    def __init__(self, board_size: int = 19, validate: bool = False):
+        """
+        Args:
+            board_size (int): Size of the board.
+            validate (bool): Check every move against the rules and raise
+                on illegal ones. Off by default; only 19x19 boards can be
+                validated.
+        """
+        if validate and board_size != go_rules.BOARD_SIZE:
+            raise ValueError("Moves can only be validated on "
+                             f"{go_rules.BOARD_SIZE}x{go_rules.BOARD_SIZE}")
+        self.board_size = board_size
+        self.validate = validate
+        self.player = 1  # Colour of the next node
+        self.num_moves = 0
+        # Nodes already joined into `_body`, and the ones added since
+        self._body = ""
+        self._nodes: List[str] = []
+        self._text: Optional[str] = None
+        self._board: Optional[Bitboard] = Bitboard() if validate else None
+        self._ko: Optional[Tuple[int, int]] = None
+
+    def append(self, row: int, col: int):
+        """
+        Add a move for the player whose turn it is.
+
+        Args:
+            row (int): 0-based row index.
+            col (int): 0-based column index.
+
+        Raises:
+            ValueError: If validation is on and the move is illegal.
+        """
+        if self._board is not None:
+            if not (0 <= row < self.board_size and
+                    0 <= col < self.board_size):
+                raise ValueError(f"Move ({row}, {col}) is off the board")
+            self._board, _, self._ko = go_rules.play(
+                self._board, row, col, self.player, self._ko
+            )
+        self._add_node(point_to_sgf(row, col))
+
+    def extend(self, moves: Iterable[MoveTuple]):
+        """Add `(row, col, player)` moves; colours alternate as in sente."""
+        for row, col, _ in moves:
+            self.append(row, col)
+
+    def pass_turn(self):
+        """Add a pass for the player whose turn it is."""
+        self._ko = None
+        self._add_node("")
+
+    def _add_node(self, point: str):
+        """Append a move node and switch players."""
+        self._nodes.append(f";{COLORS[self.player]}[{point}]")
+        self.player = 3 - self.player
+        self.num_moves += 1
+        self._text = None
+
+    def getvalue(self) -> str:
+        """The SGF text of the game so far."""
+        if self._text is None:
+            self._body += "".join(self._nodes)
+            self._nodes = []
+            self._text = (SGF_ROOT.format(size=self.board_size) +
+                          self._body + ")")
+        return self._text
+
+    def write(self, file: TextIO):
+        """Write the SGF text to an open text file."""
+        file.write(self.getvalue())
+
+
+def moves_to_sgf(move_list: Iterable[MoveTuple], board_size: int = 19,
+                 validate: bool = False) -> str:
+    """
+    Converts a move list to SGF text in one call.
+
+    Args:
+        move_list (list): `(row, col, player)` moves, 0-based.
+        board_size (int): Size of the board.
+        validate (bool): Raise ValueError on the first illegal move.
+
+    Returns:
+        str: The SGF data.
+    """
+    writer = SGFWriter(board_size, validate)
+    writer.extend(move_list)
+    return writer.getvalue()
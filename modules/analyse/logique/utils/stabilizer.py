@@ -0,0 +1,96 @@
+"""
+Temporal Board Stabilizer.
+
+Single-frame detection glitches (a hand shadow, a misdetected stone)
+would otherwise add a state to the timeline and usually a spurious
+revert right after, which the correctors then have to explain. The
+stabilizer keeps a per-intersection vote over the last N detected states
+and only changes an intersection once one value holds a majority of the
+window.
+
+Votes are maintained incrementally, so each frame costs a few (3, 19, 19)
+array operations. At the end of a video, `flush` commits the changes
+still waiting for votes.
+"""
+
+import logging
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BoardStabilizer:
+    """Per-intersection majority vote over a sliding window of states."""
+
+    def __init__(self, window: int = 5, min_votes: Optional[int] = None):
+        """
+        Args:
+            window (int): Number of recent states that vote.
+            min_votes (int, optional): Votes a value needs before it is
+                committed. Defaults to a strict majority of the window.
+        """
+        if window < 1:
+            raise ValueError(f"Window must be at least 1, got {window}")
+        self.window = window
+        self.min_votes = min_votes or window // 2 + 1
+        self.history = np.zeros((window, 19, 19), dtype=np.uint8)
+        # votes[v, r, c] = frames of the window where (r, c) held value v
+        self.votes = np.zeros((3, 19, 19), dtype=np.int16)
+        self.state = np.zeros((19, 19), dtype=np.uint8)
+        self.position = 0
+        self.primed = False
+        self._values = np.arange(3, dtype=np.uint8)[:, None, None]
+
+    def reset(self):
+        """Forget all history; the next state is committed as is."""
+        self.primed = False
+        self.position = 0
+
+    def update(self, board: np.ndarray) -> np.ndarray:
+        """
+        Add a detected state and return the stabilized state.
+
+        Args:
+            board (np.array): 19x19 detected state (0, 1, 2).
+
+        Returns:
+            np.array: 19x19 uint8 stabilized state. This buffer is reused
+                on every call; copy it to keep it.
+        """
+        if not self.primed:
+            # Fill the window with the first state so it is committed
+            # immediately instead of after `min_votes` frames
+            self.history[:] = board
+            np.multiply(self._values == board, self.window, out=self.votes)
+            self.state[:] = board
+            self.position = 0
+            self.primed = True
+            return self.state
+
+        self.votes -= self._values == self.history[self.position]
+        self.votes += self._values == board
+        self.history[self.position] = board
+        self.position = (self.position + 1) % self.window
+
+        settled = self.votes.max(axis=0) >= self.min_votes
+        np.copyto(self.state, self.votes.argmax(axis=0), casting="unsafe",
+                  where=settled)
+        return self.state
+
+    def flush(self) -> np.ndarray:
+        """
+        Commit the changes still waiting for votes, as if the last
+        detected state had been held until it won the vote. Used when no
+        more frames will come, so the last moves are not lost.
+
+        Returns:
+            np.array: 19x19 uint8 stabilized state (the reused buffer).
+        """
+        if not self.primed:
+            return self.state
+        last = self.history[(self.position - 1) % self.window].copy()
+        for _ in range(self.min_votes):
+            self.update(last)
+        return self.state
@@ -0,0 +1,344 @@
+"""
+Training Data Generator for the Gap-Filling Model.
+
+Builds training samples for the corrector model from game timelines (see
+`sgf_timeline`), in the form the model is queried by `fill_gaps_batched`:
+a candidate board (the position after a player tried one of the gap's
+candidate moves, captures removed) and whether that move is the one that
+was actually played.
+
+Each game is first recorded the way the video pipeline records it:
+states are dropped (merged moves) and the kept states are corrupted with
+missing stones, flicker and displaced stones. Gaps are the runs of moves
+between two recorded states, and their candidate moves are read from the
+corrupted boundary states, as the corrector does. Samples are then made
+along the true moves of every gap.
+
+Samples are written in shards, one structured `.npy` file per
+`games_per_shard` games, by a process pool reading a memory-mapped
+`TimelineDataset`. Shards are deterministic for a given seed whatever
+the number of workers, and can be memory-mapped back with `load_shard`
+or streamed as model batches with `iter_batches`.
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+
+from . import go_rules
+from .bitboard import BOARD_SIZE, Bitboard, bitboards_to_timeline
+from .sgf_timeline import TimelineDataset
+
+logger = logging.getLogger(__name__)
+
+MoveTuple = Tuple[int, int, int]
+PathLike = Union[str, os.PathLike]
+
+# One sample: candidate board, player who moved and 1 if it was the move
+SAMPLE_DTYPE = np.dtype([
+    ("board", np.uint8, (BOARD_SIZE, BOARD_SIZE)),
+    ("player", np.uint8),
+    ("label", np.uint8),
+])
+SHARD_PATTERN = "shard_{:05d}.npy"
+
+# (row, col) offsets of the orthogonal neighbours
+_OFFSETS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class NoiseConfig(NamedTuple):
+    """How the recorded timeline differs from the true game."""
+    keep_prob: float = 0.6  # Probability that a move's state is recorded
+    missing_prob: float = 0.01  # Per state: a stone is not detected
+    max_missing_run: int = 5  # States a missing stone stays missing
+    flicker_prob: float = 0.02  # Per state: a spurious stone appears
+    displacement_prob: float = 0.01  # Per state: a stone is shifted
+
+
+def timeline_moves(timeline: np.ndarray) -> List[Optional[MoveTuple]]:
+    """
+    Recovers the move played at each transition of a true timeline.
+
+    Args:
+        timeline (np.array): (T, 19, 19) states of a game.
+
+    Returns:
+        list: T - 1 entries, the (row, col, player) that leads from state
+            i to state i + 1, or None for a pass.
+    """
+    timeline = np.asarray(timeline)
+    moves: List[Optional[MoveTuple]] = [None] * (len(timeline) - 1)
+    added = (timeline[:-1] == 0) & (timeline[1:] != 0)
+    for index, point in zip(*np.nonzero(added.reshape(len(moves), -1))):
+        row, col = divmod(int(point), BOARD_SIZE)
+        moves[index] = (row, col, int(timeline[index + 1, row, col]))
+    return moves
+
+
+def corrupt_timeline(timeline: np.ndarray, noise: NoiseConfig,
+                     rng: np.random.Generator
+                     ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Records a true timeline the way the detector would.
+
+    Args:
+        timeline (np.array): (T, 19, 19) true states.
+        noise (NoiseConfig): Noise levels.
+        rng (np.random.Generator): Random source.
+
+    Returns:
+        tuple: A tuple containing:
+            - np.array: Indices of the recorded states in `timeline`; the
+              first and last states are always recorded.
+            - np.array: (K, 19, 19) uint8 recorded states, with noise.
+    """
+    keep = rng.random(len(timeline)) < noise.keep_prob
+    keep[0] = keep[-1] = True
+    recorded = np.flatnonzero(keep)
+    truth = np.asarray(timeline, dtype=np.uint8)[recorded]
+    states = truth.copy()
+    flat = states.reshape(len(states), -1)
+    num_states = len(states)
+
+    # A stone missed for a few states in a row, while it is on the board
+    for k in np.flatnonzero(rng.random(num_states) < noise.missing_prob):
+        stones = np.flatnonzero(flat[k])
+        if len(stones) == 0:
+            continue
+        point = rng.choice(stones)
+        end = min(num_states,
+                  k + int(rng.integers(1, noise.max_missing_run + 1)))
+        present = (truth[k:end].reshape(end - k, -1)[:, point] ==
+                   truth[k].flat[point])
+        flat[k:end][present, point] = 0
+
+    # A spurious stone for a single state
+    for k in np.flatnonzero(rng.random(num_states) < noise.flicker_prob):
+        empty = np.flatnonzero(flat[k] == 0)
+        if len(empty) > 0:
+            flat[k, rng.choice(empty)] = rng.integers(1, 3)
+
+    # A stone seen on a neighbouring point for a single state
+    for k in np.flatnonzero(rng.random(num_states) < noise.displacement_prob):
+        stones = np.flatnonzero(flat[k])
+        if len(stones) == 0:
+            continue
+        row, col = divmod(int(rng.choice(stones)), BOARD_SIZE)
+        targets = [(row + dr, col + dc) for dr, dc in _OFFSETS
+                   if 0 <= row + dr < BOARD_SIZE and
+                   0 <= col + dc < BOARD_SIZE and
+                   states[k, row + dr, col + dc] == 0]
+        if targets:
+            target = targets[rng.integers(len(targets))]
+            states[k][target] = states[k, row, col]
+            states[k, row, col] = 0
+
+    return recorded, states
+
+
+def game_samples(timeline: np.ndarray, noise: NoiseConfig,
+                 rng: np.random.Generator) -> np.ndarray:
+    """
+    Training samples of one game.
+
+    For every move inside a gap, the player's candidate moves that are
+    still unplayed are tried on the true position. The played move is
+    always among them (label 1); the others are labelled 0.
+
+    Args:
+        timeline (np.array): (T, 19, 19) true states of the game.
+        noise (NoiseConfig): Noise levels of the recording.
+        rng (np.random.Generator): Random source.
+
+    Returns:
+        np.array: Samples of SAMPLE_DTYPE.
+    """
+    timeline = np.asarray(timeline)
+    if len(timeline) < 3:
+        return np.zeros(0, dtype=SAMPLE_DTYPE)
+    moves = timeline_moves(timeline)
+    recorded, states = corrupt_timeline(timeline, noise, rng)
+
+    boards: List[Bitboard] = []
+    players: List[int] = []
+    labels: List[bool] = []
+    for k in np.flatnonzero(np.diff(recorded) > 1):
+        start, end = recorded[k], recorded[k + 1]
+        # Stones of each colour added across the gap, as
+        # corrector_noAI.differences reads them: a point that turned from
+        # black to white is a white add, not a black one
+        changed = states[k + 1] != states[k]
+        candidates = {player: set(zip(*np.nonzero(changed &
+                                                  (states[k + 1] == player))))
+                      for player in (1, 2)}
+
+        for index in range(start, end):
+            move = moves[index]
+            if move is None:
+                continue
+            row, col, player = move
+            position = Bitboard.from_array(timeline[index])
+            for candidate in sorted(candidates[player] | {(row, col)}):
+                try:
+                    result = go_rules.play(position, int(candidate[0]),
+                                           int(candidate[1]), player)
+                except ValueError:
+                    continue
+                boards.append(result.board)
+                players.append(player)
+                labels.append(candidate == (row, col))
+            candidates[player].discard((row, col))
+
+    samples = np.zeros(len(boards), dtype=SAMPLE_DTYPE)
+    if boards:
+        samples["board"] = bitboards_to_timeline(boards)
+        samples["player"] = players
+        samples["label"] = labels
+    return samples
+
+
+def iter_game_samples(dataset: TimelineDataset,
+                      noise: NoiseConfig = NoiseConfig(),
+                      seed: int = 0,
+                      games: Optional[range] = None
+                      ) -> Iterator[np.ndarray]:
+    """
+    Streams the samples of a dataset, one game at a time.
+
+    Args:
+        dataset (TimelineDataset): The game timelines.
+        noise (NoiseConfig): Noise levels of the recording.
+        seed (int): Random seed; game `i` always gets the same samples.
+        games (range, optional): Games to use. Defaults to all.
+
+    Yields:
+        np.array: The samples of one game, of SAMPLE_DTYPE.
+    """
+    for game in games if games is not None else range(len(dataset)):
+        rng = np.random.default_rng([seed, game])
+        yield game_samples(dataset[game], noise, rng)
+
+
+def _write_shard(task: Tuple[str, str, range, NoiseConfig, int]
+                 ) -> Tuple[str, int]:
+    """Worker task: writes the samples of a range of games to a shard."""
+    dataset_path, shard_path, games, noise, seed = task
+    dataset = TimelineDataset(dataset_path)
+    samples = [game for game in iter_game_samples(dataset, noise, seed, games)
+               if len(game)]
+    shard = (np.concatenate(samples) if samples
+             else np.zeros(0, dtype=SAMPLE_DTYPE))
+    # Write then rename, so a shard on disk is always complete
+    partial_path = shard_path + ".partial"
+    with open(partial_path, "wb") as f:
+        np.save(f, shard)
+    os.replace(partial_path, shard_path)
+    return shard_path, len(shard)
+
+
+def write_training_shards(dataset_path: PathLike, output_dir: PathLike,
+                          noise: NoiseConfig = NoiseConfig(),
+                          games_per_shard: int = 256,
+                          num_workers: Optional[int] = None,
+                          seed: int = 0) -> List[Path]:
+    """
+    Generates the training shards of a whole dataset in parallel.
+
+    Args:
+        dataset_path (str): Directory of a TimelineDataset.
+        output_dir (str): Directory for the shards, created if needed.
+        noise (NoiseConfig): Noise levels of the recording.
+        games_per_shard (int): Games whose samples go in one shard.
+        num_workers (int, optional): Worker processes. Defaults to the
+            number of CPUs; 1 generates in this process.
+        seed (int): Random seed.
+
+    Returns:
+        list: Paths of the shards, in game order.
+    """
+    if games_per_shard < 1:
+        raise ValueError("games_per_shard must be at least 1, "
+                         f"got {games_per_shard}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    num_games = len(TimelineDataset(dataset_path))
+    tasks = [
+        (str(dataset_path), str(output_dir / SHARD_PATTERN.format(shard)),
+         range(start, min(start + games_per_shard, num_games)),
+         noise, seed)
+        for shard, start in enumerate(range(0, num_games, games_per_shard))
+    ]
+    num_workers = min(num_workers or os.cpu_count() or 1, len(tasks))
+
+    if num_workers > 1:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(_write_shard, tasks))
+    else:
+        results = [_write_shard(task) for task in tasks]
+
+    num_samples = sum(count for _, count in results)
+    logger.info(f"Wrote {num_samples} samples from {num_games} games "
+                f"in {len(results)} shards to {output_dir}")
+    return [Path(path) for path, _ in results]
+
+
+def load_shard(shard_path: PathLike) -> np.ndarray:
+    """Memory-maps a shard (read-only) as an array of SAMPLE_DTYPE."""
+    return np.load(shard_path, mmap_mode="r")
+
+
+def to_model_batch(samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts samples to model inputs and targets.
+
+    Args:
+        samples (np.array): Samples of SAMPLE_DTYPE.
+
+    Returns:
+        tuple: A tuple containing:
+            - np.array: (N, 19, 19, 1) float32 boards, as fed to
+              `model.predict` by the corrector.
+            - np.array: (N, 2) float32 targets, the label in the column
+              of the player who moved and 0 in the other one.
+    """
+    inputs = samples["board"][..., None].astype(np.float32)
+    targets = np.zeros((len(samples), 2), dtype=np.float32)
+    targets[np.arange(len(samples)), samples["player"].astype(np.intp) - 1] = \
+        samples["label"]
+    return inputs, targets
+
+
+def iter_batches(shard_paths: List[PathLike], batch_size: int = 256,
+                 seed: Optional[int] = None
+                 ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Streams model batches from memory-mapped shards.
+
+    Only one batch is materialized at a time. With a seed, the shard
+    order and the samples within each shard are shuffled.
+
+    Args:
+        shard_paths (list): Shards from `write_training_shards`.
+        batch_size (int): Samples per batch (the last one may be smaller).
+        seed (int, optional): Shuffle seed. None keeps the file order.
+
+    Yields:
+        tuple: Inputs and targets, as returned by `to_model_batch`.
+    """
+    rng = np.random.default_rng(seed) if seed is not None else None
+    order = (rng.permutation(len(shard_paths)) if rng is not None
+             else range(len(shard_paths)))
+    for shard_index in order:
+        shard = load_shard(shard_paths[shard_index])
+        indices = (rng.permutation(len(shard)) if rng is not None
+                   else np.arange(len(shard)))
+        for start in range(0, len(shard), batch_size):
+            batch = indices[start:start + batch_size]
+            if rng is not None:
+                # Sorted reads are sequential in the memory map
+                batch = np.sort(batch)
+            yield to_model_batch(shard[batch])
@@ -4,27 +4,53 @@ Process Go game videos to generate SGF files.
 
 import logging
 import os
+import time
+from typing import Optional, Tuple
+
 import cv2
+import numpy as np
 import sente
 
 from logique.GoGame import GoGame
 from logique.GoBoard import GoBoard
 from logique.utils.model_utils import load_corrector_model
 from logique.corrector_noAI import corrector_no_ai
+from logique.utils.detection_cache import (
+    DetectionCache, DetectionRecorder, cache_path
+)
 from logique.utils.sgf_utils import to_sgf
 from config.settings import (
     ANALYSIS_INTERVAL,
     YOLO_PATH,
     KERAS_PATH,
     SGF_OUTPUT_PATH,
-    MAX_INIT_FRAMES
+    MAX_INIT_FRAMES,
+    FAST_CLASSIFIER_MODE,
+    YOLO_REFRESH_INTERVAL,
+    CORNER_TRACKING,
+    STABILIZER_WINDOW,
+    CORRECTOR_BEAM_WIDTH,
+    STREAMING_WINDOW,
+    POST_TREATMENT_WORKERS,
+    YOLO_CONF,
+    DUPLICATE_LINE_THRESHOLD,
+    LINE_DISTANCE_THRESHOLD,
+    CACHE_DETECTIONS,
+    DETECTION_CACHE_DIR
 )
 
 logger = logging.getLogger(__name__)
 
 
+def frame_position(cap: cv2.VideoCapture) -> Tuple[int, float]:
+    """Index and timestamp (seconds) of the frame last read from `cap`."""
+    return (int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 1,
+            cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+
+
 def initialize_board(cap: cv2.VideoCapture,
-                     go_game: GoGame) -> bool:
+                     go_game: GoGame,
+                     recorder: Optional[DetectionRecorder] = None) -> bool:
     """Try to find and initialize the board from video frames."""
     logger.info("Finding board in video...")
     frame_count_init = 0
@@ -36,6 +62,8 @@ def initialize_board(cap: cv2.VideoCapture,
             return False
 
         frame_count_init += 1
+        if recorder is not None:
+            recorder.begin_frame(*frame_position(cap))
 
         try:
             # Use end_game=False, we don't need SGF yet
@@ -58,7 +86,8 @@ def initialize_board(cap: cv2.VideoCapture,
     return False
 
 
-def process_video(cap: cv2.VideoCapture, go_game: GoGame) -> int:
+def process_video(cap: cv2.VideoCapture, go_game: GoGame,
+                  recorder: Optional[DetectionRecorder] = None) -> int:
     """Process the video frame-by-frame after initialization."""
     logger.info("Processing video to detect moves...")
 
@@ -75,6 +104,8 @@ def process_video(cap: cv2.VideoCapture, go_game: GoGame) -> int:
 
     processed_frames = 1
     frame_count = 0
+    stage_totals = {}
+    timed_frames = 0
 
     while cap.isOpened():
         ret, frame = cap.read()
@@ -88,14 +119,23 @@ def process_video(cap: cv2.VideoCapture, go_game: GoGame) -> int:
             continue
 
         processed_frames += 1
+        if recorder is not None:
+            recorder.begin_frame(*frame_position(cap))
 
         try:
             if processed_frames % 10 == 0:
                 logger.info(f"Processed {processed_frames} analysis frames... "
                             f"(video frame {frame_count}/{total_frames})")
+                if go_game.streaming_corrector is not None:
+                    logger.info(f"Moves settled so far: "
+                                f"{len(go_game.streaming_corrector.moves)}")
 
             _ = go_game.main_loop(frame, end_game=False)
 
+            timed_frames += 1
+            for stage, seconds in go_game.board_detect.stage_timings.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
         except Exception as e:
             # Log warnings less frequently to avoid spam
             if processed_frames % 20 == 0:
@@ -105,13 +145,94 @@ def process_video(cap: cv2.VideoCapture, go_game: GoGame) -> int:
             continue
 
     logger.info(f"Processing complete. Analyzed {processed_frames} frames.")
+    if timed_frames:
+        logger.info("Mean stage timings: " + ", ".join(
+            f"{stage}={seconds / timed_frames * 1000:.1f}ms"
+            for stage, seconds in stage_totals.items()
+        ))
+    return processed_frames
+
+
+def replay_video(cache: DetectionCache, go_game: GoGame) -> int:
+    """
+    Run the stages after YOLO on cached detections, in recording order.
+
+    The first frame that initializes the board plays the role of
+    `initialize_board`, the following ones of `process_video`.
+    """
+    logger.info(f"Replaying {len(cache)} cached frames...")
+    start = time.perf_counter()
+    initialized = False
+    processed_frames = 0
+
+    for frame_index, _, detections in cache.frames(YOLO_CONF):
+        try:
+            if initialized:
+                processed_frames += 1
+                go_game.main_loop(None, end_game=False,
+                                  detections=detections)
+            else:
+                go_game.initialize_game(None, end_game=False,
+                                        detections=detections)
+                initialized = True
+                processed_frames = 1
+        except Exception as e:
+            logger.debug(f"Replay of frame {frame_index} failed: {e}")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Replay complete: {len(cache)} frames in {elapsed:.2f}s "
+                f"({len(cache) / max(elapsed, 1e-9):.0f} frames/s)")
+    if not initialized:
+        logger.error("Board was never initialized in the cached frames.")
     return processed_frames
 
 
-def run_pipeline(video_path: str = None):
-    """Initialize and run the full video processing pipeline."""
-    logger.info(f"Loading YOLO model from: {YOLO_PATH}")
-    go_board = GoBoard(model_path=YOLO_PATH)
+def run_pipeline(video_path: str = None,
+                 cache_detections: bool = CACHE_DETECTIONS
+                 ) -> Optional[str]:
+    """
+    Initialize and run the full video processing pipeline.
+
+    Args:
+        video_path: The video to analyse
+        cache_detections: Record the YOLO detections of the video, or
+            replay them if this video was already analysed with the
+            current model
+
+    Returns:
+        The SGF data, or None if no game could be generated
+    """
+    cache = cache_file = None
+    if cache_detections:
+        cache_file = cache_path(DETECTION_CACHE_DIR, video_path, YOLO_PATH)
+        if cache_file.exists():
+            cache = DetectionCache(cache_file)
+            if cache.conf > YOLO_CONF + 1e-6:
+                logger.info(f"Cached detections use conf={cache.conf}, "
+                            f"above {YOLO_CONF}; running YOLO again")
+                cache = None
+
+    if cache is not None:
+        logger.info(f"Using cached detections from: {cache_file}")
+        go_board = GoBoard(
+            model_path=None, conf=YOLO_CONF,
+            duplicate_threshold=DUPLICATE_LINE_THRESHOLD,
+            line_distance_threshold=LINE_DISTANCE_THRESHOLD
+        )
+    else:
+        logger.info(f"Loading YOLO model from: {YOLO_PATH}")
+        go_board = GoBoard(model_path=YOLO_PATH,
+                           fast_mode=FAST_CLASSIFIER_MODE,
+                           yolo_interval=YOLO_REFRESH_INTERVAL,
+                           track_corners=CORNER_TRACKING,
+                           conf=YOLO_CONF,
+                           duplicate_threshold=DUPLICATE_LINE_THRESHOLD,
+                           line_distance_threshold=LINE_DISTANCE_THRESHOLD)
+        if cache_file is not None:
+            if FAST_CLASSIFIER_MODE:
+                logger.warning("Fast classifier mode is on: only the "
+                               "frames that run YOLO will be cached.")
+            go_board.recorder = DetectionRecorder(YOLO_CONF)
 
     logger.info(f"Loading Keras corrector model from: {KERAS_PATH}")
     corrector_model = load_corrector_model(model_path=KERAS_PATH)
@@ -123,32 +244,47 @@ def run_pipeline(video_path: str = None):
         game=game,
         board_detect=go_board,
         corrector_model=corrector_model,
-        transparent_mode=True
+        transparent_mode=True,
+        stabilizer_window=STABILIZER_WINDOW,
+        beam_width=CORRECTOR_BEAM_WIDTH,
+        streaming_window=STREAMING_WINDOW,
+        post_treatment_workers=POST_TREATMENT_WORKERS,
+        corrector_model_path=KERAS_PATH
     )
 
     logger.info(f"Running in TRANSPARENT (AI Post-Processing) mode")
 
-    logger.info(f"Opening video file: {video_path}")
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        logger.error(f"Could not open video file {video_path}")
-        return
-
-    # --- 1. Initialize Board ---
-    if not initialize_board(cap, go_game):
+    if cache is not None:
+        # --- 1-2. Replay the cached detections ---
+        processed_frames = replay_video(cache, go_game)
+    else:
+        recorder = go_board.recorder
+        logger.info(f"Opening video file: {video_path}")
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            logger.error(f"Could not open video file {video_path}")
+            return None
+
+        # --- 1. Initialize Board ---
+        if not initialize_board(cap, go_game, recorder):
+            cap.release()
+            if recorder is not None:
+                recorder.save(cache_file)
+            return None
+
+        # --- 2. Process Video ---
+        processed_frames = process_video(cap, go_game, recorder)
         cap.release()
-        return
-
-    # --- 2. Process Video ---
-    processed_frames = process_video(cap, go_game)
-    cap.release()
-    cv2.destroyAllWindows()
+        cv2.destroyAllWindows()
+        if recorder is not None:
+            recorder.save(cache_file)
 
     # --- 3. Post-Process and Save SGF ---
     final_sgf = None
     num_states = len(go_game.numpy_board)
     logger.info(f"Running AI post-processing on {num_states} "
-                "board states...")
+                f"board states ({len(go_game.position_index)} distinct "
+                "positions)...")
     if num_states < 2:
         logger.error("Not enough board states captured for AI processing.")
     else:
@@ -183,12 +319,17 @@ def run_pipeline(video_path: str = None):
             with open(SGF_OUTPUT_PATH, "w") as f:
                 f.write(final_sgf)
             logger.info(f"\n✓ Successfully saved game to {SGF_OUTPUT_PATH}")
+            # Position hash of each timeline state, for hash-keyed lookups
+            hashes_path = os.path.splitext(SGF_OUTPUT_PATH)[0] + "_hashes.npy"
+            np.save(hashes_path, go_game.hash_sequence())
+            logger.info(f"  Timeline hashes saved to {hashes_path}")
             logger.info(f"  Total frames analyzed: {processed_frames}")
         except IOError as e:
             logger.error(f"\n✗ Error: "
                          f"Could not write SGF to {SGF_OUTPUT_PATH}: {e}")
     else:
         logger.error("\n✗ Error: No SGF data was generated.")
+    return final_sgf
 
 if __name__ == "__main__":
     run_pipeline(os.path.join("data", "test.mp4"))